@@ -0,0 +1,28 @@
+BEGIN;
+
+SELECT _v.register_patch('0012-add-guild-purge', ARRAY['0011-add-max-message-age'], NULL);
+
+CREATE TABLE IF NOT EXISTS public.guild_purge
+(
+    guild_id bigint NOT NULL,
+    requested_at timestamp with time zone NOT NULL DEFAULT now(),
+    rows_deleted bigint NOT NULL DEFAULT 0,
+    CONSTRAINT guild_purge_pkey PRIMARY KEY (guild_id),
+    CONSTRAINT guild_purge_guild_id_fkey FOREIGN KEY (guild_id)
+        REFERENCES public.guild (id) MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+COMMENT ON TABLE public.guild_purge
+    IS 'Marks guilds whose rows are being deleted in chunks by the bot.';
+
+-- Required to find a guild's rows without sequential scans
+CREATE INDEX IF NOT EXISTS channel_guild_id_idx
+    ON public.channel (guild_id);
+CREATE INDEX IF NOT EXISTS message_channel_id_idx
+    ON public.message (channel_id);
+CREATE INDEX IF NOT EXISTS starboard_message_star_message_id_idx
+    ON public.starboard_message (star_message_id);
+
+COMMIT;
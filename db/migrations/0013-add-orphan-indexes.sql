@@ -0,0 +1,11 @@
+BEGIN;
+
+SELECT _v.register_patch('0013-add-orphan-indexes', ARRAY['0012-add-guild-purge'], NULL);
+
+-- Required to check if users are still referenced without sequential scans
+CREATE INDEX IF NOT EXISTS message_user_id_idx
+    ON public.message (user_id);
+CREATE INDEX IF NOT EXISTS message_star_user_id_idx
+    ON public.message_star (user_id);
+
+COMMIT;
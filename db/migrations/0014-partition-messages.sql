@@ -0,0 +1,259 @@
+BEGIN;
+
+SELECT _v.register_patch('0014-partition-messages', ARRAY['0013-add-orphan-indexes'], NULL);
+
+-- Snowflake helpers
+-- https://discord.com/developers/docs/reference#snowflakes
+
+CREATE OR REPLACE FUNCTION public.snowflake_at(ts timestamptz)
+    RETURNS bigint
+    LANGUAGE sql
+    IMMUTABLE PARALLEL SAFE
+    RETURN (floor(extract(epoch FROM ts) * 1000)::bigint - 1420070400000) << 22;
+
+COMMENT ON FUNCTION public.snowflake_at(timestamptz)
+    IS 'Returns the lowest snowflake ID that could be created at the given time.';
+
+CREATE OR REPLACE FUNCTION public.snowflake_time(id bigint)
+    RETURNS timestamptz
+    LANGUAGE sql
+    IMMUTABLE PARALLEL SAFE
+    RETURN to_timestamp(((id >> 22) + 1420070400000) / 1000.0);
+
+COMMENT ON FUNCTION public.snowflake_time(bigint)
+    IS 'Returns the time at which the given snowflake ID was created.';
+
+-- Partition management
+
+CREATE OR REPLACE FUNCTION public.create_message_partitions(since timestamptz, until timestamptz)
+    RETURNS integer
+    LANGUAGE 'plpgsql'
+    VOLATILE
+    COST 100
+AS $BODY$
+DECLARE
+    t_month timestamp := date_trunc('month', since AT TIME ZONE 'UTC');
+    t_suffix text;
+    t_table text;
+    n_created integer := 0;
+BEGIN
+    WHILE t_month <= until AT TIME ZONE 'UTC' LOOP
+        t_suffix := to_char(t_month, '"p"YYYYMM');
+        FOREACH t_table IN ARRAY ARRAY['message', 'message_star', 'message_star_total'] LOOP
+            IF to_regclass(format('public.%I', t_table || '_' || t_suffix)) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%s) TO (%s)',
+                    t_table || '_' || t_suffix,
+                    t_table,
+                    snowflake_at(t_month AT TIME ZONE 'UTC'),
+                    snowflake_at((t_month + interval '1 month') AT TIME ZONE 'UTC')
+                );
+                n_created := n_created + 1;
+            END IF;
+        END LOOP;
+        t_month := t_month + interval '1 month';
+    END LOOP;
+    RETURN n_created;
+END
+$BODY$;
+
+COMMENT ON FUNCTION public.create_message_partitions(timestamptz, timestamptz)
+    IS 'Creates any missing monthly partitions of message, message_star, and message_star_total between the given times. Returns the number of partitions created.';
+
+CREATE OR REPLACE FUNCTION public.drop_message_partitions(before timestamptz)
+    RETURNS integer
+    LANGUAGE 'plpgsql'
+    VOLATILE
+    COST 100
+AS $BODY$
+DECLARE
+    t_suffix text;
+    t_month timestamp;
+    t_lower bigint;
+    t_upper bigint;
+    n_dropped integer := 0;
+BEGIN
+    FOR t_suffix IN
+        SELECT substring(c.relname FROM length('message_') + 1)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.message'::regclass
+            AND c.relname ~ '^message_p\d{6}$'
+        ORDER BY c.relname
+    LOOP
+        t_month := to_date(substring(t_suffix FROM 2), 'YYYYMM')::timestamp;
+        EXIT WHEN (t_month + interval '1 month') AT TIME ZONE 'UTC' > before;
+
+        t_lower := snowflake_at(t_month AT TIME ZONE 'UTC');
+        t_upper := snowflake_at((t_month + interval '1 month') AT TIME ZONE 'UTC');
+
+        -- Starboarded messages, including the starboard messages themselves,
+        -- are set aside and moved into the default partitions afterwards
+        CREATE TEMPORARY TABLE retained_starboard_message ON COMMIT DROP AS
+            SELECT * FROM starboard_message
+            WHERE message_id >= t_lower AND message_id < t_upper
+                OR star_message_id >= t_lower AND star_message_id < t_upper;
+        CREATE TEMPORARY TABLE retained_message ON COMMIT DROP AS
+            SELECT * FROM message
+            WHERE id >= t_lower AND id < t_upper
+                AND id IN (
+                    SELECT message_id FROM retained_starboard_message
+                    UNION ALL
+                    SELECT star_message_id FROM retained_starboard_message
+                );
+        CREATE TEMPORARY TABLE retained_message_star ON COMMIT DROP AS
+            SELECT * FROM message_star
+            WHERE message_id IN (SELECT id FROM retained_message);
+
+        DELETE FROM starboard_message
+        WHERE message_id IN (SELECT message_id FROM retained_starboard_message);
+
+        EXECUTE format('DROP TABLE public.%I', 'message_star_total_' || t_suffix);
+        EXECUTE format('DROP TABLE public.%I', 'message_star_' || t_suffix);
+        -- Referenced partitions must be detached before they can be dropped
+        EXECUTE format('ALTER TABLE public.message DETACH PARTITION public.%I', 'message_' || t_suffix);
+        EXECUTE format('DROP TABLE public.%I', 'message_' || t_suffix);
+
+        INSERT INTO message SELECT * FROM retained_message;
+        -- Star totals are recalculated by message_star_total_trigger
+        INSERT INTO message_star SELECT * FROM retained_message_star;
+        INSERT INTO starboard_message SELECT * FROM retained_starboard_message;
+
+        DROP TABLE retained_starboard_message, retained_message, retained_message_star;
+        n_dropped := n_dropped + 1;
+    END LOOP;
+    RETURN n_dropped;
+END
+$BODY$;
+
+COMMENT ON FUNCTION public.drop_message_partitions(timestamptz)
+    IS 'Drops monthly partitions that ended before the given time, moving starboarded rows into the default partitions. Returns the number of months dropped.';
+
+-- Replace tables with partitioned equivalents
+
+ALTER TABLE public.message RENAME TO message_unpartitioned;
+ALTER TABLE public.message_star RENAME TO message_star_unpartitioned;
+ALTER TABLE public.message_star_total RENAME TO message_star_total_unpartitioned;
+
+CREATE TABLE public.message
+(
+    id bigint NOT NULL,
+    channel_id bigint NOT NULL,
+    user_id bigint NOT NULL
+) PARTITION BY RANGE (id);
+
+CREATE TABLE public.message_star
+(
+    message_id bigint NOT NULL,
+    user_id bigint NOT NULL,
+    emoji text COLLATE pg_catalog."default" NOT NULL
+) PARTITION BY RANGE (message_id);
+
+CREATE TABLE public.message_star_total
+(
+    message_id bigint NOT NULL,
+    total smallint NOT NULL DEFAULT 0
+) PARTITION BY RANGE (message_id);
+
+CREATE TABLE public.message_default PARTITION OF public.message DEFAULT;
+CREATE TABLE public.message_star_default PARTITION OF public.message_star DEFAULT;
+CREATE TABLE public.message_star_total_default PARTITION OF public.message_star_total DEFAULT;
+
+SELECT create_message_partitions(
+    coalesce((SELECT snowflake_time(min(id)) FROM message_unpartitioned), now()),
+    now() + interval '3 months'
+);
+
+INSERT INTO message (id, channel_id, user_id)
+    SELECT id, channel_id, user_id FROM message_unpartitioned;
+INSERT INTO message_star (message_id, user_id, emoji)
+    SELECT message_id, user_id, emoji FROM message_star_unpartitioned;
+INSERT INTO message_star_total (message_id, total)
+    SELECT message_id, total FROM message_star_total_unpartitioned;
+
+-- Foreign keys on partitioned tables cannot be NOT VALID
+INSERT INTO "user" (id)
+    SELECT user_id FROM message
+    UNION
+    SELECT user_id FROM message_star
+ON CONFLICT DO NOTHING;
+
+-- Drops the trigger and starboard_message foreign keys
+DROP TABLE message_star_total_unpartitioned, message_star_unpartitioned, message_unpartitioned CASCADE;
+
+-- Restore constraints
+ALTER TABLE IF EXISTS public.message
+    ADD CONSTRAINT message_pkey PRIMARY KEY (id);
+ALTER TABLE IF EXISTS public.message
+    ADD CONSTRAINT message_channel_id_fkey FOREIGN KEY (channel_id)
+    REFERENCES public.channel (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE CASCADE;
+ALTER TABLE IF EXISTS public.message
+    ADD CONSTRAINT message_user_id_fkey FOREIGN KEY (user_id)
+    REFERENCES public."user" (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE NO ACTION;
+
+ALTER TABLE IF EXISTS public.message_star
+    ADD CONSTRAINT message_star_pkey PRIMARY KEY (message_id, user_id);
+ALTER TABLE IF EXISTS public.message_star
+    ADD CONSTRAINT message_star_message_id_fkey FOREIGN KEY (message_id)
+    REFERENCES public.message (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE CASCADE;
+ALTER TABLE IF EXISTS public.message_star
+    ADD CONSTRAINT message_star_user_id_fkey FOREIGN KEY (user_id)
+    REFERENCES public."user" (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE NO ACTION;
+
+ALTER TABLE IF EXISTS public.message_star_total
+    ADD CONSTRAINT message_star_total_pkey PRIMARY KEY (message_id);
+ALTER TABLE IF EXISTS public.message_star_total
+    ADD CONSTRAINT message_star_total_message_id_fkey FOREIGN KEY (message_id)
+    REFERENCES public.message (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE CASCADE;
+
+ALTER TABLE IF EXISTS public.starboard_message
+    ADD CONSTRAINT starboard_message_message_id_fkey FOREIGN KEY (message_id)
+    REFERENCES public.message (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE CASCADE;
+ALTER TABLE IF EXISTS public.starboard_message
+    ADD CONSTRAINT starboard_message_star_message_id_fkey FOREIGN KEY (star_message_id)
+    REFERENCES public.message (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE NO ACTION
+    NOT VALID;
+
+CREATE INDEX IF NOT EXISTS message_channel_id_idx
+    ON public.message (channel_id);
+CREATE INDEX IF NOT EXISTS message_user_id_idx
+    ON public.message (user_id);
+CREATE INDEX IF NOT EXISTS message_star_user_id_idx
+    ON public.message_star (user_id);
+
+CREATE OR REPLACE TRIGGER message_star_total_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF message_id
+    ON public.message_star
+    FOR EACH ROW
+    EXECUTE FUNCTION public.message_star_total_trigger_function();
+
+COMMENT ON TABLE public.message
+    IS 'Represents a Discord message. Partitioned by month of the message ID.';
+COMMENT ON TABLE public.message_star
+    IS 'Stores star reactions for messages. Partitioned by month of the message ID.';
+COMMENT ON TABLE public.message_star_total
+    IS 'Stores the total number of stars that a message has received. Partitioned by month of the message ID.';
+COMMENT ON TABLE public.message_default
+    IS 'Stores messages outside of any monthly partition, including starboarded messages from dropped partitions.';
+COMMENT ON TABLE public.message_star_default
+    IS 'Stores stars outside of any monthly partition, including stars of starboarded messages from dropped partitions.';
+COMMENT ON TABLE public.message_star_total_default
+    IS 'Stores star totals outside of any monthly partition, including totals of starboarded messages from dropped partitions.';
+COMMENT ON TRIGGER message_star_total_trigger ON public.message_star
+    IS 'Maintains a corresponding message_star_total row as stars are inserted/updated/deleted.';
+
+COMMIT;
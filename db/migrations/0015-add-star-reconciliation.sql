@@ -0,0 +1,21 @@
+BEGIN;
+
+SELECT _v.register_patch('0015-add-star-reconciliation', ARRAY['0014-partition-messages'], NULL);
+
+CREATE TABLE IF NOT EXISTS public.star_reconciliation
+(
+    id boolean NOT NULL DEFAULT true,
+    last_message_id bigint NOT NULL DEFAULT 0,
+    started_at timestamp with time zone NOT NULL DEFAULT now(),
+    finished_at timestamp with time zone,
+    messages_checked bigint NOT NULL DEFAULT 0,
+    stars_added bigint NOT NULL DEFAULT 0,
+    stars_removed bigint NOT NULL DEFAULT 0,
+    CONSTRAINT star_reconciliation_pkey PRIMARY KEY (id),
+    CONSTRAINT star_reconciliation_id_check CHECK (id)
+);
+
+COMMENT ON TABLE public.star_reconciliation
+    IS 'Checkpoints the progress of synchronizing stars with reactions on Discord. Contains at most one row.';
+
+COMMIT;
@@ -0,0 +1,25 @@
+BEGIN;
+
+SELECT _v.register_patch('0016-add-channel-backfill', ARRAY['0015-add-star-reconciliation'], NULL);
+
+CREATE TABLE IF NOT EXISTS public.channel_backfill
+(
+    channel_id bigint NOT NULL,
+    before_message_id bigint,
+    started_at timestamp with time zone NOT NULL DEFAULT now(),
+    finished_at timestamp with time zone,
+    messages_scanned bigint NOT NULL DEFAULT 0,
+    messages_loaded bigint NOT NULL DEFAULT 0,
+    CONSTRAINT channel_backfill_pkey PRIMARY KEY (channel_id),
+    CONSTRAINT channel_backfill_channel_id_fkey FOREIGN KEY (channel_id)
+        REFERENCES public.channel (id) MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+COMMENT ON TABLE public.channel_backfill
+    IS 'Checkpoints the progress of loading starred messages from channel histories.';
+COMMENT ON COLUMN public.channel_backfill.before_message_id
+    IS 'The oldest message scanned so far, or NULL if the backfill has not started.';
+
+COMMIT;
@@ -0,0 +1,58 @@
+BEGIN;
+
+SELECT _v.register_patch('0017-add-leaderboards', ARRAY['0016-add-channel-backfill'], NULL);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.leaderboard_message AS
+    SELECT p.period, c.guild_id, mst.message_id, m.channel_id, m.user_id, mst.total
+    FROM (VALUES
+        ('week', interval '7 days'),
+        ('month', interval '30 days'),
+        ('all', NULL)
+    ) AS p (period, length)
+    CROSS JOIN message_star_total mst
+    JOIN message m ON m.id = mst.message_id
+    JOIN channel c ON c.id = m.channel_id
+    WHERE mst.total > 0
+        AND (p.length IS NULL OR mst.message_id >= snowflake_at(now() - p.length))
+        -- Stars on the starboard's own messages are not counted
+        AND NOT EXISTS (SELECT 1 FROM starboard_message sm WHERE sm.message_id = mst.message_id)
+WITH DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.leaderboard_author AS
+    SELECT period, guild_id, user_id, sum(total) AS stars, count(*) AS messages
+    FROM leaderboard_message
+    GROUP BY period, guild_id, user_id
+WITH DATA;
+
+-- Unique indexes are required to refresh concurrently
+CREATE UNIQUE INDEX IF NOT EXISTS leaderboard_message_period_message_id_idx
+    ON public.leaderboard_message (period, message_id);
+CREATE INDEX IF NOT EXISTS leaderboard_message_rank_idx
+    ON public.leaderboard_message (guild_id, period, total DESC, message_id DESC);
+
+CREATE UNIQUE INDEX IF NOT EXISTS leaderboard_author_period_guild_id_user_id_idx
+    ON public.leaderboard_author (period, guild_id, user_id);
+CREATE INDEX IF NOT EXISTS leaderboard_author_rank_idx
+    ON public.leaderboard_author (guild_id, period, stars DESC, user_id DESC);
+
+CREATE OR REPLACE FUNCTION public.refresh_leaderboards()
+    RETURNS void
+    LANGUAGE 'plpgsql'
+    VOLATILE
+    COST 100
+AS $BODY$
+BEGIN
+    -- leaderboard_author is derived from leaderboard_message
+    REFRESH MATERIALIZED VIEW CONCURRENTLY public.leaderboard_message;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY public.leaderboard_author;
+END
+$BODY$;
+
+COMMENT ON MATERIALIZED VIEW public.leaderboard_message
+    IS 'Ranks starred messages per guild over the last week, month, and all time. Refreshed periodically by refresh_leaderboards().';
+COMMENT ON MATERIALIZED VIEW public.leaderboard_author
+    IS 'Ranks message authors per guild by stars received over the last week, month, and all time. Refreshed periodically by refresh_leaderboards().';
+COMMENT ON FUNCTION public.refresh_leaderboards()
+    IS 'Concurrently refreshes every leaderboard materialized view without blocking reads.';
+
+COMMIT;
@@ -0,0 +1,62 @@
+BEGIN;
+
+SELECT _v.register_patch('0018-add-starboard-browse-indexes', ARRAY['0017-add-leaderboards'], NULL);
+
+-- Denormalized so that a guild's starboard entries can be paginated
+-- from a single index instead of joining through every guild's messages
+ALTER TABLE IF EXISTS public.starboard_message
+    ADD COLUMN IF NOT EXISTS guild_id bigint;
+
+UPDATE starboard_message sm SET guild_id = c.guild_id
+FROM message m
+JOIN channel c ON c.id = m.channel_id
+WHERE m.id = sm.star_message_id;
+
+ALTER TABLE IF EXISTS public.starboard_message
+    ADD CONSTRAINT starboard_message_guild_id_fkey FOREIGN KEY (guild_id)
+    REFERENCES public.guild (id) MATCH SIMPLE
+    ON UPDATE CASCADE
+    ON DELETE CASCADE;
+
+CREATE OR REPLACE FUNCTION public.starboard_message_guild_id_trigger_function()
+    RETURNS trigger
+    LANGUAGE 'plpgsql'
+    VOLATILE
+    COST 100
+AS $BODY$
+BEGIN
+    IF new.guild_id IS NULL THEN
+        SELECT c.guild_id INTO new.guild_id
+        FROM message m
+        JOIN channel c ON c.id = m.channel_id
+        WHERE m.id = new.star_message_id;
+    END IF;
+    RETURN new;
+END
+$BODY$;
+
+CREATE OR REPLACE TRIGGER starboard_message_guild_id_trigger
+    BEFORE INSERT
+    ON public.starboard_message
+    FOR EACH ROW
+    EXECUTE FUNCTION public.starboard_message_guild_id_trigger_function();
+
+COMMENT ON COLUMN public.starboard_message.guild_id
+    IS 'The guild of the starred message. Filled in by starboard_message_guild_id_trigger if not given.';
+COMMENT ON TRIGGER starboard_message_guild_id_trigger ON public.starboard_message
+    IS 'Sets guild_id from the starred message''s channel when a starboard message is inserted.';
+
+-- Keyset pagination of starboard entries, newest starred message first
+CREATE INDEX IF NOT EXISTS starboard_message_guild_id_star_message_id_idx
+    ON public.starboard_message (guild_id, star_message_id);
+
+-- Extend existing single-column indexes so that filtering by author or
+-- channel can also be paginated in message ID order
+CREATE INDEX IF NOT EXISTS message_user_id_id_idx
+    ON public.message (user_id, id);
+CREATE INDEX IF NOT EXISTS message_channel_id_id_idx
+    ON public.message (channel_id, id);
+DROP INDEX IF EXISTS public.message_user_id_idx;
+DROP INDEX IF EXISTS public.message_channel_id_idx;
+
+COMMIT;
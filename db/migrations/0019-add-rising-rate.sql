@@ -0,0 +1,16 @@
+BEGIN;
+
+SELECT _v.register_patch('0019-add-rising-rate', ARRAY['0018-add-starboard-browse-indexes'], NULL);
+
+ALTER TABLE IF EXISTS public.starboard_guild_config
+    ADD COLUMN rising_rate smallint NOT NULL DEFAULT 0;
+
+ALTER TABLE IF EXISTS public.starboard_message
+    ADD COLUMN rising boolean NOT NULL DEFAULT false;
+
+COMMENT ON COLUMN public.starboard_guild_config.rising_rate
+    IS 'The number of stars a message must receive within the bot''s rising window to be sent to the starboard early, or 0 to disable.';
+COMMENT ON COLUMN public.starboard_message.rising
+    IS 'True if the message was sent to the starboard for rising quickly rather than reaching the star threshold.';
+
+COMMIT;
@@ -0,0 +1,36 @@
+BEGIN;
+
+SELECT _v.register_patch('0020-add-starboards', ARRAY['0019-add-rising-rate'], NULL);
+
+-- Additional starboards alongside the guild's default starboard
+-- in starboard_guild_config
+CREATE TABLE IF NOT EXISTS public.starboard
+(
+    channel_id bigint NOT NULL,
+    guild_id bigint NOT NULL,
+    star_threshold smallint NOT NULL DEFAULT 3,
+    max_message_age integer NOT NULL DEFAULT 86400 * 7,
+    source_channel_ids bigint[],
+    emojis text[],
+    CONSTRAINT starboard_pkey PRIMARY KEY (channel_id),
+    CONSTRAINT starboard_channel_id_guild_id_fkey FOREIGN KEY (channel_id, guild_id)
+        REFERENCES public.channel (id, guild_id) MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE,
+    CONSTRAINT starboard_guild_id_fkey FOREIGN KEY (guild_id)
+        REFERENCES public.guild (id) MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS starboard_guild_id_idx
+    ON public.starboard (guild_id);
+
+COMMENT ON TABLE public.starboard
+    IS 'Additional starboards of a guild. The default starboard is stored in starboard_guild_config.';
+COMMENT ON COLUMN public.starboard.source_channel_ids
+    IS 'The channels whose messages can be sent to this starboard, or NULL for all channels.';
+COMMENT ON COLUMN public.starboard.emojis
+    IS 'The emojis counted towards this starboard''s threshold, or NULL for all allowed emojis.';
+
+COMMIT;
@@ -0,0 +1,11 @@
+BEGIN;
+
+SELECT _v.register_patch('0021-add-star-emojis', ARRAY['0020-add-starboards'], NULL);
+
+ALTER TABLE IF EXISTS public.starboard_guild_config
+    ADD COLUMN star_emojis text[];
+
+COMMENT ON COLUMN public.starboard_guild_config.star_emojis
+    IS 'The emojis that count as stars, with custom emojis written as <:name:id>, or NULL to use the bot''s default emojis.';
+
+COMMIT;
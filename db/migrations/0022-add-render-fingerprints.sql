@@ -0,0 +1,14 @@
+BEGIN;
+
+SELECT _v.register_patch('0022-add-render-fingerprints', ARRAY['0021-add-star-emojis'], NULL);
+
+ALTER TABLE IF EXISTS public.starboard_message
+    ADD COLUMN content_fingerprint bytea,
+    ADD COLUMN embed_fingerprint bytea;
+
+COMMENT ON COLUMN public.starboard_message.content_fingerprint
+    IS 'A hash of the content last sent for the starboard message, used to skip edits that would not change it.';
+COMMENT ON COLUMN public.starboard_message.embed_fingerprint
+    IS 'A hash of the embed last sent for the starboard message, used to skip edits that would not change it.';
+
+COMMIT;
@@ -0,0 +1,11 @@
+BEGIN;
+
+SELECT _v.register_patch('0023-add-mirrored-images', ARRAY['0022-add-render-fingerprints'], NULL);
+
+ALTER TABLE IF EXISTS public.starboard_message
+    ADD COLUMN image_filename text;
+
+COMMENT ON COLUMN public.starboard_message.image_filename
+    IS 'The filename of the image re-uploaded with the starboard message, or NULL if its embed links to the original attachment.';
+
+COMMIT;
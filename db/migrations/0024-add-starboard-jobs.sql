@@ -0,0 +1,99 @@
+BEGIN;
+
+SELECT _v.register_patch('0024-add-starboard-jobs', ARRAY['0023-add-mirrored-images'], NULL);
+
+CREATE TABLE IF NOT EXISTS public.starboard_job
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY,
+    message_id bigint NOT NULL,
+    guild_id bigint NOT NULL,
+    operation text NOT NULL,
+    data jsonb NOT NULL DEFAULT '{}',
+    created_at timestamp with time zone NOT NULL DEFAULT now(),
+    updated_at timestamp with time zone NOT NULL DEFAULT now(),
+    run_at timestamp with time zone NOT NULL DEFAULT now(),
+    claimed_at timestamp with time zone,
+    attempts smallint NOT NULL DEFAULT 0,
+    CONSTRAINT starboard_job_pkey PRIMARY KEY (id),
+    CONSTRAINT starboard_job_operation_check
+        CHECK (operation IN ('send', 'edit', 'delete')),
+    CONSTRAINT starboard_job_guild_id_fkey FOREIGN KEY (guild_id)
+        REFERENCES public.guild (id) MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+-- Jobs can only be merged until they are claimed, after which
+-- a colliding job is inserted alongside the claimed one
+CREATE UNIQUE INDEX IF NOT EXISTS starboard_job_pending_idx
+    ON public.starboard_job (message_id, operation)
+    WHERE claimed_at IS NULL;
+CREATE INDEX IF NOT EXISTS starboard_job_run_at_idx
+    ON public.starboard_job (run_at);
+CREATE INDEX IF NOT EXISTS starboard_job_guild_id_idx
+    ON public.starboard_job (guild_id);
+
+CREATE OR REPLACE FUNCTION public.add_starboard_job(
+    new_message_id bigint,
+    new_guild_id bigint,
+    new_operation text,
+    new_data jsonb
+)
+    RETURNS boolean
+    LANGUAGE 'plpgsql'
+    VOLATILE
+    COST 100
+AS $BODY$
+BEGIN
+    IF new_operation = 'delete' THEN
+        -- Deletions overwrite every other pending job of the message
+        DELETE FROM starboard_job
+        WHERE message_id = new_message_id
+            AND claimed_at IS NULL
+            AND operation <> 'delete';
+    ELSIF EXISTS (
+        SELECT 1 FROM starboard_job
+        WHERE message_id = new_message_id
+            AND claimed_at IS NULL
+            AND operation = 'delete'
+    ) THEN
+        -- Jobs arriving after a pending deletion are discarded
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO starboard_job AS j (message_id, guild_id, operation, data)
+    VALUES (new_message_id, new_guild_id, new_operation, new_data)
+    ON CONFLICT (message_id, operation) WHERE claimed_at IS NULL DO UPDATE SET
+        data = CASE j.operation
+            -- Edit data is merged, preferring the newer job's keys
+            WHEN 'edit' THEN j.data || EXCLUDED.data
+            -- Star updates for different emojis must update every starboard
+            WHEN 'send' THEN EXCLUDED.data || CASE
+                WHEN j.data -> 'emoji' IS DISTINCT FROM EXCLUDED.data -> 'emoji'
+                THEN '{"emoji": null}'::jsonb
+                ELSE '{}'::jsonb
+            END
+            ELSE EXCLUDED.data
+        END,
+        updated_at = now();
+
+    -- Listeners are only notified once the transaction commits
+    PERFORM pg_notify('starboard_job', new_operation);
+    RETURN TRUE;
+END
+$BODY$;
+
+COMMENT ON TABLE public.starboard_job
+    IS 'Pending starboard sends, edits, and deletions, claimed by workers with FOR UPDATE SKIP LOCKED. Inserted through add_starboard_job().';
+COMMENT ON COLUMN public.starboard_job.message_id
+    IS 'The starred message whose starboard messages are updated by this job.';
+COMMENT ON COLUMN public.starboard_job.operation
+    IS 'send to send, edit, or delete starboard messages after a star change, edit to refresh their embeds, or delete to delete them after the starred message was deleted.';
+COMMENT ON COLUMN public.starboard_job.run_at
+    IS 'The earliest time the job can be claimed. Claiming a job pushes this back by its lease, so jobs abandoned by a crashed worker are claimed again.';
+COMMENT ON COLUMN public.starboard_job.claimed_at
+    IS 'When the job was last claimed by a worker, or NULL if it is still pending and can be merged with newer jobs.';
+COMMENT ON FUNCTION public.add_starboard_job(bigint, bigint, text, jsonb)
+    IS 'Adds a job or merges it into a pending job of the same message, then notifies the starboard_job channel. Returns false if the job was discarded by a pending deletion.';
+
+COMMIT;
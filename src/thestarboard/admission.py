@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import enum
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+from typing import AsyncIterator, Hashable, Mapping
+
+log = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    """The classes of work admitted by :class:`AdmissionController`,
+    from highest to lowest priority.
+    """
+
+    SEND = 0
+    """Star reactions, which may send new starboard posts."""
+    DELETE = 1
+    """Deletions of starred messages and their starboard posts."""
+    EDIT = 2
+    """Edits to starboard posts, such as star counts and edited messages."""
+    CLEANUP = 3
+    """Background maintenance such as flushing deletions and purging guilds."""
+
+
+class LoadShed(Exception):
+    """Raised when work is rejected because the bot is degraded."""
+
+    def __init__(self, priority: Priority) -> None:
+        super().__init__(f"{priority.name} work was shed under load")
+        self.priority = priority
+
+
+class _TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, now: float) -> None:
+        self.tokens = tokens
+        self.updated_at = now
+
+    def refill(self, now: float, rate: float, burst: float) -> None:
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+
+class AdmissionController:
+    """Bounds how much work uses the database at once.
+
+    Each class of work has its own in-flight limit, and every class shares
+    `max_in_flight` slots which should be fewer than the connection pool's
+    size. When a slot is freed, it goes to the highest priority class
+    that is under its limit.
+
+    Within a class, work is queued per key, such as a guild ID, and keys
+    take turns in round-robin order so that one busy key cannot starve
+    the rest. Each key can have at most `key_limit` work in flight, and
+    has a token bucket refilled at `key_rate` admissions per second up to
+    `key_burst`. Keys at their limit or without a token are skipped until
+    they can be admitted again. Work without a key is never limited this
+    way and shares one queue.
+
+    Once `degraded_depth` tasks are waiting for capacity, the controller
+    is degraded and new work of :attr:`Priority.EDIT` or lower is rejected
+    with :exc:`LoadShed` rather than queued. It recovers once the queue
+    drains to half that depth. Tasks held back by their own key's limits
+    are not counted, so one busy key cannot degrade every other key.
+
+    """
+
+    SHED_PRIORITY = Priority.EDIT
+    """The highest priority of work that can be shed."""
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int,
+        limits: Mapping[Priority, int],
+        degraded_depth: int,
+        key_limit: int | None = None,
+        key_rate: float = float("inf"),
+        key_burst: float = 1,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.limits = {p: limits.get(p, max_in_flight) for p in Priority}
+        self.degraded_depth = degraded_depth
+        self.key_limit = key_limit
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+
+        self.in_flight: Counter[Priority] = Counter()
+        """The amount of work of each class currently admitted."""
+        self.shed: Counter[Priority] = Counter()
+        """The amount of work of each class shed since startup."""
+        self.degraded_since: float | None = None
+        """The :func:`time.monotonic()` time the controller became degraded."""
+
+        # Keys with waiters in each class, in the order they take turns
+        self._queues: dict[
+            Priority,
+            OrderedDict[Hashable, deque[asyncio.Future[None]]],
+        ] = {p: OrderedDict() for p in Priority}
+        self._n_waiting = 0
+        self._key_in_flight: Counter[Hashable] = Counter()
+        self._buckets: dict[Hashable, _TokenBucket] = {}
+        self._next_bucket_prune = 0.0
+        self._refill_handle: asyncio.TimerHandle | None = None
+
+    @property
+    def degraded(self) -> bool:
+        """Whether low-priority work is currently being shed."""
+        return self.degraded_since is not None
+
+    @property
+    def waiting(self) -> int:
+        """The number of tasks waiting to be admitted."""
+        return self._n_waiting
+
+    @property
+    def contended(self) -> int:
+        """The number of waiting tasks that are not held back
+        by their own key's limits.
+        """
+        now = time.monotonic()
+        throttled = sum(
+            len(queue)
+            for queues in self._queues.values()
+            for key, queue in queues.items()
+            if self._is_key_throttled(key, now)
+        )
+        return self._n_waiting - throttled
+
+    @property
+    def waiting_keys(self) -> int:
+        """The number of keys with tasks waiting to be admitted."""
+        return sum(len(queues) for queues in self._queues.values())
+
+    @contextlib.asynccontextmanager
+    async def admit(
+        self,
+        priority: Priority,
+        key: Hashable = None,
+    ) -> AsyncIterator[None]:
+        """Waits until work of the given priority can run.
+
+        :param key:
+            The key to queue and rate limit the work under,
+            or None to only queue it by priority.
+        :raises LoadShed:
+            The controller is degraded and the work can be shed.
+
+        """
+        if self.degraded and priority >= self.SHED_PRIORITY:
+            self.shed[priority] += 1
+            raise LoadShed(priority)
+
+        if (
+            not self._queues[priority]
+            and self._has_capacity(priority)
+            and self._has_key_capacity(key)
+            and self._take_token(key, time.monotonic())
+        ):
+            self._start(priority, key)
+        else:
+            await self._wait(priority, key)
+
+        try:
+            yield
+        finally:
+            self._finish(priority, key)
+            self._wake_waiters()
+
+    def _has_capacity(self, priority: Priority) -> bool:
+        return (
+            self.in_flight.total() < self.max_in_flight
+            and self.in_flight[priority] < self.limits[priority]
+        )
+
+    def _has_key_capacity(self, key: Hashable) -> bool:
+        return (
+            key is None
+            or self.key_limit is None
+            or self._key_in_flight[key] < self.key_limit
+        )
+
+    def _is_key_throttled(self, key: Hashable, now: float) -> bool:
+        if key is None:
+            return False
+        if not self._has_key_capacity(key):
+            return True
+        if self.key_rate == float("inf"):
+            return False
+        return self._get_bucket(key, now).tokens < 1
+
+    def _start(self, priority: Priority, key: Hashable) -> None:
+        self.in_flight[priority] += 1
+        if key is not None:
+            self._key_in_flight[key] += 1
+
+    def _finish(self, priority: Priority, key: Hashable) -> None:
+        self.in_flight[priority] -= 1
+        if key is not None:
+            self._key_in_flight[key] -= 1
+            if self._key_in_flight[key] <= 0:
+                del self._key_in_flight[key]
+
+    def _get_bucket(self, key: Hashable, now: float) -> _TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _TokenBucket(self.key_burst, now)
+        else:
+            bucket.refill(now, self.key_rate, self.key_burst)
+        return bucket
+
+    def _take_token(self, key: Hashable, now: float) -> bool:
+        if key is None or self.key_rate == float("inf"):
+            return True
+
+        bucket = self._get_bucket(key, now)
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def _prune_buckets(self, now: float) -> None:
+        if now < self._next_bucket_prune:
+            return
+
+        # Full buckets behave the same as missing ones
+        self._next_bucket_prune = now + self.key_burst / self.key_rate
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill(now, self.key_rate, self.key_burst)
+            if bucket.tokens >= self.key_burst:
+                del self._buckets[key]
+
+    async def _wait(self, priority: Priority, key: Hashable) -> None:
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority].get(key)
+        if queue is None:
+            queue = self._queues[priority][key] = deque()
+        queue.append(future)
+        self._n_waiting += 1
+        self._update_degraded()
+        # Capacity may be free while this key waits for a token
+        self._wake_waiters()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted right before being cancelled, so pass the slot on
+                self._finish(priority, key)
+                self._wake_waiters()
+            else:
+                self._discard_waiter(priority, key, future)
+            raise
+
+    def _discard_waiter(
+        self,
+        priority: Priority,
+        key: Hashable,
+        future: asyncio.Future[None],
+    ) -> None:
+        queue = self._queues[priority].get(key)
+        if queue is None or future not in queue:
+            return  # Already discarded by _wake_waiters()
+
+        queue.remove(future)
+        if not queue:
+            del self._queues[priority][key]
+        self._n_waiting -= 1
+        self._update_degraded()
+
+    def _wake_waiters(self) -> None:
+        now = time.monotonic()
+        next_refill: float | None = None
+
+        for priority, queues in self._queues.items():
+            # Each key gets one turn per pass, and passes repeat
+            # until the class is full or no key can be admitted
+            while queues and self._has_capacity(priority):
+                admitted = False
+                for key in list(queues):
+                    if not self._has_capacity(priority):
+                        break
+                    if not self._has_key_capacity(key):
+                        continue
+                    if not self._take_token(key, now):
+                        wait = (1 - self._buckets[key].tokens) / self.key_rate
+                        if next_refill is None or wait < next_refill:
+                            next_refill = wait
+                        continue
+
+                    queue = queues[key]
+                    future = queue.popleft()
+                    self._n_waiting -= 1
+                    if queue:
+                        queues.move_to_end(key)
+                    else:
+                        del queues[key]
+
+                    admitted = True
+                    if future.cancelled():
+                        # Refund the token taken for the cancelled waiter
+                        if key is not None and key in self._buckets:
+                            self._buckets[key].tokens += 1
+                        continue
+
+                    # Slots are counted here so they cannot be taken
+                    # by new work before the waiter resumes
+                    self._start(priority, key)
+                    future.set_result(None)
+
+                if not admitted:
+                    break
+
+        self._update_degraded()
+        if self.key_rate != float("inf"):
+            self._prune_buckets(now)
+        self._schedule_refill(next_refill)
+
+    def _schedule_refill(self, delay: float | None) -> None:
+        if self._refill_handle is not None:
+            self._refill_handle.cancel()
+            self._refill_handle = None
+        if delay is not None:
+            loop = asyncio.get_running_loop()
+            self._refill_handle = loop.call_later(delay, self._wake_waiters)
+
+    def _update_degraded(self) -> None:
+        if self.degraded_since is None and self._n_waiting < self.degraded_depth:
+            return  # Too few tasks to degrade, even if none are throttled
+
+        contended = self.contended
+        if self.degraded_since is None and contended >= self.degraded_depth:
+            self.degraded_since = time.monotonic()
+            log.warning(
+                "Shedding low-priority work with %d tasks waiting for the database",
+                contended,
+            )
+        elif self.degraded_since is not None and contended <= self.degraded_depth // 2:
+            elapsed = time.monotonic() - self.degraded_since
+            self.degraded_since = None
+            log.info(
+                "Stopped shedding work after %.1fs (%s shed since startup)",
+                elapsed,
+                ", ".join(f"{p.name.lower()}={n}" for p, n in self.shed.items())
+                or "none",
+            )
@@ -2,12 +2,13 @@ from __future__ import annotations
 
 import importlib.metadata
 import logging
-from typing import TYPE_CHECKING, Callable
+from typing import TYPE_CHECKING, Any, Callable
 
 import asyncpg
 from discord.ext import commands
 
 from .database import DatabaseClient
+from .dispatch import RawEventDispatcher
 from .partials import PartialResolver
 from .translator import GettextTranslator
 
@@ -16,6 +17,8 @@ if TYPE_CHECKING:
 
 log = logging.getLogger(__name__)
 
+GatewayFilter = Callable[[dict[str, Any]], bool]
+
 
 # https://discordpy.readthedocs.io/en/stable/ext/commands/api.html
 class Bot(commands.Bot):
@@ -25,14 +28,19 @@ class Bot(commands.Bot):
     def __init__(self, config_refresher: Callable[[], Settings]):
         self._config_refresher = config_refresher
         config = self.refresh_config()
+        self.channel_scheduler = config.bot.http.create_scheduler()
 
         super().__init__(
             command_prefix=commands.when_mentioned,
+            http_trace=self.channel_scheduler.create_trace_config(),
             intents=config.bot.intents.create_intents(),
             strip_after_prefix=True,
         )
 
         self.resolve = PartialResolver(self)
+        self.admission = config.db.admission.create_controller()
+        self.raw_events = RawEventDispatcher(self)
+        self._gateway_filters: dict[str, list[GatewayFilter]] = {}
 
     async def _maybe_load_jishaku(self) -> None:
         if not self.config.bot.allow_jishaku:
@@ -46,9 +54,46 @@ class Bot(commands.Bot):
             await self.load_extension("jishaku")
             log.info("Loaded jishaku extension (version: %s)", version)
 
+    def add_gateway_filter(self, event: str, check: GatewayFilter) -> None:
+        """Adds a check for raw gateway payloads of the given event.
+
+        Checks run on the payload dict before discord.py parses it,
+        and the event is discarded without constructing any objects
+        or dispatching any listeners if a check returns False.
+        Since this affects every extension, checks should only discard
+        events that no listener needs.
+
+        :param event: The gateway event name, e.g. ``MESSAGE_REACTION_ADD``.
+
+        """
+        checks = self._gateway_filters.get(event)
+        if checks is None:
+            checks = self._gateway_filters[event] = []
+            parsers = self._connection.parsers
+            parse = parsers[event]
+
+            def parse_filtered(data: dict[str, Any]) -> None:
+                for check in checks:
+                    if not check(data):
+                        return
+                parse(data)
+
+            parsers[event] = parse_filtered
+
+        checks.append(check)
+
+    def remove_gateway_filter(self, event: str, check: GatewayFilter) -> None:
+        """Removes a check added by :meth:`add_gateway_filter()`."""
+        checks = self._gateway_filters.get(event)
+        if checks is not None and check in checks:
+            checks.remove(check)
+
     def refresh_config(self) -> Settings:
         config = self._config_refresher()
         self.config = config
+        if hasattr(self, "query"):
+            self.query.default_star_emojis = config.starboard.create_star_emojis()
+            self.query.starboard_routes.clear()
         return config
 
     async def setup_hook(self) -> None:
@@ -62,7 +107,18 @@ class Bot(commands.Bot):
     async def start(self, *args, **kwargs) -> None:
         async with self.config.db.create_pool() as pool:
             self.pool = pool
-            self.query = DatabaseClient(pool)
+            self.query = DatabaseClient(
+                pool,
+                default_star_emojis=self.config.starboard.create_star_emojis(),
+                max_retries=self.config.db.max_retries,
+                retry_delay=self.config.db.retry_delay,
+                max_retry_delay=self.config.db.max_retry_delay,
+            )
+
+            async with self.query.acquire() as query:
+                await query.load_message_ids()
+            log.info("Loaded %d message IDs", len(self.query.message_ids))
+
             return await super().start(*args, **kwargs)
 
 
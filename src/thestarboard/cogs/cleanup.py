@@ -1,38 +1,285 @@
+import asyncio
+import datetime
+import logging
+from collections import Counter
+from typing import Awaitable, Callable
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
+from thestarboard.admission import LoadShed, Priority
 from thestarboard.bot import Bot
+from thestarboard.database import DatabaseClient
+from thestarboard.dispatch import RawMessageDeletion
+
+log = logging.getLogger(__name__)
+
+GCStage = Callable[..., Awaitable[tuple[int | None, int]]]
+
+# Messages are collected first since they may be the last references
+# to their channels and users
+_GC_STAGES: dict[str, GCStage] = {
+    "messages": DatabaseClient.collect_orphaned_messages,
+    "channels": DatabaseClient.collect_orphaned_channels,
+    "users": DatabaseClient.collect_orphaned_users,
+}
 
 
 class Cleanup(commands.Cog):
+    """Removes deleted Discord objects from the database.
+
+    Deletions are buffered and flushed in batches every
+    :attr:`SettingsCleanup.delete_interval` seconds, and messages
+    that were never stored are ignored entirely.
+
+    Removed guilds are marked for purging instead, and their rows are
+    deleted in the background in small chunks so that large guilds
+    do not hold locks for long periods of time.
+
+    Rows that were missed by the above, such as those left behind during
+    downtime, are removed by a periodic garbage collector that scans each
+    table in keyset-paginated batches within a limited time budget.
+
+    Finally, message tables are partitioned by month, and partitions too
+    old to be starboarded are dropped by a daily maintenance task.
+
+    Apart from partition maintenance, these tasks are admitted with
+    :attr:`Priority.CLEANUP` and skipped while the bot is shedding load,
+    leaving their work pending until the next run.
+
+    """
+
     def __init__(self, bot: Bot):
         self.bot = bot
+        self._pending_guild_ids: set[int] = set()
+        self._pending_channel_ids: set[int] = set()
+        self._pending_message_ids: set[int] = set()
+        # Assume a purge was interrupted until proven otherwise
+        self._purge_active = True
+
+        self._gc_stage = 0
+        self._gc_cursor = 0
+        self.gc_reclaimed: Counter[str] = Counter()
+        """The number of rows reclaimed by garbage collection since startup."""
+        self.gc_last_run: datetime.datetime | None = None
+
+    async def cog_load(self):
+        # Runs after other stages, which may still need the deleted rows
+        self.bot.raw_events.add_stage(
+            "message_delete",
+            self.remove_messages,
+            order=100,
+            transaction=False,
+        )
+
+        config = self.bot.config.cleanup
+        self.flush_deletes.change_interval(seconds=config.delete_interval)
+        self.flush_deletes.start()
+        self.purge_guilds.change_interval(seconds=config.purge_pause)
+        self.purge_guilds.start()
+        self.collect_garbage.change_interval(seconds=config.gc.interval)
+        if config.gc.enabled:
+            self.collect_garbage.start()
+        self.maintain_partitions.change_interval(seconds=config.partitions.interval)
+        if config.partitions.enabled:
+            self.maintain_partitions.start()
+
+    async def cog_unload(self):
+        self.bot.raw_events.remove_stage("message_delete", self.remove_messages)
+        self.maintain_partitions.cancel()
+        self.collect_garbage.cancel()
+        self.purge_guilds.cancel()
+        self.flush_deletes.cancel()
+        await self.flush()
+
+    @commands.Cog.listener("on_guild_join")
+    async def restore_guild(self, guild: discord.Guild):
+        self._pending_guild_ids.discard(guild.id)
+        async with self.bot.query.acquire() as query:
+            await query.unmark_guild_purge(guild.id)
 
     @commands.Cog.listener("on_guild_remove")
     async def remove_guild(self, guild: discord.Guild):
-        async with self.bot.pool.acquire() as conn:
-            await conn.execute("DELETE FROM guild WHERE id = $1", guild.id)
+        self._pending_guild_ids.add(guild.id)
 
     @commands.Cog.listener("on_guild_channel_delete")
     async def remove_guild_channel(self, channel: discord.abc.GuildChannel):
-        async with self.bot.pool.acquire() as conn:
-            await conn.execute("DELETE FROM channel WHERE id = $1", channel.id)
-
-    @commands.Cog.listener("on_raw_message_delete")
-    async def remove_message(self, payload: discord.RawMessageDeleteEvent):
-        async with self.bot.pool.acquire() as conn:
-            await conn.execute("DELETE FROM message WHERE id = $1", payload.message_id)
-
-    @commands.Cog.listener("on_raw_bulk_message_delete")
-    async def bulk_remove_messages(self, payload: discord.RawBulkMessageDeleteEvent):
-        async with self.bot.pool.acquire() as conn:
-            await conn.execute(
-                "DELETE FROM message WHERE id = any($1::bigint[])",
-                payload.message_ids,
+        self._pending_channel_ids.add(channel.id)
+
+    async def remove_messages(self, deletion: RawMessageDeletion):
+        self._pending_message_ids |= deletion.message_ids
+
+    # NOTE: users are not removed by any event, see collect_garbage()
+
+    @tasks.loop(seconds=5)
+    async def flush_deletes(self):
+        try:
+            async with self.bot.admission.admit(Priority.CLEANUP):
+                await self.flush()
+        except LoadShed:
+            pass
+        except Exception:
+            log.exception("Failed to flush pending deletions")
+
+    async def flush(self) -> None:
+        """Deletes all pending channels and messages in one transaction.
+
+        Pending guilds are marked for purging rather than deleted.
+        If the transaction fails, everything is kept pending for the
+        next flush, except for guilds that the bot has since rejoined.
+
+        """
+        guild_ids, self._pending_guild_ids = self._pending_guild_ids, set()
+        channel_ids, self._pending_channel_ids = self._pending_channel_ids, set()
+        message_ids, self._pending_message_ids = self._pending_message_ids, set()
+
+        if not (guild_ids or channel_ids or message_ids):
+            return
+
+        try:
+            async for attempt in self.bot.query.retrying():
+                async with attempt as query:
+                    if message_ids:
+                        await query.remove_messages(message_ids)
+                    if channel_ids:
+                        await query.remove_channels(channel_ids)
+                    if guild_ids:
+                        await query.mark_guild_purges(guild_ids)
+        except BaseException:
+            self._pending_message_ids |= message_ids
+            self._pending_channel_ids |= channel_ids
+            self._pending_guild_ids |= {
+                guild_id
+                for guild_id in guild_ids
+                if self.bot.get_guild(guild_id) is None
+            }
+            raise
+
+        if guild_ids:
+            self._purge_active = True
+
+        log.debug(
+            "Removed %d channels and %d messages, marked %d guilds for purging",
+            len(channel_ids),
+            len(message_ids),
+            len(guild_ids),
+        )
+
+    @tasks.loop(seconds=1)
+    async def purge_guilds(self):
+        if not self._purge_active:
+            return
+
+        try:
+            async with self.bot.admission.admit(Priority.CLEANUP):
+                await self.purge_next_chunk()
+        except LoadShed:
+            pass
+        except Exception:
+            log.exception("Failed to purge guild chunk")
+
+    async def purge_next_chunk(self) -> None:
+        """Deletes one chunk of rows from the oldest pending guild purge."""
+        async with self.bot.query.acquire() as query:
+            purges = await query.get_guild_purges()
+            if not purges:
+                self._purge_active = False
+                return
+
+            guild_id = purges[0]["guild_id"]
+            n_deleted = await query.purge_guild(
+                guild_id,
+                limit=self.bot.config.cleanup.purge_chunk_size,
             )
 
-    # NOTE: users are not removed by any event
-    # NOTE: rows can still accumulate during bot downtime
+        if n_deleted == 0:
+            log.info("Finished purging guild %d", guild_id)
+
+    @tasks.loop(hours=1)
+    async def collect_garbage(self):
+        try:
+            async with self.bot.admission.admit(Priority.CLEANUP):
+                reclaimed = await self.run_gc()
+        except LoadShed:
+            pass
+        except Exception:
+            log.exception("Failed to collect garbage")
+        else:
+            if reclaimed:
+                log.info("Garbage collection reclaimed %s", dict(reclaimed))
+
+    async def run_gc(self) -> Counter[str]:
+        """Deletes unreferenced rows until the time budget is exhausted.
+
+        Each batch is deleted in its own transaction. Progress is kept
+        between runs, so the next run resumes from the last scanned row,
+        and a run ends early once every table has been fully scanned.
+
+        :returns: The number of rows reclaimed from each table.
+
+        """
+        config = self.bot.config.cleanup.gc
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.time_budget
+        stages = list(_GC_STAGES.items())
+        reclaimed: Counter[str] = Counter()
+
+        stages_finished = 0
+        while stages_finished < len(stages) and loop.time() < deadline:
+            name, collect = stages[self._gc_stage]
+            async with self.bot.query.acquire() as query:
+                last_id, n_deleted = await collect(
+                    query,
+                    after=self._gc_cursor,
+                    limit=config.batch_size,
+                )
+
+            reclaimed[name] += n_deleted
+            if last_id is not None:
+                self._gc_cursor = last_id
+            else:
+                self._gc_stage = (self._gc_stage + 1) % len(stages)
+                self._gc_cursor = 0
+                stages_finished += 1
+
+        self.gc_reclaimed.update(reclaimed)
+        self.gc_last_run = discord.utils.utcnow()
+        return +reclaimed
+
+    @tasks.loop(hours=24)
+    async def maintain_partitions(self):
+        try:
+            await self.run_partition_maintenance()
+        except Exception:
+            log.exception("Failed to maintain message partitions")
+
+    async def run_partition_maintenance(self) -> tuple[int, int]:
+        """Creates future message partitions and drops expired ones.
+
+        :returns: The number of partitions created and months dropped.
+
+        """
+        config = self.bot.config.cleanup.partitions
+        now = discord.utils.utcnow()
+        until = now + datetime.timedelta(days=31 * config.months_ahead)
+
+        async with self.bot.query.acquire() as query:
+            n_created = await query.create_message_partitions(until)
+
+        async with self.bot.query.acquire() as query:
+            max_message_age = await query.get_max_starboard_age_of_all_guilds()
+            margin = datetime.timedelta(days=config.retention_margin_days)
+            n_dropped = await query.drop_message_partitions(
+                now - max_message_age - margin
+            )
+
+        if n_created or n_dropped:
+            log.info(
+                "Created %d message partitions and dropped %d months",
+                n_created,
+                n_dropped,
+            )
+        return n_created, n_dropped
 
 
 async def setup(bot: Bot):
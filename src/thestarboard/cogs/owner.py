@@ -1,8 +1,18 @@
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Mapping
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 
+from thestarboard.admission import Priority
 from thestarboard.bot import Bot, Context
+from thestarboard.transfer import TransferError, export_guild, import_guild
+
+if TYPE_CHECKING:
+    from thestarboard.cogs.cleanup import Cleanup
+    from thestarboard.cogs.stars.events import StarboardEvents
 
 
 def count_localizations(command: app_commands.AppCommand) -> int:
@@ -24,6 +34,16 @@ def count_localizations(command: app_commands.AppCommand) -> int:
     return n
 
 
+def _format_reclaimed(reclaimed: Mapping[str, int]) -> str:
+    if not any(reclaimed.values()):
+        return "no rows reclaimed"
+    return ", ".join(f"{n} {table}" for table, n in reclaimed.items() if n)
+
+
+def _format_rows(counts: Mapping[str, int]) -> str:
+    return ", ".join(f"{n} {table}" for table, n in counts.items()) or "no rows"
+
+
 class Owner(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
@@ -37,6 +57,131 @@ class Owner(commands.Cog):
         self.bot.refresh_config()
         await ctx.reply("Config reloaded!")
 
+    @commands.command(name="export")
+    async def export(self, ctx: Context, guild_id: int, path: Path | None = None):
+        """Export a guild's starboard data to a file on the bot's host."""
+        if path is None:
+            path = Path(f"guild-{guild_id}.jsonl.gz")
+
+        async with ctx.typing():
+            counts = await export_guild(self.bot.pool, guild_id, path)
+
+        await ctx.send(
+            f"Exported guild {guild_id} to `{path}` ({_format_rows(counts)})"
+        )
+
+    @commands.command(name="import")
+    async def import_(self, ctx: Context, path: Path):
+        """Import a guild's starboard data from a file on the bot's host.
+
+        Interrupted imports can be resumed by importing the same file again.
+
+        """
+        async with ctx.typing():
+            try:
+                guild_id, counts = await import_guild(self.bot.pool, path)
+            except (EOFError, OSError, TransferError) as e:
+                return await ctx.send(f"Could not import `{path}`: {e}")
+
+            # The imported guild's starboards may have replaced cached ones
+            self.bot.query.invalidate_starboard_routes(guild_id)
+            async with self.bot.query.acquire() as query:
+                await query.load_message_ids()
+
+        await ctx.send(
+            f"Imported guild {guild_id} from `{path}` ({_format_rows(counts)})"
+        )
+
+    @commands.command(name="gc")
+    async def gc(self, ctx: Context, run: bool = False):
+        """Show the rows reclaimed by garbage collection, optionally running it now."""
+        cleanup: Cleanup | None = self.bot.get_cog("Cleanup")  # type: ignore
+        if cleanup is None:
+            return await ctx.send("The cleanup extension is not loaded.")
+
+        lines = []
+        if run:
+            async with ctx.typing():
+                reclaimed = await cleanup.run_gc()
+            lines.append(f"This run: {_format_reclaimed(reclaimed)}")
+
+        if cleanup.gc_last_run is None:
+            return await ctx.send("Garbage collection has not run yet.")
+
+        lines.append(f"Since startup: {_format_reclaimed(cleanup.gc_reclaimed)}")
+        lines.append(
+            f"Last run: {discord.utils.format_dt(cleanup.gc_last_run, 'R')}",
+        )
+        await ctx.send("\n".join(lines))
+
+    @commands.command(name="retries")
+    async def retries(self, ctx: Context):
+        """Show the database transactions retried since startup."""
+        query = self.bot.query
+        if not query.retries and not query.retries_exhausted:
+            return await ctx.send("No transactions have been retried.")
+
+        lines = [
+            f"{name}: {query.retries[name]} retries, "
+            f"{query.retries_exhausted[name]} gave up"
+            for name in sorted(query.retries | query.retries_exhausted)
+        ]
+        await ctx.send("\n".join(lines))
+
+    @commands.command(name="load")
+    async def load(self, ctx: Context):
+        """Show the work admitted to the database and any shed under load."""
+        admission = self.bot.admission
+        if admission.degraded_since is not None:
+            elapsed = time.monotonic() - admission.degraded_since
+            status = f"Shedding low-priority work for {elapsed:.0f}s"
+        else:
+            status = "Not shedding work"
+
+        lines = [
+            f"{status}, {admission.waiting} tasks waiting "
+            f"across {admission.waiting_keys} queues"
+        ]
+        for priority in Priority:
+            lines.append(
+                f"{priority.name.lower()}: "
+                f"{admission.in_flight[priority]}/{admission.limits[priority]} "
+                f"in flight, {admission.shed[priority]} shed"
+            )
+
+        scheduler = self.bot.channel_scheduler
+        lines.append(
+            f"http: {scheduler.waiting} requests waiting, "
+            f"{scheduler.rate_limited.total()} rate limited since startup"
+        )
+
+        events: StarboardEvents | None = self.bot.get_cog("StarboardEvents")  # type: ignore
+        if events is not None and events.jobs is not None:
+            async with self.bot.query.acquire(transaction=False) as query:
+                pending = await query.get_starboard_job_count()
+            jobs = events.jobs
+            lines.append(
+                f"jobs: {pending} queued, {jobs.running} running here, "
+                f"{jobs.completed} completed and {jobs.failed} failed since startup"
+            )
+        await ctx.send("\n".join(lines))
+
+    @commands.command(name="purges")
+    async def purges(self, ctx: Context):
+        """Show the progress of pending guild purges."""
+        async with self.bot.query.acquire() as query:
+            purges = await query.get_guild_purges()
+
+        if not purges:
+            return await ctx.send("No guilds are being purged.")
+
+        lines = [
+            f"{row['guild_id']}: {row['rows_deleted']} rows deleted "
+            f"since {discord.utils.format_dt(row['requested_at'], 'R')}"
+            for row in purges
+        ]
+        await ctx.send("\n".join(lines))
+
     @commands.command(name="sync")
     async def sync(self, ctx: Context, guild_id: int | None = None):
         """Synchronize the bot's application commands."""
@@ -2,8 +2,12 @@ from thestarboard.bot import Bot
 
 from .commands import StarboardCommands
 from .events import StarboardEvents
+from .leaderboard import StarboardLeaderboards
+from .reconcile import StarboardReconciler
 
 
 async def setup(bot: Bot):
     await bot.add_cog(StarboardCommands(bot))
     await bot.add_cog(StarboardEvents(bot))
+    await bot.add_cog(StarboardLeaderboards(bot))
+    await bot.add_cog(StarboardReconciler(bot))
@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+PERCENTILES: tuple[int, ...] = (50, 75, 90, 95, 99)
+
+
+@dataclass(frozen=True)
+class ThresholdAnalysis:
+    """The distribution of star totals and its projected starboard activity."""
+
+    n_messages: int
+    """The number of starred messages analyzed."""
+    percentiles: dict[int, float]
+    """A mapping of percentiles to the star total at that percentile."""
+    posts_per_day: dict[int, float]
+    """A mapping of candidate thresholds to their projected posts per day."""
+    suggestion: int
+    """The lowest threshold projected to stay within the target rate."""
+
+
+def analyze_star_totals(
+    totals: Sequence[int],
+    counts: Sequence[int],
+    *,
+    days: float,
+    target_posts_per_day: float,
+    candidates: Sequence[int] = (),
+    max_threshold: int = 100,
+) -> ThresholdAnalysis:
+    """Analyzes a histogram of star totals to suggest a star threshold.
+
+    Every statistic is computed with vectorized NumPy operations over the
+    histogram, so the cost depends on the number of distinct totals
+    rather than the number of messages.
+
+    :param totals: The distinct star totals in ascending order.
+    :param counts: The number of messages with each star total.
+    :param days: The number of days the histogram spans.
+    :param target_posts_per_day:
+        The maximum number of starboard posts per day desired.
+    :param candidates:
+        Additional thresholds to project posts per day for,
+        such as the guild's current threshold.
+    :param max_threshold: The highest threshold that may be suggested.
+
+    """
+    totals_arr = np.asarray(totals, dtype=np.int64)
+    counts_arr = np.asarray(counts, dtype=np.int64)
+    n_messages = int(counts_arr.sum())
+
+    # Number of messages with at least each threshold from 1 to max_threshold
+    thresholds = np.arange(1, max_threshold + 1)
+    at_least = np.concatenate((counts_arr[::-1].cumsum()[::-1], [0]))
+    n_reaching = at_least[np.searchsorted(totals_arr, thresholds, side="left")]
+    rates = n_reaching / days
+
+    within_target = np.flatnonzero(rates <= target_posts_per_day)
+    if len(within_target) > 0:
+        suggestion = int(thresholds[within_target[0]])
+    else:
+        suggestion = max_threshold
+
+    if n_messages > 0:
+        # Same as np.percentile(np.repeat(...), method="inverted_cdf")
+        # without expanding the histogram into one element per message
+        ranks = np.ceil(np.asarray(PERCENTILES) / 100 * n_messages)
+        indices = np.searchsorted(counts_arr.cumsum(), ranks, side="left")
+        values = totals_arr[indices].astype(float)
+    else:
+        values = np.zeros(len(PERCENTILES))
+    percentiles = dict(zip(PERCENTILES, values.tolist()))
+
+    candidate_set = {suggestion, *candidates}
+    candidate_set.update(int(v) for v in values if v >= 1)
+    posts_per_day = {
+        int(t): float(rates[t - 1])
+        for t in sorted(candidate_set)
+        if 1 <= t <= max_threshold
+    }
+
+    return ThresholdAnalysis(
+        n_messages=n_messages,
+        percentiles=percentiles,
+        posts_per_day=posts_per_day,
+        suggestion=suggestion,
+    )
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+import discord
+
+from thestarboard.bot import Bot
+
+from .reconcile import fetch_message_stars, is_star_reaction
+
+if TYPE_CHECKING:
+    import asyncpg
+
+ProgressCallback = Callable[["asyncpg.Record"], Awaitable[Any]]
+
+
+class ChannelBackfill:
+    """Loads starred messages from a channel's history into the database.
+
+    The channel is scanned from newest to oldest until messages become too
+    old for every starboard, reading reaction counts from each page of
+    history. Only messages with enough stars to reach the lowest threshold
+    of the channel's starboards have their reaction users fetched.
+
+    Messages are loaded in batches of :attr:`SettingsStarboardBackfill.batch_size`,
+    each committed together with a checkpoint so that an interrupted backfill
+    resumes from the oldest message scanned. Since only one batch is kept
+    in memory at a time, memory usage does not grow with the channel's size.
+
+    """
+
+    def __init__(self, bot: Bot, channel: discord.TextChannel) -> None:
+        self.bot = bot
+        self.channel = channel
+
+    async def run(self, on_progress: ProgressCallback | None = None) -> asyncpg.Record:
+        """Runs the backfill until completion.
+
+        :param on_progress: A callback invoked with the progress after each batch.
+        :returns: The final progress of the backfill.
+
+        """
+        config = self.bot.config.starboard.backfill
+        guild_id = self.channel.guild.id
+
+        async with self.bot.query.acquire() as query:
+            state = await query.start_channel_backfill(
+                self.channel.id,
+                guild_id=guild_id,
+            )
+            routes = await query.get_starboard_routes(guild_id)
+            default_threshold = await query.get_starboard_threshold(guild_id)
+
+        # Messages are stored if they could reach any of the channel's starboards
+        threshold = min(
+            (starboard.threshold for starboard in routes.route(self.channel.id)),
+            default=default_threshold,
+        )
+
+        before = None
+        if state["before_message_id"] is not None:
+            before = discord.Object(state["before_message_id"])
+        cutoff = discord.utils.utcnow() - routes.max_message_age
+
+        messages: list[tuple[int, int]] = []
+        stars: list[tuple[int, int, str]] = []
+        n_scanned = 0
+        oldest_id = 0
+
+        async for message in self.channel.history(limit=None, before=before):
+            if message.created_at < cutoff:
+                break
+
+            n_scanned += 1
+            oldest_id = message.id
+
+            n_stars = sum(
+                reaction.count
+                for reaction in message.reactions
+                if is_star_reaction(reaction, routes.star_emojis)
+            )
+            if n_stars >= threshold:
+                users = await fetch_message_stars(message, routes.star_emojis)
+                if users:
+                    messages.append((message.id, message.author.id))
+                    stars.extend(
+                        (message.id, user_id, emojis[0])
+                        for user_id, emojis in users.items()
+                    )
+
+            if n_scanned >= config.batch_size:
+                state = await self._load(oldest_id, n_scanned, messages, stars)
+                messages, stars, n_scanned = [], [], 0
+                if on_progress is not None:
+                    await on_progress(state)
+                await asyncio.sleep(config.pause)
+
+        if n_scanned > 0:
+            state = await self._load(oldest_id, n_scanned, messages, stars)
+
+        async with self.bot.query.acquire() as query:
+            await query.finish_channel_backfill(self.channel.id)
+            state = await query.get_channel_backfill(self.channel.id)
+
+        assert state is not None
+        return state
+
+    async def _load(
+        self,
+        oldest_id: int,
+        n_scanned: int,
+        messages: list[tuple[int, int]],
+        stars: list[tuple[int, int, str]],
+    ) -> asyncpg.Record:
+        state = None
+        async for attempt in self.bot.query.retrying():
+            async with attempt as query:
+                await query.load_channel_backfill(
+                    self.channel.id,
+                    before_message_id=oldest_id,
+                    messages_scanned=n_scanned,
+                    messages=messages,
+                    stars=stars,
+                )
+                state = await query.get_channel_backfill(self.channel.id)
+
+        assert state is not None
+        return state
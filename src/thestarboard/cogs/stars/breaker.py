@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+
+import discord
+
+# https://discord.com/developers/docs/topics/opcodes-and-status-codes#json
+UNKNOWN_MESSAGE = 10008
+
+
+class _ChannelCircuit:
+    __slots__ = ("failures", "open_until")
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.open_until = 0.0
+
+
+class StarboardBreaker:
+    """Stops requests to starboard channels and posts that recently failed.
+
+    A post that returned Unknown Message is remembered as dead for
+    `cooldown` seconds, and any other NotFound or Forbidden error trips
+    the circuit of the post's starboard channel, skipping every request
+    to that channel until it cools down. Each consecutive failure after
+    cooling down doubles the channel's cooldown up to `max_cooldown`,
+    and a successful request closes the circuit again. Channels are
+    forgotten once they have been closed for `max_cooldown` seconds.
+    A channel that fails again after cooling down for `max_cooldown`
+    is exhausted (see :meth:`is_exhausted()`).
+
+    Dead posts are kept in least recently failed order, and the oldest
+    are evicted once `max_messages` is exceeded.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        cooldown: float,
+        max_cooldown: float,
+        max_messages: int,
+    ) -> None:
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_messages = max_messages
+        self._channels: dict[int, _ChannelCircuit] = {}
+        self._dead_messages: OrderedDict[int, float] = OrderedDict()
+
+    @staticmethod
+    def is_message_error(error: discord.HTTPException) -> bool:
+        """Checks if an error only affects the requested message
+        rather than its whole channel.
+        """
+        return isinstance(error, discord.NotFound) and error.code == UNKNOWN_MESSAGE
+
+    def is_open(self, channel_id: int, *, now: float | None = None) -> bool:
+        """Checks if requests to the given channel should be skipped."""
+        circuit = self._channels.get(channel_id)
+        if circuit is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        if now < circuit.open_until:
+            return True
+
+        if now >= circuit.open_until + self.max_cooldown:
+            del self._channels[channel_id]
+        return False
+
+    def is_exhausted(self, channel_id: int) -> bool:
+        """Checks if the given channel failed again after being skipped
+        for `max_cooldown` seconds.
+        """
+        circuit = self._channels.get(channel_id)
+        if circuit is None or circuit.failures < 2:
+            return False
+        return self.cooldown * 2 ** (circuit.failures - 2) >= self.max_cooldown
+
+    def is_dead(self, message_id: int, *, now: float | None = None) -> bool:
+        """Checks if requests to the given post should be skipped."""
+        expires_at = self._dead_messages.get(message_id)
+        if expires_at is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        if now < expires_at:
+            return True
+
+        del self._dead_messages[message_id]
+        return False
+
+    def record_failure(
+        self,
+        channel_id: int,
+        message_id: int | None,
+        error: discord.HTTPException,
+        *,
+        now: float | None = None,
+    ) -> None:
+        """Records a NotFound or Forbidden error from a starboard request.
+
+        :param message_id:
+            The ID of the post that was requested,
+            or None if a new post was being sent.
+
+        """
+        if now is None:
+            now = time.monotonic()
+
+        if message_id is not None and self.is_message_error(error):
+            self._dead_messages[message_id] = now + self.cooldown
+            self._dead_messages.move_to_end(message_id)
+            while len(self._dead_messages) > self.max_messages:
+                self._dead_messages.popitem(last=False)
+            return
+
+        circuit = self._channels.get(channel_id)
+        if circuit is None:
+            circuit = self._channels[channel_id] = _ChannelCircuit()
+        elif now < circuit.open_until:
+            return  # Sent before the circuit opened, so not a new failure
+        circuit.failures += 1
+        cooldown = self.cooldown * 2 ** (circuit.failures - 1)
+        circuit.open_until = now + min(cooldown, self.max_cooldown)
+
+    def record_success(self, channel_id: int) -> None:
+        """Closes the circuit of a channel after a successful request."""
+        self._channels.pop(channel_id, None)
@@ -1,4 +1,6 @@
+import asyncio
 import datetime
+import logging
 from typing import Literal, cast
 
 import discord
@@ -7,8 +9,16 @@ from discord.app_commands import locale_str as _
 from discord.ext import commands
 
 from thestarboard.bot import Bot
+from thestarboard.database import LeaderboardPeriod, StarEmojiSet
+from thestarboard.errors import AppCommandResponse
 from thestarboard.translator import plural_locale_str as ngettext, translate
 
+from .analysis import analyze_star_totals
+from .backfill import ChannelBackfill
+from .paginator import KeysetPaginator
+
+log = logging.getLogger(__name__)
+
 
 class ThresholdTransformer(app_commands.Transformer):
     @property
@@ -99,16 +109,69 @@ class MaxMessageAgeTransformer(app_commands.Transformer):
         return datetime.timedelta(days=value)
 
 
+class DateTransformer(app_commands.Transformer):
+    """Parses a date in YYYY-MM-DD format as midnight UTC."""
+
+    async def transform(
+        self,
+        interaction: discord.Interaction,
+        value: str,
+    ) -> datetime.datetime:
+        try:
+            date = datetime.date.fromisoformat(value)
+        except ValueError:
+            raise AppCommandResponse(
+                # Response to user when given an invalid date
+                _("Dates should be written as YYYY-MM-DD!")
+            ) from None
+
+        return datetime.datetime.combine(date, datetime.time(), datetime.timezone.utc)
+
+
+class EmojiListTransformer(app_commands.Transformer):
+    """Parses a space-separated list of unicode and custom emojis."""
+
+    async def transform(
+        self,
+        interaction: discord.Interaction,
+        value: str,
+    ) -> list[str]:
+        emojis: dict[str, None] = {}
+        for token in value.split():
+            emoji = discord.PartialEmoji.from_str(token)
+            if emoji.id is None and emoji.name.isascii():
+                raise AppCommandResponse(
+                    # Response to user when given text that is not an emoji
+                    _("Emojis should be separated by spaces!")
+                )
+            emojis[str(emoji)] = None
+
+        if not 0 < len(emojis) <= 20:
+            raise AppCommandResponse(
+                # Response to user when given too few or too many emojis
+                _("Between 1 and 20 emojis should be given!")
+            )
+
+        return list(emojis)
+
+
 ThresholdTransform = app_commands.Transform[int, ThresholdTransformer]
 MaxMessageAgeTransform = app_commands.Transform[
     datetime.timedelta,
     MaxMessageAgeTransformer,
 ]
+DateTransform = app_commands.Transform[datetime.datetime, DateTransformer]
+EmojiListTransform = app_commands.Transform[list[str], EmojiListTransformer]
 
 
 class StarboardCommands(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
+        self._backfills: dict[int, asyncio.Task] = {}
+
+    async def cog_unload(self):
+        for task in self._backfills.values():
+            task.cancel()
 
     config = app_commands.Group(
         # Command group name (/config)
@@ -157,23 +220,23 @@ class StarboardCommands(commands.Cog):
             if channel_changed:
                 await query.set_starboard_channel(channel_id, guild_id=guild_id)
 
-            responses: dict[tuple[bool, bool], _] = {
-                # Response from /config set-channel
-                (True, True): _("Successfully set the starboard channel to {0}!"),
-                # Response from /config set-channel
-                (True, False): _("Successfully unset the starboard channel!"),
-                # Response from /config set-channel
-                (False, True): _("{0} is already the starboard channel!"),
-                # Response from /config set-channel
-                (False, False): _("There is already no starboard channel set!"),
-            }
-
-            channel_set = channel_id is not None
-            response_key = responses[channel_changed, channel_set]
-            content = await translate(response_key, interaction)
-            if channel_set:
-                content = content.format(f"<#{channel_id}>")
-            await interaction.response.send_message(content, ephemeral=True)
+        responses: dict[tuple[bool, bool], _] = {
+            # Response from /config set-channel
+            (True, True): _("Successfully set the starboard channel to {0}!"),
+            # Response from /config set-channel
+            (True, False): _("Successfully unset the starboard channel!"),
+            # Response from /config set-channel
+            (False, True): _("{0} is already the starboard channel!"),
+            # Response from /config set-channel
+            (False, False): _("There is already no starboard channel set!"),
+        }
+
+        channel_set = channel_id is not None
+        response_key = responses[channel_changed, channel_set]
+        content = await translate(response_key, interaction)
+        if channel_set:
+            content = content.format(f"<#{channel_id}>")
+        await interaction.response.send_message(content, ephemeral=True)
 
     @config.command(
         # Subcommand name (/config set-threshold)
@@ -204,15 +267,16 @@ class StarboardCommands(commands.Cog):
             if threshold_changed:
                 await query.set_starboard_threshold(threshold, guild_id=guild_id)
 
-                # Response from /config set-threshold
-                response_key = _("Successfully set the star threshold to {0}!")
-            else:
-                # Response from /config set-threshold
-                response_key = _("The current star threshold is {0}!")
+        if threshold_changed:
+            # Response from /config set-threshold
+            response_key = _("Successfully set the star threshold to {0}!")
+        else:
+            # Response from /config set-threshold
+            response_key = _("The current star threshold is {0}!")
 
-            content = await translate(response_key, interaction)
-            content = content.format(threshold)
-            await interaction.response.send_message(content, ephemeral=True)
+        content = await translate(response_key, interaction)
+        content = content.format(threshold)
+        await interaction.response.send_message(content, ephemeral=True)
 
     @config.command(
         # Subcommand name (/config set-max-age)
@@ -243,18 +307,747 @@ class StarboardCommands(commands.Cog):
             if age_changed:
                 await query.set_max_starboard_age(max_age, guild_id=guild_id)
 
-                response_key = ngettext(
-                    # Response from /config set-max-age
-                    "Successfully set the maximum age to {0} day!",
-                    "Successfully set the maximum age to {0} days!",
+        if age_changed:
+            response_key = ngettext(
+                # Response from /config set-max-age
+                "Successfully set the maximum age to {0} day!",
+                "Successfully set the maximum age to {0} days!",
+            )
+        else:
+            response_key = ngettext(
+                # Response from /config set-max-age
+                "The current maximum age is {0} day!",
+                "The current maximum age is {0} days!",
+            )
+
+        content = await translate(response_key, interaction, data=max_age.days)
+        content = content.format(max_age.days)
+        await interaction.response.send_message(content, ephemeral=True)
+
+    @config.command(
+        # Subcommand name (/config set-rising-rate)
+        name=_("set-rising-rate"),
+        # Subcommand description (/config set-rising-rate)
+        description=_("Sets how fast messages must gain stars to be pinned early."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/config set-rising-rate [rate])
+        rate=_("rate"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/config set-rising-rate [rate])
+        rate=_(
+            "The number of stars required within the rising window, or 0 to disable."
+        ),
+    )
+    async def config_set_rising_rate(
+        self,
+        interaction: discord.Interaction,
+        rate: app_commands.Range[int, 0, 100],
+    ):
+        assert interaction.guild is not None
+        guild_id = interaction.guild.id
+        window = int(self.bot.config.starboard.rising.window // 60)
+
+        async with self.bot.query.acquire() as query:
+            original_rate = await query.get_starboard_rising_rate(guild_id)
+            rate_changed = rate != original_rate
+
+            if rate_changed:
+                await query.set_starboard_rising_rate(rate, guild_id=guild_id)
+
+        if rate == 0 and rate_changed:
+            # Response from /config set-rising-rate
+            response_key = _("Successfully disabled rising messages!")
+        elif rate == 0:
+            # Response from /config set-rising-rate
+            response_key = _("Rising messages are already disabled!")
+        elif rate_changed:
+            response_key = _(
+                # Response from /config set-rising-rate
+                "Successfully set the rising rate to {0} stars within {1} minutes!"
+            )
+        else:
+            response_key = _(
+                # Response from /config set-rising-rate
+                "The current rising rate is {0} stars within {1} minutes!"
+            )
+
+        content = await translate(response_key, interaction)
+        content = content.format(rate, window)
+        await interaction.response.send_message(content, ephemeral=True)
+
+    @config.command(
+        # Subcommand name (/config set-emojis)
+        name=_("set-emojis"),
+        # Subcommand description (/config set-emojis)
+        description=_("Sets the emojis that count as stars."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/config set-emojis [emojis])
+        emojis=_("emojis"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/config set-emojis [emojis])
+        emojis=_(
+            "The emojis to count, separated by spaces. Leave empty to use the defaults."
+        ),
+    )
+    async def config_set_emojis(
+        self,
+        interaction: discord.Interaction,
+        emojis: EmojiListTransform | None = None,
+    ):
+        assert interaction.guild is not None
+        guild_id = interaction.guild.id
+
+        async with self.bot.query.acquire() as query:
+            await query.set_star_emojis(emojis, guild_id=guild_id)
+
+        if emojis is not None:
+            # Response from /config set-emojis
+            response_key = _("Successfully set the star emojis to {0}!")
+        else:
+            # Response from /config set-emojis
+            response_key = _("Successfully reset the star emojis to the defaults!")
+
+        content = await translate(response_key, interaction)
+        if emojis is not None:
+            content = content.format(" ".join(emojis))
+        await interaction.response.send_message(content, ephemeral=True)
+
+    boards = app_commands.Group(
+        # Command group name (/config boards)
+        name=_("boards"),
+        # Command group description (/config boards)
+        description=_("Manage additional starboards."),
+        parent=config,
+    )
+
+    @boards.command(
+        # Subcommand name (/config boards add)
+        name=_("add"),
+        # Subcommand description (/config boards add)
+        description=_("Adds or updates an additional starboard."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/config boards add [channel])
+        channel=_("channel"),
+        # Subcommand parameter name (/config boards add [threshold])
+        threshold=_("threshold"),
+        # Subcommand parameter name (/config boards add [max-age])
+        max_age=_("max-age"),
+        # Subcommand parameter name (/config boards add [source-channel])
+        source_channel=_("source-channel"),
+        # Subcommand parameter name (/config boards add [emojis])
+        emojis=_("emojis"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/config boards add [channel])
+        channel=_("The channel to send starboard messages to."),
+        # Subcommand parameter description (/config boards add [threshold])
+        threshold=_("The number of stars required."),
+        # Subcommand parameter description (/config boards add [max-age])
+        max_age=_("The maximum age in days."),
+        # Subcommand parameter description (/config boards add [source-channel])
+        source_channel=_(
+            "A channel to accept messages from. Without any, all channels are accepted."
+        ),
+        # Subcommand parameter description (/config boards add [emojis])
+        emojis=_("The star emojis to count, separated by spaces. Defaults to all."),
+    )
+    async def config_boards_add(
+        self,
+        interaction: discord.Interaction,
+        channel: discord.TextChannel,
+        threshold: app_commands.Range[int, 1, 100],
+        max_age: app_commands.Range[int, 1, 30] = 7,
+        source_channel: discord.TextChannel | None = None,
+        emojis: EmojiListTransform | None = None,
+    ):
+        assert interaction.guild is not None
+        assert channel.guild == interaction.guild
+        guild_id = interaction.guild.id
+
+        async with self.bot.query.acquire() as query:
+            routes = await query.get_starboard_routes(guild_id)
+            star_emojis = StarEmojiSet.from_strings(emojis or ())
+            if not (
+                star_emojis.names <= routes.star_emojis.names
+                and star_emojis.ids <= routes.star_emojis.ids
+            ):
+                raise AppCommandResponse(
+                    # Response to user when given emojis that are not stars
+                    _("Only star emojis can be counted by a starboard!")
+                )
+
+            if channel.id == await query.get_starboard_channel(guild_id):
+                # Response from /config boards add
+                response_key = _("{0} is already the default starboard channel!")
+            else:
+                await query.add_starboard(
+                    channel.id,
+                    guild_id=guild_id,
+                    threshold=threshold,
+                    max_message_age=datetime.timedelta(days=max_age),
+                    source_channel_id=getattr(source_channel, "id", None),
+                    emojis=emojis,
+                )
+                # Response from /config boards add
+                response_key = _("Successfully updated the starboard {0}!")
+
+        content = await translate(response_key, interaction)
+        content = content.format(channel.mention)
+        await interaction.response.send_message(content, ephemeral=True)
+
+    @boards.command(
+        # Subcommand name (/config boards remove)
+        name=_("remove"),
+        # Subcommand description (/config boards remove)
+        description=_("Removes an additional starboard."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/config boards remove [channel])
+        channel=_("channel"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/config boards remove [channel])
+        channel=_("The starboard channel to remove."),
+    )
+    async def config_boards_remove(
+        self,
+        interaction: discord.Interaction,
+        channel: discord.TextChannel,
+    ):
+        assert interaction.guild is not None
+
+        async with self.bot.query.acquire() as query:
+            removed = await query.remove_starboard(
+                channel.id,
+                guild_id=interaction.guild.id,
+            )
+
+        if removed:
+            # Response from /config boards remove
+            response_key = _("Successfully removed the starboard {0}!")
+        else:
+            # Response from /config boards remove
+            response_key = _("{0} is not an additional starboard!")
+
+        content = await translate(response_key, interaction)
+        content = content.format(channel.mention)
+        await interaction.response.send_message(content, ephemeral=True)
+
+    @boards.command(
+        # Subcommand name (/config boards list)
+        name=_("list"),
+        # Subcommand description (/config boards list)
+        description=_("Lists the starboards of this server."),
+    )
+    async def config_boards_list(self, interaction: discord.Interaction):
+        assert interaction.guild is not None
+
+        async with self.bot.query.acquire() as query:
+            routes = await query.get_starboard_routes(interaction.guild.id)
+
+        if not routes.starboards:
+            # Response from /config boards list
+            response_key = _("There are no starboards set!")
+            content = await translate(response_key, interaction)
+            return await interaction.response.send_message(content, ephemeral=True)
+
+        # Embed title for /config boards list
+        title = await translate(_("Starboards"), interaction)
+        # Shown in /config boards list for starboards without a filter
+        any_filter = await translate(_("any"), interaction)
+        # Describes a starboard in /config boards list
+        line = await translate(
+            _("{0} - {1} stars within {2} days, from {3}, counting {4}"),
+            interaction,
+        )
+
+        lines = []
+        for starboard in routes.starboards:
+            sources = any_filter
+            if starboard.source_channel_ids is not None:
+                sources = " ".join(f"<#{c}>" for c in starboard.source_channel_ids)
+            emojis = any_filter
+            if starboard.emojis is not None:
+                emojis = " ".join(sorted(starboard.emojis))
+
+            lines.append(
+                line.format(
+                    f"<#{starboard.channel_id}>",
+                    starboard.threshold,
+                    starboard.max_message_age.days,
+                    sources,
+                    emojis,
+                )
+            )
+
+        embed = discord.Embed(
+            colour=0xFAF317,
+            title=title,
+            description="\n".join(lines),
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @config.command(
+        # Subcommand name (/config backfill)
+        name=_("backfill"),
+        # Subcommand description (/config backfill)
+        description=_("Loads starred messages from a channel's recent history."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/config backfill [channel])
+        channel=_("channel"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/config backfill [channel])
+        channel=_("The channel to load starred messages from."),
+    )
+    async def config_backfill(
+        self,
+        interaction: discord.Interaction,
+        channel: discord.TextChannel,
+    ):
+        assert interaction.guild is not None
+        assert channel.guild == interaction.guild
+
+        if channel.id in self._backfills:
+            # Response from /config backfill
+            response_key = _("{0} is already being backfilled!")
+        elif not channel.permissions_for(channel.guild.me).read_message_history:
+            # Response from /config backfill
+            response_key = _("I do not have permission to read {0}'s history!")
+        else:
+            # Response from /config backfill
+            response_key = _("Backfilling {0}...")
+
+            task = asyncio.create_task(self._run_backfill(interaction, channel))
+            self._backfills[channel.id] = task
+            task.add_done_callback(lambda task: self._backfills.pop(channel.id, None))
+
+        content = await translate(response_key, interaction)
+        content = content.format(channel.mention)
+        await interaction.response.send_message(content, ephemeral=True)
+
+    async def _run_backfill(
+        self,
+        interaction: discord.Interaction,
+        channel: discord.TextChannel,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+
+        async def report(response_key: _, state=None) -> None:
+            content = await translate(response_key, interaction)
+            if state is not None:
+                content = content.format(
+                    channel.mention,
+                    state["messages_scanned"],
+                    state["messages_loaded"],
                 )
             else:
-                response_key = ngettext(
-                    # Response from /config set-max-age
-                    "The current maximum age is {0} day!",
-                    "The current maximum age is {0} days!",
+                content = content.format(channel.mention)
+
+            try:
+                await interaction.edit_original_response(content=content)
+            except discord.HTTPException:
+                # Interaction tokens expire after 15 minutes
+                pass
+
+        async def on_progress(state) -> None:
+            nonlocal last_report
+            if loop.time() - last_report < 5:
+                return
+
+            last_report = loop.time()
+            await report(
+                # Progress update from /config backfill
+                _(
+                    "Backfilling {0}... {1} messages scanned, {2} starred messages found"
+                ),
+                state,
+            )
+
+        backfill = ChannelBackfill(self.bot, channel)
+        try:
+            state = await backfill.run(on_progress)
+        except discord.Forbidden:
+            # Response from /config backfill
+            await report(_("I do not have permission to read {0}'s history!"))
+        except Exception:
+            log.exception("Failed to backfill channel %d", channel.id)
+            await report(
+                # Response from /config backfill
+                _(
+                    "An error occurred while backfilling {0}. Run this command again to resume."
+                ),
+            )
+        else:
+            await report(
+                # Response from /config backfill
+                _(
+                    "Finished backfilling {0}! {1} messages scanned, {2} starred messages found"
+                ),
+                state,
+            )
+
+    starboard = app_commands.Group(
+        # Command group name (/starboard)
+        name=_("starboard"),
+        # Command group description (/starboard)
+        description=_("Explore the starboard."),
+        guild_only=True,
+    )
+
+    @starboard.command(
+        # Subcommand name (/starboard top)
+        name=_("top"),
+        # Subcommand description (/starboard top)
+        description=_("Shows the most starred messages or authors."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/starboard top [ranking])
+        ranking=_("ranking"),
+        # Subcommand parameter name (/starboard top [period])
+        period=_("period"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/starboard top [ranking])
+        ranking=_("Whether to rank messages or their authors."),
+        # Subcommand parameter description (/starboard top [period])
+        period=_("How far back to count stars."),
+    )
+    @app_commands.choices(
+        ranking=[
+            # Subcommand parameter choice (/starboard top [ranking])
+            app_commands.Choice(name=_("Messages"), value="messages"),
+            # Subcommand parameter choice (/starboard top [ranking])
+            app_commands.Choice(name=_("Authors"), value="authors"),
+        ],
+        period=[
+            # Subcommand parameter choice (/starboard top [period])
+            app_commands.Choice(name=_("Past week"), value="week"),
+            # Subcommand parameter choice (/starboard top [period])
+            app_commands.Choice(name=_("Past month"), value="month"),
+            # Subcommand parameter choice (/starboard top [period])
+            app_commands.Choice(name=_("All time"), value="all"),
+        ],
+    )
+    async def starboard_top(
+        self,
+        interaction: discord.Interaction,
+        ranking: str = "messages",
+        period: str = "week",
+    ):
+        assert interaction.guild is not None
+        guild_id = interaction.guild.id
+        leaderboard_period = cast(LeaderboardPeriod, period)
+        page_size = self.bot.config.starboard.leaderboard.page_size
+
+        async with self.bot.query.acquire() as query:
+            routes = await query.get_starboard_routes(guild_id)
+        star = routes.star_emojis.first(self.bot.config.starboard.allowed_emojis[0])
+
+        titles: dict[tuple[str, str], _] = {
+            # Title of /starboard top
+            ("messages", "week"): _("Most starred messages this past week"),
+            # Title of /starboard top
+            ("messages", "month"): _("Most starred messages this past month"),
+            # Title of /starboard top
+            ("messages", "all"): _("Most starred messages of all time"),
+            # Title of /starboard top
+            ("authors", "week"): _("Most starred authors this past week"),
+            # Title of /starboard top
+            ("authors", "month"): _("Most starred authors this past month"),
+            # Title of /starboard top
+            ("authors", "all"): _("Most starred authors of all time"),
+        }
+        title = await translate(titles[ranking, period], interaction)
+
+        async def render(
+            after: tuple[int, int] | None,
+            page: int,
+        ) -> tuple[discord.Embed, tuple[int, int] | None]:
+            # One extra row tells us whether there is a next page
+            async with self.bot.query.acquire() as query:
+                if ranking == "messages":
+                    rows = await query.get_top_messages(
+                        guild_id,
+                        leaderboard_period,
+                        after=after,
+                        limit=page_size + 1,
+                    )
+                else:
+                    rows = await query.get_top_authors(
+                        guild_id,
+                        leaderboard_period,
+                        after=after,
+                        limit=page_size + 1,
+                    )
+
+            rows, has_next = rows[:page_size], len(rows) > page_size
+            lines: list[str] = []
+            for rank, row in enumerate(rows, start=page * page_size + 1):
+                if ranking == "messages":
+                    jump_url = (
+                        f"https://discord.com/channels/{guild_id}/"
+                        f"{row['channel_id']}/{row['message_id']}"
+                    )
+                    author = f"<@{row['user_id']}>"
+                    lines.append(
+                        f"{rank}. {star} **{row['total']}** {author} {jump_url}"
+                    )
+                else:
+                    lines.append(
+                        f"{rank}. {star} **{row['stars']}** <@{row['user_id']}>"
+                    )
+
+            if not lines:
+                lines.append(
+                    await translate(
+                        # Response from /starboard top
+                        _("Nobody has starred any messages in this period yet!"),
+                        interaction,
+                    )
+                )
+
+            embed = discord.Embed(
+                colour=0xFAF317,
+                title=title,
+                description="\n".join(lines),
+            )
+            # Footer of /starboard top
+            footer = await translate(_("Page {0}"), interaction)
+            embed.set_footer(text=footer.format(page + 1))
+
+            next_cursor = None
+            if has_next:
+                last = rows[-1]
+                if ranking == "messages":
+                    next_cursor = (last["total"], last["message_id"])
+                else:
+                    next_cursor = (last["stars"], last["user_id"])
+            return embed, next_cursor
+
+        paginator = KeysetPaginator(render, user_id=interaction.user.id)
+        await paginator.start(interaction)
+
+    @starboard.command(
+        # Subcommand name (/starboard browse)
+        name=_("browse"),
+        # Subcommand description (/starboard browse)
+        description=_("Browses past starboard entries, newest first."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/starboard browse [author])
+        author=_("author"),
+        # Subcommand parameter name (/starboard browse [channel])
+        channel=_("channel"),
+        # Subcommand parameter name (/starboard browse [since])
+        since=_("since"),
+        # Subcommand parameter name (/starboard browse [until])
+        until=_("until"),
+        # Subcommand parameter name (/starboard browse [min-stars])
+        min_stars=_("min-stars"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/starboard browse [author])
+        author=_("Only show messages sent by this user."),
+        # Subcommand parameter description (/starboard browse [channel])
+        channel=_("Only show messages sent in this channel."),
+        # Subcommand parameter description (/starboard browse [since])
+        since=_("Only show messages sent on or after this date (YYYY-MM-DD)."),
+        # Subcommand parameter description (/starboard browse [until])
+        until=_("Only show messages sent on or before this date (YYYY-MM-DD)."),
+        # Subcommand parameter description (/starboard browse [min-stars])
+        min_stars=_("Only show messages with at least this many stars."),
+    )
+    async def starboard_browse(
+        self,
+        interaction: discord.Interaction,
+        author: discord.User | None = None,
+        channel: discord.TextChannel | None = None,
+        since: DateTransform | None = None,
+        until: DateTransform | None = None,
+        min_stars: app_commands.Range[int, 1] | None = None,
+    ):
+        assert interaction.guild is not None
+        guild_id = interaction.guild.id
+        page_size = self.bot.config.starboard.leaderboard.page_size
+
+        async with self.bot.query.acquire() as query:
+            routes = await query.get_starboard_routes(guild_id)
+        star = routes.star_emojis.first(self.bot.config.starboard.allowed_emojis[0])
+
+        if until is not None:
+            # Include the entire day
+            until += datetime.timedelta(days=1)
+
+        # Title of /starboard browse
+        title = await translate(_("Starboard entries"), interaction)
+
+        async def render(
+            before: int | None,
+            page: int,
+        ) -> tuple[discord.Embed, int | None]:
+            async with self.bot.query.acquire() as query:
+                rows = await query.get_starboard_entries(
+                    guild_id,
+                    author_id=getattr(author, "id", None),
+                    channel_id=getattr(channel, "id", None),
+                    since=since,
+                    until=until,
+                    min_stars=min_stars,
+                    before=before,
+                    limit=page_size + 1,
+                )
+
+            rows, has_next = rows[:page_size], len(rows) > page_size
+            lines: list[str] = []
+            for row in rows:
+                created_at = discord.utils.snowflake_time(row["star_message_id"])
+                timestamp = discord.utils.format_dt(created_at, "d")
+                jump_url = (
+                    f"https://discord.com/channels/{guild_id}/"
+                    f"{row['channel_id']}/{row['star_message_id']}"
+                )
+                author_mention = f"<@{row['user_id']}>"
+                lines.append(
+                    f"{star} **{row['total']}** {author_mention} {timestamp} {jump_url}"
+                )
+
+            if not lines:
+                lines.append(
+                    await translate(
+                        # Response from /starboard browse
+                        _("No starboard entries match these filters!"),
+                        interaction,
+                    )
                 )
 
-            content = await translate(response_key, interaction, data=max_age.days)
-            content = content.format(max_age.days)
-            await interaction.response.send_message(content, ephemeral=True)
+            embed = discord.Embed(
+                colour=0xFAF317,
+                title=title,
+                description="\n".join(lines),
+            )
+            # Footer of /starboard browse
+            footer = await translate(_("Page {0}"), interaction)
+            embed.set_footer(text=footer.format(page + 1))
+
+            next_cursor = rows[-1]["star_message_id"] if has_next else None
+            return embed, next_cursor
+
+        paginator = KeysetPaginator(render, user_id=interaction.user.id)
+        await paginator.start(interaction, ephemeral=True)
+
+    @starboard.command(
+        # Subcommand name (/starboard analyze)
+        name=_("analyze"),
+        # Subcommand description (/starboard analyze)
+        description=_("Suggests a star threshold based on recent stars."),
+    )
+    @app_commands.rename(
+        # Subcommand parameter name (/starboard analyze [period])
+        period=_("period"),
+    )
+    @app_commands.describe(
+        # Subcommand parameter description (/starboard analyze [period])
+        period=_("How far back to analyze stars."),
+    )
+    @app_commands.choices(
+        period=[
+            # Subcommand parameter choice (/starboard analyze [period])
+            app_commands.Choice(name=_("Past week"), value=7),
+            # Subcommand parameter choice (/starboard analyze [period])
+            app_commands.Choice(name=_("Past month"), value=30),
+        ],
+    )
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def starboard_analyze(
+        self,
+        interaction: discord.Interaction,
+        period: int = 30,
+    ):
+        assert interaction.guild is not None
+        guild_id = interaction.guild.id
+        config = self.bot.config.starboard.analyze
+        # Periods are defined by the leaderboard_message materialized view
+        leaderboard_period: LeaderboardPeriod = "week" if period == 7 else "month"
+
+        async with self.bot.query.acquire() as query:
+            routes = await query.get_starboard_routes(guild_id)
+            threshold = await query.get_starboard_threshold(guild_id)
+            totals, counts = await query.get_star_total_histogram(
+                guild_id,
+                leaderboard_period,
+            )
+
+        star = routes.star_emojis.first(self.bot.config.starboard.allowed_emojis[0])
+        analysis = analyze_star_totals(
+            totals,
+            counts,
+            days=period,
+            target_posts_per_day=config.target_posts_per_day,
+            candidates=(threshold,),
+        )
+
+        if analysis.n_messages == 0:
+            # Response from /starboard analyze
+            response_key = _("No messages have been starred in the past {0} days!")
+            content = await translate(response_key, interaction)
+            content = content.format(period)
+            return await interaction.response.send_message(content, ephemeral=True)
+
+        # Title of /starboard analyze
+        title = await translate(_("Star threshold analysis"), interaction)
+        # Description of /starboard analyze
+        description = _("{0} messages were starred in the past {1} days.")
+        description = await translate(description, interaction)
+        embed = discord.Embed(
+            colour=0xFAF317,
+            title=title,
+            description=description.format(analysis.n_messages, period),
+        )
+
+        # Field name of /starboard analyze
+        name = await translate(_("Stars per message"), interaction)
+        embed.add_field(
+            name=name,
+            value="\n".join(
+                f"p{q}: {star} **{value:g}**"
+                for q, value in analysis.percentiles.items()
+            ),
+        )
+
+        # Field name of /starboard analyze
+        name = await translate(_("Projected posts per day"), interaction)
+        lines = []
+        for t, rate in analysis.posts_per_day.items():
+            line = f"{star} **{t}**: {rate:.1f}"
+            if t == threshold:
+                line += " \N{LEFTWARDS ARROW}"
+            lines.append(line)
+        embed.add_field(name=name, value="\n".join(lines))
+
+        response_key = ngettext(
+            # Suggestion from /starboard analyze
+            "A threshold of {0} star would post about {1} messages per day.",
+            "A threshold of {0} stars would post about {1} messages per day.",
+        )
+        suggestion = await translate(
+            response_key,
+            interaction,
+            data=analysis.suggestion,
+        )
+        suggestion = suggestion.format(
+            analysis.suggestion,
+            f"{analysis.posts_per_day[analysis.suggestion]:.1f}",
+        )
+        # Field name of /starboard analyze
+        name = await translate(_("Suggestion"), interaction)
+        embed.add_field(name=name, value=suggestion, inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -1,145 +1,386 @@
-from typing import Iterable
-
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+from typing import Any, AsyncIterator, Collection
+
+import asyncpg
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
+from thestarboard.admission import LoadShed, Priority
 from thestarboard.bot import Bot
+from thestarboard.database import Starboard
+from thestarboard.dispatch import RawMessageDeletion
+from thestarboard.scheduler import MessageRoute
+
+from .breaker import StarboardBreaker
+from .jobs import StarboardJobQueue
+from .locks import KeyedLock
+from .mirror import AttachmentMirror
+from .velocity import StarVelocityTracker
+
+log = logging.getLogger(__name__)
+
+
+def fingerprint_render(render: str | discord.Embed) -> bytes:
+    """Hashes the content or embed of a starboard message.
+
+    Edits are skipped when the new render has the same fingerprint
+    as the one stored for the starboard message.
+
+    """
+    if isinstance(render, discord.Embed):
+        render = json.dumps(render.to_dict(), sort_keys=True)
+    return hashlib.blake2b(render.encode(), digest_size=16).digest()
 
 
 class StarboardEvents(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
+        config = bot.config.starboard.rising
+        self.velocity = StarVelocityTracker(
+            window=config.window,
+            n_buckets=config.buckets,
+            max_messages=config.max_messages,
+        )
+        config = bot.config.starboard.breaker
+        self.breaker = StarboardBreaker(
+            cooldown=config.cooldown,
+            max_cooldown=config.max_cooldown,
+            max_messages=config.max_messages,
+        )
+        config = bot.config.starboard.mirror
+        self.mirror: AttachmentMirror | None = None
+        if config.enabled:
+            self.mirror = AttachmentMirror(
+                max_size=config.max_size,
+                concurrency=config.concurrency,
+                chunk_size=config.chunk_size,
+                memory_size=config.memory_size,
+                timeout=config.timeout,
+            )
+        config = bot.config.starboard.jobs
+        self.jobs: StarboardJobQueue | None = None
+        if config.enabled:
+            self.jobs = StarboardJobQueue(
+                bot,
+                self._run_job,
+                concurrency=config.concurrency,
+                lease=config.lease,
+                poll_interval=config.poll_interval,
+                retry_delay=config.retry_delay,
+                max_attempts=config.max_attempts,
+            )
+        # Serializes starboard updates per message within this process
+        self._message_locks: KeyedLock[int] = KeyedLock(max_keys=1000)
+        # Messages whose star count edits were deferred while shedding load,
+        # mapped to their guild and channel IDs
+        self._deferred_updates: dict[int, tuple[int, int]] = {}
         # TODO: use expiring cache for _user_id_bots
         self._user_id_bots: dict[int, bool] = {}
-        # TODO: cache starboard message IDs for filtering events
 
-    @commands.Cog.listener("on_raw_reaction_add")
+    _REACTION_EVENTS = (
+        "MESSAGE_REACTION_ADD",
+        "MESSAGE_REACTION_REMOVE",
+        "MESSAGE_REACTION_REMOVE_EMOJI",
+    )
+
+    def _iter_stages(self):
+        yield "reaction_add", self.add_star_reaction, self._check_star_reaction
+        yield "reaction_remove", self.remove_star_reaction, self._check_star_reaction
+        yield "reaction_clear", self.clear_star_reactions, self._check_guild
+        yield "reaction_clear_emoji", self.clear_one_star_reaction, self._check_star_emoji
+        yield "message_delete", self.delete_starboard_messages, self._check_guild
+        yield "message_edit", self.edit_starboard_message, self._check_stored_message
+
+    async def cog_load(self):
+        if self.mirror is not None:
+            await self.mirror.start()
+
+        for event, stage, check in self._iter_stages():
+            self.bot.raw_events.add_stage(event, stage, check=check)
+
+        for event in self._REACTION_EVENTS:
+            self.bot.add_gateway_filter(event, self._filter_reaction)
+        self.bot.add_gateway_filter(
+            "MESSAGE_REACTION_REMOVE_ALL",
+            self._filter_reaction_clear,
+        )
+        self.bot.add_gateway_filter("MESSAGE_UPDATE", self._filter_message_update)
+        self.flush_deferred_updates.start()
+
+        if self.jobs is not None:
+            await self.jobs.start()
+
+    async def cog_unload(self):
+        if self.jobs is not None:
+            await self.jobs.close()
+        if self.mirror is not None:
+            await self.mirror.close()
+
+        self.flush_deferred_updates.cancel()
+        for event, stage, _ in self._iter_stages():
+            self.bot.raw_events.remove_stage(event, stage)
+
+        for event in self._REACTION_EVENTS:
+            self.bot.remove_gateway_filter(event, self._filter_reaction)
+        self.bot.remove_gateway_filter(
+            "MESSAGE_REACTION_REMOVE_ALL",
+            self._filter_reaction_clear,
+        )
+        self.bot.remove_gateway_filter("MESSAGE_UPDATE", self._filter_message_update)
+
+    @tasks.loop(seconds=5)
+    async def flush_deferred_updates(self):
+        """Updates starboard messages whose edits were deferred under load."""
+        if self.bot.admission.degraded or not self._deferred_updates:
+            return
+
+        deferred, self._deferred_updates = self._deferred_updates, {}
+        pending = list(deferred.items())
+        while pending:
+            message_id, (guild_id, channel_id) = pending[-1]
+            try:
+                async with self.bot.admission.admit(Priority.EDIT, guild_id):
+                    async for attempt in self.bot.query.retrying():
+                        async with attempt:
+                            await self._on_message_star_update(
+                                message_id,
+                                guild_id=guild_id,
+                                channel_id=channel_id,
+                            )
+            except LoadShed:
+                # Newer deferrals take precedence over ours
+                self._deferred_updates = dict(pending) | self._deferred_updates
+                return
+            except Exception:
+                log.exception("Failed to update deferred starboard message")
+            pending.pop()
+
+    # Raw event stages, see RawEventDispatcher
+
     async def add_star_reaction(self, payload: discord.RawReactionActionEvent):
         """Adds a single message star."""
-        if payload.guild_id is None:
-            return
-        if not self._is_star_emoji(payload.emoji):
-            return
-        if await self._is_bot_user(payload.user_id):
-            return
+        assert payload.guild_id is not None
+        query = self.bot.query
 
-        async with self.bot.query.acquire() as query:
-            await query.add_message_star(
-                payload.message_id,
-                payload.user_id,
-                str(payload.emoji),
-                channel_id=payload.channel_id,
-                guild_id=payload.guild_id,
-            )
+        if await self._is_message_too_old(
+            payload.message_id,
+            guild_id=payload.guild_id,
+        ):
+            return
 
-            await self._on_message_star_update(
-                payload.message_id,
-                guild_id=payload.guild_id,
-            )
+        added = await query.add_message_star(
+            payload.message_id,
+            payload.user_id,
+            str(payload.emoji),
+            channel_id=payload.channel_id,
+            guild_id=payload.guild_id,
+        )
+        if added:
+            rate = self.velocity.add_star(payload.message_id)
+            query.on_rollback(lambda: self.velocity.remove_star(payload.message_id))
+        else:
+            rate = self.velocity.get_rate(payload.message_id)
+
+        await self._request_star_update(
+            payload.message_id,
+            guild_id=payload.guild_id,
+            channel_id=payload.channel_id,
+            emoji=str(payload.emoji),
+            rate=rate,
+        )
 
-    @commands.Cog.listener("on_raw_reaction_remove")
     async def remove_star_reaction(self, payload: discord.RawReactionActionEvent):
         """Removes a single message star."""
-        if payload.guild_id is None:
-            return
-        if not self._is_star_emoji(payload.emoji):
-            return
-        if await self._is_bot_user(payload.user_id):
-            return
+        assert payload.guild_id is not None
+        query = self.bot.query
 
-        async with self.bot.query.acquire() as query:
-            await query.remove_message_star(
-                payload.message_id,
-                payload.user_id,
-                str(payload.emoji),
-            )
+        removed = await query.remove_message_star(
+            payload.message_id,
+            payload.user_id,
+            str(payload.emoji),
+        )
+        if removed:
+            self.velocity.remove_star(payload.message_id)
+            query.on_rollback(lambda: self.velocity.add_star(payload.message_id))
 
-            await self._on_message_star_update(
-                payload.message_id,
-                guild_id=payload.guild_id,
-            )
+        await self._request_star_update(
+            payload.message_id,
+            guild_id=payload.guild_id,
+            channel_id=payload.channel_id,
+            emoji=str(payload.emoji),
+        )
 
-    @commands.Cog.listener("on_raw_reaction_clear")
     async def clear_star_reactions(self, payload: discord.RawReactionClearEvent):
         """Removes all stars associated with the message."""
-        if payload.guild_id is None:
-            return
+        assert payload.guild_id is not None
 
-        async with self.bot.query.acquire() as query:
-            await query.conn.execute(
-                "DELETE FROM message_star WHERE message_id = $1",
-                payload.message_id,
-            )
+        await self.bot.query.conn.execute(
+            "DELETE FROM message_star WHERE message_id = $1",
+            payload.message_id,
+        )
 
-            await self._on_message_star_update(
-                payload.message_id,
-                guild_id=payload.guild_id,
-            )
+        await self._request_star_update(
+            payload.message_id,
+            guild_id=payload.guild_id,
+            channel_id=payload.channel_id,
+        )
 
-    @commands.Cog.listener("on_raw_reaction_clear_emoji")
     async def clear_one_star_reaction(
         self,
         payload: discord.RawReactionClearEmojiEvent,
     ):
         """Removes all stars of an emoji associated with the message."""
-        if payload.guild_id is None:
-            return
-        if not self._is_star_emoji(payload.emoji):
-            return
+        assert payload.guild_id is not None
+
+        await self.bot.query.conn.execute(
+            "DELETE FROM message_star WHERE message_id = $1 AND emoji = $2",
+            payload.message_id,
+            str(payload.emoji),
+        )
+
+        await self._request_star_update(
+            payload.message_id,
+            guild_id=payload.guild_id,
+            channel_id=payload.channel_id,
+            emoji=str(payload.emoji),
+        )
+
+    async def delete_starboard_messages(self, deletion: RawMessageDeletion):
+        """Deletes the associated starboard messages."""
+        assert deletion.guild_id is not None
 
-        async with self.bot.query.acquire() as query:
-            await query.conn.execute(
-                "DELETE FROM message_star WHERE message_id = $1 AND emoji = $2",
+        if self.jobs is not None:
+            return await self._queue_starboard_deletions(
+                deletion.message_ids,
+                guild_id=deletion.guild_id,
+            )
+
+        await self._delete_starboard_messages(
+            deletion.message_ids,
+            guild_id=deletion.guild_id,
+        )
+
+    async def edit_starboard_message(self, payload: discord.RawMessageUpdateEvent):
+        """Updates the starboard message."""
+        assert payload.guild_id is not None
+        query = self.bot.query
+
+        if self.jobs is None:
+            return await self._on_star_message_edit(
                 payload.message_id,
-                str(payload.emoji),
+                guild_id=payload.guild_id,
             )
 
-            await self._on_message_star_update(
+        if await query.get_starboard_message(payload.message_id) is not None:
+            await query.add_starboard_job(
                 payload.message_id,
+                "edit",
+                {},
                 guild_id=payload.guild_id,
             )
 
-    @commands.Cog.listener("on_raw_message_delete")
-    async def delete_starboard_message(self, payload: discord.RawMessageDeleteEvent):
-        """Deletes the associated starboard message."""
-        if payload.guild_id is None:
-            return
+    # Event filtering methods
 
-        await self._delete_starboard_messages(
-            (payload.message_id,),
+    async def _check_guild(self, payload: Any) -> bool:
+        return payload.guild_id is not None
+
+    async def _check_star_emoji(self, payload: Any) -> bool:
+        return payload.guild_id is not None and await self._is_star_emoji(
+            payload.emoji,
             guild_id=payload.guild_id,
         )
 
-    @commands.Cog.listener("on_raw_bulk_message_delete")
-    async def bulk_delete_starboard_messages(
+    async def _check_star_reaction(
         self,
-        payload: discord.RawBulkMessageDeleteEvent,
-    ):
-        """Bulk deletes the associated starboard messages."""
-        if payload.guild_id is None:
-            return
+        payload: discord.RawReactionActionEvent,
+    ) -> bool:
+        return await self._check_star_emoji(payload) and not await self._is_bot_user(
+            payload.user_id
+        )
 
-        await self._delete_starboard_messages(
-            payload.message_ids,
-            guild_id=payload.guild_id,
+    async def _check_stored_message(
+        self,
+        payload: discord.RawMessageUpdateEvent,
+    ) -> bool:
+        return (
+            payload.guild_id is not None
+            and payload.message_id in self.bot.query.message_ids
         )
 
-    @commands.Cog.listener("on_raw_message_edit")
-    async def edit_starboard_message(self, payload: discord.RawMessageUpdateEvent):
-        """Updates the starboard message."""
-        if payload.guild_id is None:
-            return
+    def _filter_reaction(self, data: dict[str, Any]) -> bool:
+        """Checks if a raw reaction payload could affect a starboard.
 
-        async with self.bot.query.acquire():
-            await self._on_star_message_edit(
-                payload.message_id,
-                guild_id=payload.guild_id,
-            )
+        Reactions in guilds whose routes have not been loaded yet are
+        always let through, so the listener can load them.
 
-    # Event filtering methods
+        """
+        guild_id = data.get("guild_id")
+        if guild_id is None:
+            return False
+
+        routes = self.bot.query.starboard_routes.get(int(guild_id))
+        if routes is None:
+            return True
+        if not routes.starboards:
+            return False
+
+        emoji = data["emoji"]
+        emoji_id = emoji.get("id")
+        if emoji_id is not None:
+            emoji_id = int(emoji_id)
+        return routes.star_emojis.matches(emoji_id, emoji.get("name"))
+
+    def _filter_reaction_clear(self, data: dict[str, Any]) -> bool:
+        """Checks if a raw reaction clear payload could affect a starboard."""
+        guild_id = data.get("guild_id")
+        if guild_id is None:
+            return False
+
+        routes = self.bot.query.starboard_routes.get(int(guild_id))
+        return routes is None or bool(routes.starboards)
+
+    def _filter_message_update(self, data: dict[str, Any]) -> bool:
+        """Checks if a raw message update payload is for a stored message.
+
+        Updates with components are always let through so that
+        discord.py can keep its views in sync, as are updates to
+        cached messages so that they are not starboarded with their
+        content from before the edit.
+
+        """
+        if data.get("components"):
+            return True
 
-    def _is_star_emoji(self, emoji: discord.PartialEmoji) -> bool:
-        return str(emoji) in self.bot.config.starboard.allowed_emojis
+        message_id = int(data["id"])
+        if message_id in self.bot.query.message_ids:
+            return True
+        return self.bot._connection._get_message(message_id) is not None
+
+    async def _is_star_emoji(
+        self,
+        emoji: discord.PartialEmoji,
+        *,
+        guild_id: int,
+    ) -> bool:
+        """Checks if an emoji counts as a star in the given guild,
+        which is never the case if the guild has no starboards.
+
+        The guild's compiled routes are only loaded from the database
+        the first time they are needed.
+
+        """
+        routes = self.bot.query.starboard_routes.get(guild_id)
+        if routes is None:
+            async with self.bot.query.acquire() as query:
+                routes = await query.get_starboard_routes(guild_id)
+
+        if not routes.starboards:
+            return False
+        return routes.star_emojis.matches(emoji.id, emoji.name)
 
     async def _is_bot_user(self, user_id: int) -> bool:
         """Checks if a user ID points to a bot account."""
@@ -151,6 +392,25 @@ class StarboardEvents(commands.Cog):
         self._user_id_bots[user_id] = user.bot
         return user.bot
 
+    async def _is_message_too_old(self, message_id: int, *, guild_id: int) -> bool:
+        """Checks if a message is too old to be sent to the starboard.
+
+        Messages that already have a starboard message are never too old.
+        Stars for these messages are not stored, since their partitions
+        may have already been dropped.
+
+        The database client should have a connection acquired beforehand.
+
+        """
+        query = self.bot.query
+        routes = await query.get_starboard_routes(guild_id)
+        max_message_age = routes.max_message_age
+        created_at = discord.utils.snowflake_time(message_id)
+        if created_at >= discord.utils.utcnow() - max_message_age:
+            return False
+
+        return await query.get_starboard_message(message_id) is None
+
     # Starboard content formatting
 
     def _format_star_counts(self, star_counts: dict[str, int]) -> str:
@@ -182,20 +442,52 @@ class StarboardEvents(commands.Cog):
 
     # Starboard embed formatting
 
-    def _get_image_url(self, message: discord.Message) -> str | None:
-        """Gets a suitable URL to use for the starboard image."""
+    def _get_image_attachment(
+        self,
+        message: discord.Message,
+    ) -> discord.Attachment | None:
+        """Gets the first image attached to the message."""
         for attachment in message.attachments:
             if attachment.content_type is None:
                 continue
             elif attachment.content_type.startswith("image"):
-                return attachment.url
+                return attachment
+
+    def _get_image_url(
+        self,
+        message: discord.Message,
+        *,
+        image_filename: str | None = None,
+    ) -> str | None:
+        """Gets a suitable URL to use for the starboard image.
+
+        :param image_filename:
+            The filename of the image uploaded with the starboard message.
+            This is used instead of the attachment with the same filename.
+
+        """
+        attachment = self._get_image_attachment(message)
+        if attachment is not None:
+            if attachment.filename == image_filename:
+                return f"attachment://{image_filename}"
+            return attachment.url
 
         for embed in message.embeds:
             if embed.image.url is not None:
                 return embed.image.url
 
-    def _create_starboard_embed(self, message: discord.Message) -> discord.Embed:
-        """Creates a starboard embed from the given message."""
+    def _create_starboard_embed(
+        self,
+        message: discord.Message,
+        *,
+        image_filename: str | None = None,
+    ) -> discord.Embed:
+        """Creates a starboard embed from the given message.
+
+        :param image_filename:
+            The filename of the image uploaded with the starboard message.
+
+        """
         embed = discord.Embed(
             colour=0xFAF317,
             description=message.content,
@@ -209,7 +501,7 @@ class StarboardEvents(commands.Cog):
         self._update_starboard_embed(
             embed,
             content=message.content,
-            image_url=self._get_image_url(message),
+            image_url=self._get_image_url(message, image_filename=image_filename),
         )
 
         return embed
@@ -228,6 +520,146 @@ class StarboardEvents(commands.Cog):
             embed.set_image(url=image_url)
         return embed
 
+    # Starboard jobs
+
+    async def _request_star_update(
+        self,
+        message_id: int,
+        *,
+        guild_id: int,
+        channel_id: int,
+        emoji: str | None = None,
+        rate: int = 0,
+    ) -> None:
+        """
+        Updates the associated starboard messages after a star change,
+        or queues a send job to do so if :attr:`jobs` is enabled.
+
+        See :meth:`_on_message_star_update()` for the parameters.
+
+        The database client should have a connection acquired beforehand.
+
+        """
+        if self.jobs is None:
+            return await self._on_message_star_update(
+                message_id,
+                guild_id=guild_id,
+                channel_id=channel_id,
+                emoji=emoji,
+                rate=rate,
+            )
+
+        routes = await self.bot.query.get_starboard_routes(guild_id)
+        if not routes.route(channel_id, emoji):
+            return
+
+        await self.bot.query.add_starboard_job(
+            message_id,
+            "send",
+            {"channel_id": channel_id, "emoji": emoji, "rate": rate},
+            guild_id=guild_id,
+        )
+
+    async def _queue_starboard_deletions(
+        self,
+        message_ids: Collection[int],
+        *,
+        guild_id: int,
+    ) -> None:
+        """
+        Queues delete jobs for the given messages' starboard messages.
+
+        Each job carries its starboard messages, since their rows may be
+        removed by :class:`Cleanup` before the job runs.
+
+        The database client should have a connection acquired beforehand.
+
+        """
+        query = (
+            "SELECT sm.star_message_id, sm.message_id, m.channel_id "
+            "FROM starboard_message sm "
+            "JOIN message m ON sm.message_id = m.id "
+            "WHERE star_message_id = any($1::bigint[])"
+        )
+        posts: dict[int, list[list[int]]] = {}
+        async for row in self.bot.query.conn.cursor(query, message_ids):
+            post = [row["channel_id"], row["message_id"]]
+            posts.setdefault(row["star_message_id"], []).append(post)
+
+        for message_id, message_posts in posts.items():
+            await self.bot.query.add_starboard_job(
+                message_id,
+                "delete",
+                {"posts": message_posts},
+                guild_id=guild_id,
+            )
+
+    async def _run_job(self, job: asyncpg.Record, data: dict[str, Any]) -> None:
+        """
+        Runs a starboard job claimed by :attr:`jobs`.
+
+        The database client should have a transaction acquired beforehand.
+
+        """
+        message_id = job["message_id"]
+        guild_id = job["guild_id"]
+        operation = job["operation"]
+
+        if operation == "send":
+            await self._on_message_star_update(
+                message_id,
+                guild_id=guild_id,
+                channel_id=data["channel_id"],
+                emoji=data["emoji"],
+                rate=data["rate"],
+            )
+        elif operation == "edit":
+            await self._on_star_message_edit(message_id, guild_id=guild_id)
+        elif operation == "delete":
+            await self._delete_starboard_posts(message_id, data["posts"])
+        else:
+            raise ValueError(f"unknown starboard job operation: {operation!r}")
+
+    async def _delete_starboard_posts(
+        self,
+        message_id: int,
+        posts: list[list[int]],
+    ) -> None:
+        """
+        Deletes the given starboard messages of a deleted message,
+        along with any sent since the deletion was queued.
+
+        The database client should have a transaction acquired beforehand.
+
+        """
+        query = self.bot.query
+
+        # Waits for sends already in progress to store their posts
+        await query.lock_starboard_messages(message_id)
+        targets = {post_id: channel_id for channel_id, post_id in posts}
+        for row in await query.get_starboard_messages(message_id):
+            targets[row["message_id"]] = row["channel_id"]
+
+        deleted: list[int] = []
+        for post_id, channel_id in targets.items():
+            if self.breaker.is_open(channel_id) or self.breaker.is_dead(post_id):
+                continue
+
+            channel = self.bot.get_partial_messageable(channel_id)
+            post = channel.get_partial_message(post_id)
+            try:
+                async with self._schedule_request(channel_id, MessageRoute.DELETE):
+                    await post.delete()
+            except (discord.Forbidden, discord.NotFound) as e:
+                await self._record_failed_post(post, e)
+                continue
+
+            self.breaker.record_success(channel_id)
+            deleted.append(post_id)
+
+        if deleted:
+            await query.remove_messages(deleted)
+
     # Starboard message creation
 
     async def _on_message_star_update(
@@ -235,9 +667,16 @@ class StarboardEvents(commands.Cog):
         message_id: int,
         *,
         guild_id: int,
+        channel_id: int,
+        emoji: str | None = None,
+        rate: int = 0,
     ) -> None:
         """
-        Sends, edits, or deletes the associated starboard message.
+        Sends, edits, or deletes the associated starboard messages.
+
+        Only the starboards routed from the message's channel and the
+        changed `emoji` are updated, or every starboard routed from
+        the channel if `emoji` is None.
 
         The database client should have a connection acquired beforehand.
         Additionally, the `message_id` and `guild_id` parameters must already
@@ -246,69 +685,342 @@ class StarboardEvents(commands.Cog):
         """
         query = self.bot.query
 
-        starboard_message_id = await query.get_starboard_message(message_id)
-        total = await query.get_message_star_total(message_id)
-        threshold = await query.get_starboard_threshold(guild_id)
+        routes = await query.get_starboard_routes(guild_id)
+        starboards = routes.route(channel_id, emoji)
+        if not starboards:
+            return
 
-        if starboard_message_id is None and total >= threshold:
-            # Decide if we should send a starboard message
-            starboard_channel_id = await query.get_starboard_channel(guild_id)
-            if starboard_channel_id is None:
-                return
+        # Images are downloaded before taking the locks below,
+        # so that a slow download doesn't hold up other updates
+        message, images = await self._prefetch_images(
+            message_id,
+            starboards,
+            rate=rate,
+        )
+        try:
+            # Only one update per message can send its posts at a time.
+            # Concurrent updates wait here and then see the posts sent by
+            # the first, editing them instead of sending duplicates.
+            # The advisory lock extends this to other processes and is held
+            # until our transaction commits, while the in-process lock queues
+            # updates from this process without piling them onto the database.
+            async with self._message_locks.acquire(message_id):
+                await query.lock_starboard_messages(message_id)
+
+                starboard_messages = {
+                    row["channel_id"]: row
+                    for row in await query.get_starboard_messages(message_id)
+                }
+                star_counts = await self._get_star_counts(message_id)
+
+                for starboard in starboards:
+                    await self._update_starboard(
+                        starboard,
+                        message_id,
+                        guild_id=guild_id,
+                        channel_id=channel_id,
+                        starboard_message=starboard_messages.get(starboard.channel_id),
+                        star_counts=starboard.count_stars(star_counts),
+                        rate=rate,
+                        original=message,
+                        images=images,
+                    )
+        finally:
+            # Posts may have been sent by a concurrent update in the meantime
+            for image in images.values():
+                image.close()
+
+    async def _update_starboard(
+        self,
+        starboard: Starboard,
+        message_id: int,
+        *,
+        guild_id: int,
+        channel_id: int,
+        starboard_message: asyncpg.Record | None,
+        star_counts: dict[str, int],
+        rate: int,
+        original: discord.Message | None = None,
+        images: dict[int, discord.File] | None = None,
+    ) -> None:
+        """
+        Sends, edits, or deletes a message's post on one starboard.
+
+        Messages below the star threshold are also sent if `rate`, the number
+        of stars received within the rising window, reaches the starboard's
+        rising rate. These are kept on the starboard while they have any stars.
+
+        New posts use the `original` message if it was already resolved,
+        and upload the image prefetched for this starboard in `images`,
+        removing it (see :meth:`_prefetch_images()`). Without a prefetched
+        image, the post links to the original attachment instead.
 
-            max_message_age = await query.get_max_starboard_age(guild_id)
+        Star count edits are deferred to :meth:`flush_deferred_updates()`
+        while the bot is shedding load, and skipped if the star counts
+        render the same as the last edit. Requests to the starboard channel
+        are paced by the bot's :attr:`~Bot.channel_scheduler`, and skipped
+        for posts and channels that recently failed (see :attr:`breaker`).
+
+        The database client should have a connection acquired beforehand.
+
+        """
+        query = self.bot.query
+        total = sum(star_counts.values())
+        threshold = starboard.threshold
+
+        starboard_message_id = None
+        content_fingerprint = None
+        rising = False
+        if starboard_message is not None:
+            starboard_message_id = starboard_message["message_id"]
+            content_fingerprint = starboard_message["content_fingerprint"]
+            rising = 0 < total < threshold and starboard_message["rising"]
+        elif total < threshold and rate > 0:
+            rising = 0 < starboard.rising_rate <= rate
+
+        starboard_channel = self.bot.get_partial_messageable(starboard.channel_id)
+        if self.breaker.is_open(starboard.channel_id):
+            return
+        if starboard_message_id is not None and self.breaker.is_dead(
+            starboard_message_id
+        ):
+            return
+
+        if starboard_message_id is None and (total >= threshold or rising):
+            # Decide if we should send a starboard message
             created_at = discord.utils.snowflake_time(message_id)
             now = discord.utils.utcnow()
-            if created_at < now - max_message_age:
+            if created_at < now - starboard.max_message_age:
                 return
 
-            starboard_channel = self.bot.get_partial_messageable(starboard_channel_id)
-
-            message = await self.bot.resolve.message(message_id)
+            message = original or await self.bot.resolve.message(message_id)
             assert message is not None
 
             content = self._create_starboard_content(
-                star_counts=await self._get_star_counts(message_id),
+                star_counts=star_counts,
                 jump_url=message.jump_url,
             )
-            embed = self._create_starboard_embed(message)
+            image = images.pop(starboard.channel_id, None) if images else None
+            image_filename = image.filename if image is not None else None
+            embed = self._create_starboard_embed(message, image_filename=image_filename)
 
             try:
-                starboard_message = await starboard_channel.send(content, embed=embed)
-            except (discord.Forbidden, discord.NotFound):
-                await query.set_starboard_channel(None, guild_id=guild_id)
+                async with self._schedule_request(
+                    starboard.channel_id, MessageRoute.SEND
+                ):
+                    sent = await starboard_channel.send(
+                        content,
+                        embed=embed,
+                        file=image or discord.utils.MISSING,
+                    )
+            except (discord.Forbidden, discord.NotFound) as e:
+                self.breaker.record_failure(starboard.channel_id, None, e)
+                if not self.breaker.is_exhausted(starboard.channel_id):
+                    log.warning(
+                        "Pausing requests to starboard channel %d after error: %s",
+                        starboard.channel_id,
+                        e,
+                    )
+                    return
+
+                # The channel kept failing long enough to give up on it
+                log.warning(
+                    "Removing starboard channel %d after repeated errors: %s",
+                    starboard.channel_id,
+                    e,
+                )
+                if starboard.is_default:
+                    await query.set_starboard_channel(None, guild_id=guild_id)
+                else:
+                    await query.remove_starboard(
+                        starboard.channel_id,
+                        guild_id=guild_id,
+                    )
             else:
+                self.breaker.record_success(starboard.channel_id)
                 await query.add_message(
-                    starboard_message.id,
-                    starboard_message.channel.id,
-                    starboard_message.author.id,
-                    guild_id=getattr(starboard_message.guild, "id", None),
+                    sent.id,
+                    sent.channel.id,
+                    sent.author.id,
+                    guild_id=getattr(sent.guild, "id", None),
                 )
-                await query.add_starboard_message(starboard_message.id, message_id)
-        elif starboard_message_id is not None and total >= threshold:
+                await query.add_starboard_message(
+                    sent.id,
+                    message_id,
+                    rising=rising,
+                    content_fingerprint=fingerprint_render(content),
+                    embed_fingerprint=fingerprint_render(embed),
+                    image_filename=image_filename,
+                )
+        elif starboard_message_id is not None and (total >= threshold or rising):
             # Update star counts on existing message
-            starboard_message = await self.bot.resolve.partial_message(
-                starboard_message_id
-            )
-            assert starboard_message is not None
+            if self.bot.admission.degraded:
+                self._deferred_updates[message_id] = (guild_id, channel_id)
+                return
 
             message = await self.bot.resolve.partial_message(message_id)
             assert message is not None
 
             content = self._create_starboard_content(
-                star_counts=await self._get_star_counts(message_id),
+                star_counts=star_counts,
                 jump_url=message.jump_url,
             )
+            fingerprint = fingerprint_render(content)
+            if fingerprint == content_fingerprint:
+                return
 
-            await starboard_message.edit(content=content)
-        elif starboard_message_id is not None and total < threshold:
+            partial = starboard_channel.get_partial_message(starboard_message_id)
+            try:
+                async with self._schedule_request(
+                    starboard.channel_id, MessageRoute.EDIT
+                ):
+                    await partial.edit(content=content)
+            except (discord.Forbidden, discord.NotFound) as e:
+                return await self._record_failed_post(partial, e)
+
+            self.breaker.record_success(starboard.channel_id)
+            await query.set_starboard_message_fingerprints(
+                starboard_message_id,
+                content=fingerprint,
+            )
+        elif starboard_message_id is not None:
             # TODO: add guild setting to disable auto-deletion
-            starboard_message = await self.bot.resolve.partial_message(
-                starboard_message_id
+            partial = starboard_channel.get_partial_message(starboard_message_id)
+            try:
+                async with self._schedule_request(
+                    starboard.channel_id, MessageRoute.DELETE
+                ):
+                    await partial.delete()
+            except (discord.Forbidden, discord.NotFound) as e:
+                return await self._record_failed_post(partial, e)
+
+            self.breaker.record_success(starboard.channel_id)
+
+    @contextlib.asynccontextmanager
+    async def _schedule_request(
+        self,
+        channel_id: int,
+        route: MessageRoute,
+    ) -> AsyncIterator[None]:
+        """Waits until a request to a starboard channel can be sent.
+
+        Once the request is allowed, the current transaction is no
+        longer retried, since rolling it back cannot undo the request.
+
+        """
+        async with self.bot.channel_scheduler.schedule(channel_id, route):
+            self.bot.query.prevent_retry()
+            yield
+
+    async def _prefetch_images(
+        self,
+        message_id: int,
+        starboards: Collection[Starboard],
+        *,
+        rate: int,
+    ) -> tuple[discord.Message | None, dict[int, discord.File]]:
+        """
+        Downloads the message's image for each starboard that is about
+        to send a new post, if mirroring is enabled.
+
+        This is checked without locking the message's posts, so the
+        caller should close any image that ends up not being sent.
+
+        The database client should have a connection acquired beforehand.
+
+        :returns:
+            The resolved message if an image was needed, and the images
+            keyed by the channel ID of their starboard.
+
+        """
+        if self.mirror is None:
+            return None, {}
+
+        posted = {
+            row["channel_id"]
+            for row in await self.bot.query.get_starboard_messages(message_id)
+        }
+        star_counts = await self._get_star_counts(message_id)
+        sending = [
+            starboard.channel_id
+            for starboard in starboards
+            if starboard.channel_id not in posted
+            and self._is_sendable(
+                starboard,
+                message_id,
+                total=sum(starboard.count_stars(star_counts).values()),
+                rate=rate,
+            )
+        ]
+        if not sending:
+            return None, {}
+
+        message = await self.bot.resolve.message(message_id)
+        attachment = self._get_image_attachment(message) if message else None
+        if attachment is None:
+            return message, {}
+
+        images: dict[int, discord.File] = {}
+        try:
+            for channel_id in sending:
+                image = await self.mirror.download(attachment)
+                if image is None:
+                    break  # Too large or failed, so the others would too
+                images[channel_id] = image
+        except BaseException:
+            for image in images.values():
+                image.close()
+            raise
+        return message, images
+
+    def _is_sendable(
+        self,
+        starboard: Starboard,
+        message_id: int,
+        *,
+        total: int,
+        rate: int,
+    ) -> bool:
+        """Checks if a message without a post on the given starboard
+        would have one sent by :meth:`_update_starboard()`.
+        """
+        if self.breaker.is_open(starboard.channel_id):
+            return False
+
+        rising = total < starboard.threshold and 0 < starboard.rising_rate <= rate
+        if total < starboard.threshold and not rising:
+            return False
+
+        created_at = discord.utils.snowflake_time(message_id)
+        return created_at >= discord.utils.utcnow() - starboard.max_message_age
+
+    async def _record_failed_post(
+        self,
+        post: discord.PartialMessage,
+        error: discord.HTTPException,
+    ) -> None:
+        """
+        Stops requests to a starboard post that returned NotFound
+        or Forbidden, or to its channel, for a while.
+
+        Posts that no longer exist are also removed from the database
+        so they can be sent again. Posts in a channel that failed are
+        kept, since the channel may become accessible again.
+
+        The database client should have a connection acquired beforehand.
+
+        """
+        self.breaker.record_failure(post.channel.id, post.id, error)
+        if not self.breaker.is_message_error(error):
+            log.warning(
+                "Pausing requests to starboard channel %d after error: %s",
+                post.channel.id,
+                error,
             )
-            assert starboard_message is not None
+            return
 
-            await starboard_message.delete()
+        log.info("Removing starboard message %d deleted by someone else", post.id)
+        await self.bot.query.remove_messages([post.id])
 
     async def _on_star_message_edit(
         self,
@@ -317,7 +1029,10 @@ class StarboardEvents(commands.Cog):
         guild_id: int,
     ):
         """
-        Updates the associated starboard message's embedded content.
+        Updates the associated starboard messages' embedded content.
+
+        Starboard messages whose embed would render the same, or that
+        recently failed (see :attr:`breaker`), are not edited.
 
         The database client should have a connection acquired beforehand.
         Additionally, the `message_id` and `guild_id` parameters must already
@@ -328,22 +1043,67 @@ class StarboardEvents(commands.Cog):
 
         # TODO: add guild setting to disable auto-edit
 
-        starboard_message_id = await query.get_starboard_message(message_id)
-        if starboard_message_id is None:
+        starboard_messages = [
+            row
+            for row in await query.get_starboard_messages(message_id)
+            if not self.breaker.is_open(row["channel_id"])
+            and not self.breaker.is_dead(row["message_id"])
+        ]
+        if not starboard_messages:
             return
 
-        starboard_message = await self.bot.resolve.partial_message(starboard_message_id)
-        assert starboard_message is not None
         message = await self.bot.resolve.message(message_id)
         assert message is not None
 
-        embed = self._create_starboard_embed(message)
+        # Mirrored images are referenced by their filename in each post
+        embeds: dict[str | None, tuple[discord.Embed, bytes]] = {}
+        outdated: list[tuple[discord.PartialMessage, discord.Embed, bytes]] = []
+        for row in starboard_messages:
+            image_filename = row["image_filename"]
+            rendered = embeds.get(image_filename)
+            if rendered is None:
+                embed = self._create_starboard_embed(
+                    message,
+                    image_filename=image_filename,
+                )
+                rendered = embeds[image_filename] = (embed, fingerprint_render(embed))
+
+            # Edits that don't change the embed, such as link previews
+            # being added, are skipped
+            embed, fingerprint = rendered
+            if row["embed_fingerprint"] != fingerprint:
+                channel = self.bot.get_partial_messageable(row["channel_id"])
+                post = channel.get_partial_message(row["message_id"])
+                outdated.append((post, embed, fingerprint))
+
+        async def edit(
+            post: discord.PartialMessage,
+            embed: discord.Embed,
+        ) -> discord.HTTPException | None:
+            try:
+                async with self._schedule_request(post.channel.id, MessageRoute.EDIT):
+                    await post.edit(embed=embed)
+            except (discord.Forbidden, discord.NotFound) as e:
+                return e
+
+        # Each starboard channel is rate limited separately
+        errors = await asyncio.gather(
+            *(edit(post, embed) for post, embed, _ in outdated)
+        )
+        for (post, _, fingerprint), error in zip(outdated, errors):
+            if error is not None:
+                await self._record_failed_post(post, error)
+                continue
 
-        await starboard_message.edit(embed=embed)
+            self.breaker.record_success(post.channel.id)
+            await query.set_starboard_message_fingerprints(
+                post.id,
+                embed=fingerprint,
+            )
 
     async def _delete_starboard_messages(
         self,
-        message_ids: Iterable[int],
+        message_ids: Collection[int],
         *,
         guild_id: int,
     ) -> None:
@@ -351,23 +1111,27 @@ class StarboardEvents(commands.Cog):
         Attempts to delete the given starboard messages by ID
         if enabled in guild settings.
 
-        The `guild_id` parameter must already exist in the database.
+        The database client should have a connection acquired beforehand.
+        Additionally, the `guild_id` parameter must already exist in the database.
 
         """
         # TODO: add guild setting to disable auto-deletion
 
         # Filter message IDs for ones associated with a starboard message
-        async with self.bot.pool.acquire() as conn, conn.transaction():
-            query = (
-                "SELECT sm.message_id, m.channel_id FROM starboard_message sm "
-                "JOIN message m ON sm.message_id = m.id "
-                "WHERE star_message_id = any($1::bigint[])"
-            )
-            starboard_messages: list[discord.PartialMessage] = []
-            async for row in conn.cursor(query, message_ids):
-                channel = self.bot.get_partial_messageable(row["m.channel_id"])
-                message = channel.get_partial_message(row["sm.message_id"])
-                starboard_messages.append(message)
-
+        query = (
+            "SELECT sm.message_id, m.channel_id FROM starboard_message sm "
+            "JOIN message m ON sm.message_id = m.id "
+            "WHERE star_message_id = any($1::bigint[])"
+        )
+        starboard_messages: list[discord.PartialMessage] = []
+        async for row in self.bot.query.conn.cursor(query, message_ids):
+            channel = self.bot.get_partial_messageable(row["channel_id"])
+            message = channel.get_partial_message(row["message_id"])
+            starboard_messages.append(message)
+
+        # Deletions are scheduled in the background rather than
+        # holding the event's connection open
+        if starboard_messages:
+            self.bot.query.prevent_retry()
         for m in starboard_messages:
             await m.delete(delay=0)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable
+
+import asyncpg
+
+from thestarboard.admission import LoadShed, Priority
+from thestarboard.bot import Bot
+
+log = logging.getLogger(__name__)
+
+JobHandler = Callable[[asyncpg.Record, dict[str, Any]], Awaitable[None]]
+
+CHANNEL = "starboard_job"
+"""The channel notified by ``add_starboard_job()`` when a job is added."""
+
+_PRIORITIES = {
+    "send": Priority.SEND,
+    "delete": Priority.DELETE,
+    "edit": Priority.EDIT,
+}
+
+
+class StarboardJobQueue:
+    """Runs starboard jobs stored in the database.
+
+    Jobs are added by :meth:`DatabaseClient.add_starboard_job()` in the
+    same transaction as the event that caused them, so pending jobs
+    survive restarts, and jobs colliding on the same message are merged
+    until one of them is claimed.
+
+    Workers claim jobs with ``FOR UPDATE SKIP LOCKED``, so any number of
+    processes can drain the same queue without claiming the same job.
+    Each job is run by `handler` under the bot's admission controller
+    and inside a transaction that also removes the job, so a job is
+    only removed once its results have been committed. Jobs that fail
+    or are shed under load are retried after `retry_delay` seconds,
+    doubled for each attempt, and dropped after `max_attempts`.
+    Jobs that fail after making a request to Discord are dropped
+    right away, since running them again could repeat the request.
+    Jobs abandoned by a worker that stopped mid-job are claimed again
+    once their `lease` expires.
+
+    New jobs are picked up through ``LISTEN``, which holds one pooled
+    connection for as long as the queue is running. Jobs are also
+    polled for every `poll_interval` seconds in case a notification
+    was missed, for example while reconnecting.
+
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        handler: JobHandler,
+        *,
+        concurrency: int,
+        lease: float,
+        poll_interval: float,
+        retry_delay: float,
+        max_attempts: int,
+    ) -> None:
+        self.bot = bot
+        self.handler = handler
+        self.concurrency = concurrency
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+
+        self.completed = 0
+        """The number of jobs completed by this worker since startup."""
+        self.failed = 0
+        """The number of job attempts that failed since startup."""
+
+        self._wakeup = asyncio.Event()
+        self._running: set[asyncio.Task] = set()
+        self._listener: asyncpg.pool.PoolConnectionProxy | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> int:
+        """The number of jobs currently being run by this worker."""
+        return len(self._running)
+
+    async def start(self) -> None:
+        """Starts listening for and running jobs."""
+        if self._task is not None:
+            return
+
+        self._listener = await self.bot.pool.acquire()
+        await self._listener.add_listener(CHANNEL, self._on_notify)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stops claiming jobs and waits for running jobs to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        if self._running:
+            await asyncio.wait(self._running)
+
+        if self._listener is not None:
+            try:
+                await self._listener.remove_listener(CHANNEL, self._on_notify)
+            finally:
+                await self.bot.pool.release(self._listener)
+                self._listener = None
+
+    def _on_notify(self, *args: object) -> None:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            available = self.concurrency - len(self._running)
+            jobs = []
+            if available > 0:
+                try:
+                    async with self.bot.query.acquire(transaction=False) as query:
+                        jobs = await query.claim_starboard_jobs(
+                            limit=available,
+                            lease=self.lease,
+                        )
+                except (OSError, asyncpg.PostgresError):
+                    log.exception("Failed to claim starboard jobs")
+
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self._running.add(task)
+                task.add_done_callback(self._on_job_done)
+
+            if available > 0 and len(jobs) == available:
+                continue  # More jobs may be ready
+
+            # Finished jobs also wake us up to claim more
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_job_done(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        self._wakeup.set()
+        if not task.cancelled() and (error := task.exception()) is not None:
+            # The job is claimed again once its lease expires
+            log.error("Failed to reschedule starboard job", exc_info=error)
+
+    async def _run_job(self, job: asyncpg.Record) -> None:
+        query = self.bot.query
+        data = json.loads(job["data"])
+        priority = _PRIORITIES[job["operation"]]
+
+        attempt = None
+        try:
+            async with self.bot.admission.admit(priority, job["guild_id"]):
+                async for attempt in query.retrying():
+                    async with attempt:
+                        await self.handler(job, data)
+                        await query.finish_starboard_job(job["id"])
+        except LoadShed:
+            await self._retry(job, delay=self.retry_delay)
+            return
+        except Exception:
+            self.failed += 1
+            if attempt is not None and not attempt.repeatable:
+                # Running the job again could repeat the requests it made
+                log.exception(
+                    "Dropping starboard %s job for message %d after it "
+                    "failed with requests already sent",
+                    job["operation"],
+                    job["message_id"],
+                )
+                async with query.acquire(transaction=False):
+                    await query.finish_starboard_job(job["id"])
+                return
+
+            if job["attempts"] >= self.max_attempts:
+                log.exception(
+                    "Dropping starboard %s job for message %d after %d attempts",
+                    job["operation"],
+                    job["message_id"],
+                    job["attempts"],
+                )
+                async with query.acquire(transaction=False):
+                    await query.finish_starboard_job(job["id"])
+                return
+
+            log.warning(
+                "Failed to run starboard %s job for message %d, retrying",
+                job["operation"],
+                job["message_id"],
+                exc_info=True,
+            )
+            delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+            await self._retry(job, delay=delay)
+            return
+
+        self.completed += 1
+
+    async def _retry(self, job: asyncpg.Record, *, delay: float) -> None:
+        async with self.bot.query.acquire(transaction=False) as query:
+            await query.retry_starboard_job(job["id"], delay=delay)
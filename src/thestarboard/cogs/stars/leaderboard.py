@@ -0,0 +1,37 @@
+import logging
+
+from discord.ext import commands, tasks
+
+from thestarboard.bot import Bot
+
+log = logging.getLogger(__name__)
+
+
+class StarboardLeaderboards(commands.Cog):
+    """Keeps the /starboard top rankings up-to-date.
+
+    Rankings are stored in materialized views that are refreshed
+    concurrently every :attr:`SettingsStarboardLeaderboard.refresh_interval`
+    seconds, so reads are never blocked and a leaderboard page is only
+    an index scan regardless of how many stars a guild has.
+
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        config = self.bot.config.starboard.leaderboard
+        self.refresh_leaderboards.change_interval(seconds=config.refresh_interval)
+        self.refresh_leaderboards.start()
+
+    async def cog_unload(self):
+        self.refresh_leaderboards.cancel()
+
+    @tasks.loop(minutes=10)
+    async def refresh_leaderboards(self):
+        try:
+            async with self.bot.query.acquire() as query:
+                await query.refresh_leaderboards()
+        except Exception:
+            log.exception("Failed to refresh leaderboards")
@@ -0,0 +1,59 @@
+import asyncio
+import contextlib
+from typing import AsyncIterator, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class _KeyedLockEntry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class KeyedLock(Generic[K]):
+    """A map of locks keyed by ID, such as a message ID.
+
+    Locks only exist while a task holds or waits for them, and at most
+    `max_keys` keys can be locked at once. Tasks locking a new key wait
+    for another key to be released once that limit is reached.
+
+    """
+
+    def __init__(self, *, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._entries: dict[K, _KeyedLockEntry] = {}
+        self._slots = asyncio.Semaphore(max_keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def locked(self, key: K) -> bool:
+        """Checks if the given key is currently locked."""
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, key: K) -> AsyncIterator[None]:
+        """Locks the given key for the duration of the context manager."""
+        entry = self._entries.get(key)
+        if entry is None:
+            await self._slots.acquire()
+            # Another task may have locked the same key while we waited
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _KeyedLockEntry()
+            else:
+                self._slots.release()
+
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
+                self._slots.release()
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import tempfile
+
+import aiohttp
+import discord
+
+log = logging.getLogger(__name__)
+
+
+class AttachmentMirror:
+    """Downloads image attachments so they can be re-uploaded to the starboard.
+
+    Attachment URLs expire and stop working once the original message
+    is deleted, while a copy uploaded with the starboard post lasts as
+    long as the post itself.
+
+    Downloads are streamed in `chunk_size` chunks into a spooled temporary
+    file, which only keeps up to `memory_size` bytes in memory before
+    moving to disk, after which chunks are written from a worker thread
+    so that disk writes don't block the event loop. Attachments over
+    `max_size` bytes are skipped, both by their reported size and while
+    streaming, and at most `concurrency` downloads run at once across
+    every guild. Every download shares one HTTP session, which must be
+    started with :meth:`start()`.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        concurrency: int,
+        chunk_size: int,
+        memory_size: int,
+        timeout: float,
+    ) -> None:
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.memory_size = memory_size
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        """Opens the HTTP session used for downloads."""
+        if self._session is None:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self._session = aiohttp.ClientSession(timeout=timeout)
+
+    async def close(self) -> None:
+        """Closes the HTTP session used for downloads."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def download(self, attachment: discord.Attachment) -> discord.File | None:
+        """Downloads an attachment to be uploaded elsewhere.
+
+        The returned file is closed by discord.py once it has been sent.
+
+        :returns:
+            The downloaded file, or None if the attachment was too large
+            or could not be downloaded.
+
+        """
+        if self._session is None:
+            raise RuntimeError("start() must be called before downloading")
+        if attachment.size > self.max_size:
+            return None
+
+        buffer = tempfile.SpooledTemporaryFile(max_size=self.memory_size)
+        try:
+            async with self._semaphore:
+                downloaded = await self._stream(attachment.url, buffer)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.info("Failed to mirror attachment %d: %s", attachment.id, e)
+            downloaded = False
+        except BaseException:
+            buffer.close()
+            raise
+
+        if not downloaded:
+            buffer.close()
+            return None
+
+        buffer.seek(0)
+        return discord.File(
+            buffer,  # type: ignore
+            filename=attachment.filename,
+            spoiler=attachment.is_spoiler(),
+        )
+
+    async def _stream(self, url: str, buffer: tempfile.SpooledTemporaryFile) -> bool:
+        assert self._session is not None
+        async with self._session.get(url) as response:
+            response.raise_for_status()
+            if (response.content_length or 0) > self.max_size:
+                return False
+
+            size = 0
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                size += len(chunk)
+                if size > self.max_size:
+                    return False
+                if size > self.memory_size:
+                    await asyncio.to_thread(buffer.write, chunk)
+                else:
+                    buffer.write(chunk)
+
+        return True
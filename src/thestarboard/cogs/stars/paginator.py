@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Generic, TypeVar
+
+import discord
+from discord.app_commands import locale_str as _
+
+from thestarboard.translator import translate
+
+CursorT = TypeVar("CursorT")
+
+PageRenderer = Callable[
+    [CursorT | None, int],
+    Awaitable[tuple[discord.Embed, CursorT | None]],
+]
+
+
+class KeysetPaginator(discord.ui.View, Generic[CursorT]):
+    """Pages through keyset-paginated results with buttons.
+
+    Pages are rendered by a callback given the cursor to continue from,
+    or None for the first page, along with the page's index. It returns
+    the page's embed and the cursor for the next page, or None if this
+    is the last page.
+
+    The cursor starting each visited page is remembered so that going
+    back re-runs the same keyset query, and no page is ever fetched
+    by offset.
+
+    """
+
+    def __init__(
+        self,
+        render: PageRenderer[CursorT],
+        *,
+        user_id: int,
+        timeout: float = 300,
+    ) -> None:
+        super().__init__(timeout=timeout)
+        self.render = render
+        self.user_id = user_id
+        self.page = 0
+        self._cursors: list[CursorT | None] = [None]
+        self._next_cursor: CursorT | None = None
+        self._interaction: discord.Interaction | None = None
+
+    async def start(self, interaction: discord.Interaction, **kwargs) -> None:
+        """Sends the first page as a response to the given interaction."""
+        embed = await self._render_page()
+        self._interaction = interaction
+        await interaction.response.send_message(
+            embed=embed,
+            view=self,
+            allowed_mentions=discord.AllowedMentions.none(),
+            **kwargs,
+        )
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id == self.user_id:
+            return True
+
+        content = await translate(
+            # Response to user when paging through another user's results
+            _("Only the user who ran this command can change pages!"),
+            interaction,
+        )
+        await interaction.response.send_message(content, ephemeral=True)
+        return False
+
+    async def on_timeout(self) -> None:
+        if self._interaction is None:
+            return
+
+        self.clear_items()
+        try:
+            await self._interaction.edit_original_response(view=self)
+        except discord.HTTPException:
+            pass
+
+    @discord.ui.button(emoji="\N{BLACK LEFT-POINTING TRIANGLE}", disabled=True)
+    async def previous_page(
+        self,
+        interaction: discord.Interaction,
+        button: discord.ui.Button,
+    ):
+        self.page -= 1
+        await self._show_page(interaction)
+
+    @discord.ui.button(emoji="\N{BLACK RIGHT-POINTING TRIANGLE}")
+    async def next_page(
+        self,
+        interaction: discord.Interaction,
+        button: discord.ui.Button,
+    ):
+        if self.page + 1 == len(self._cursors):
+            self._cursors.append(self._next_cursor)
+        self.page += 1
+        await self._show_page(interaction)
+
+    async def _show_page(self, interaction: discord.Interaction) -> None:
+        embed = await self._render_page()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    async def _render_page(self) -> discord.Embed:
+        cursor = self._cursors[self.page]
+        embed, self._next_cursor = await self.render(cursor, self.page)
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self._next_cursor is None
+        return embed
@@ -0,0 +1,336 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Collection
+
+import discord
+from discord.ext import commands
+
+from thestarboard.admission import LoadShed, Priority
+from thestarboard.bot import Bot
+from thestarboard.database import DatabaseClient, StarEmojiSet
+
+if TYPE_CHECKING:
+    from .events import StarboardEvents
+
+log = logging.getLogger(__name__)
+
+
+async def fetch_message_stars(
+    message: discord.Message,
+    star_emojis: StarEmojiSet,
+) -> dict[int, list[str]]:
+    """Fetches the users who starred a message through the Discord API.
+
+    Reactions from bots are ignored.
+
+    :returns:
+        A mapping of user IDs to the star emojis they reacted with,
+        in the order the message's reactions are listed.
+
+    """
+    stars: dict[int, list[str]] = {}
+    for reaction in message.reactions:
+        if reaction.count < 1 or not is_star_reaction(reaction, star_emojis):
+            continue
+
+        emoji = str(reaction.emoji)
+
+        async for user in reaction.users(limit=None):
+            if not user.bot:
+                stars.setdefault(user.id, []).append(emoji)
+
+    return stars
+
+
+def is_star_reaction(reaction: discord.Reaction, star_emojis: StarEmojiSet) -> bool:
+    """Checks if a reaction's emoji is one of the given star emojis."""
+    emoji = reaction.emoji
+    if isinstance(emoji, str):
+        return star_emojis.matches(None, emoji)
+    return star_emojis.matches(emoji.id, emoji.name)
+
+
+def diff_message_stars(
+    stored: dict[int, str],
+    actual: dict[int, list[str]],
+) -> tuple[dict[int, str], set[int], dict[int, str]]:
+    """Compares a message's stored stars with its actual reactions.
+
+    Since only one star is stored per user, a stored emoji is kept
+    as long as the user still reacted with it.
+
+    :returns:
+        The stars to add and update as mappings of user IDs to emojis,
+        and the user IDs whose stars should be removed.
+
+    """
+    added: dict[int, str] = {}
+    updated: dict[int, str] = {}
+    for user_id, emojis in actual.items():
+        emoji = stored.get(user_id)
+        if emoji is None:
+            added[user_id] = emojis[0]
+        elif emoji not in emojis:
+            updated[user_id] = emojis[0]
+
+    removed = stored.keys() - actual.keys()
+    return added, removed, updated
+
+
+class LiveStarChanges:
+    """Records the stars changed by live events while a batch is reconciled.
+
+    Reactions fetched from Discord are a snapshot, so stars changed by
+    events received after the fetch started must be left alone, or else
+    the reconciled diff would revert them.
+
+    """
+
+    def __init__(self) -> None:
+        self.stars: set[tuple[int, int]] = set()
+        """The (message_id, user_id) pairs that were starred or un-starred."""
+        self.messages: set[int] = set()
+        """The messages whose reactions were cleared."""
+
+    def is_changed(self, message_id: int, user_id: int) -> bool:
+        """Checks if a user's star on a message was changed by an event."""
+        return message_id in self.messages or (message_id, user_id) in self.stars
+
+
+class StarboardReconciler(commands.Cog):
+    """Synchronizes stored stars with reactions on Discord.
+
+    Reactions added or removed while the bot was offline are never received
+    as events, so every starred message within its guild's maximum message
+    age is re-checked through the API once the bot is ready.
+
+    Messages are fetched with bounded concurrency, leaving discord.py to
+    wait out rate limits, and changes are applied one batch at a time.
+    Progress is checkpointed after each batch so that an interrupted scan
+    resumes where it left off rather than starting over.
+
+    Reaction events received while a batch is being reconciled take
+    precedence over its snapshot, so the stars they change are skipped.
+    Starboard messages are not refreshed wholesale, as described in
+    docs/dev/concept.md. Only messages whose stars were changed are
+    updated, after their batch has been committed.
+
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._task: asyncio.Task | None = None
+        self._live_changes: set[LiveStarChanges] = set()
+
+    async def cog_unload(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    @commands.Cog.listener("on_raw_reaction_add")
+    @commands.Cog.listener("on_raw_reaction_remove")
+    async def record_live_star(self, payload: discord.RawReactionActionEvent):
+        for changes in self._live_changes:
+            changes.stars.add((payload.message_id, payload.user_id))
+
+    @commands.Cog.listener("on_raw_reaction_clear")
+    @commands.Cog.listener("on_raw_reaction_clear_emoji")
+    async def record_live_clear(
+        self,
+        payload: discord.RawReactionClearEvent | discord.RawReactionClearEmojiEvent,
+    ):
+        for changes in self._live_changes:
+            changes.messages.add(payload.message_id)
+
+    @commands.Cog.listener("on_ready")
+    async def start_reconciliation(self):
+        if not self.bot.config.starboard.reconcile.enabled:
+            return
+        if self._task is not None and not self._task.done():
+            return
+
+        self._task = asyncio.create_task(self._reconcile_logged())
+
+    async def _reconcile_logged(self) -> None:
+        try:
+            await self.reconcile()
+        except Exception:
+            log.exception("Failed to reconcile stars")
+
+    async def reconcile(self, guild_ids: Collection[int] | None = None) -> None:
+        """Reconciles stars for every eligible message, resuming if possible.
+
+        :param guild_ids:
+            The guilds to reconcile messages in.
+            Defaults to every guild the bot is in.
+
+        """
+        async with self.bot.query.acquire() as query:
+            state = await query.get_star_reconciliation()
+            if state is None or state["finished_at"] is not None:
+                await query.start_star_reconciliation()
+                after = 0
+            else:
+                after = state["last_message_id"]
+                log.info("Resuming star reconciliation after message %d", after)
+
+        config = self.bot.config.starboard.reconcile
+        semaphore = asyncio.Semaphore(config.concurrency)
+        if guild_ids is None:
+            guild_ids = [guild.id for guild in self.bot.guilds]
+
+        while True:
+            async with self.bot.query.acquire() as query:
+                rows = await query.get_reconcilable_messages(
+                    guild_ids,
+                    after=after,
+                    limit=config.batch_size,
+                )
+            if not rows:
+                break
+
+            await self._reconcile_batch(rows, semaphore)
+            after = rows[-1]["message_id"]
+
+        async with self.bot.query.acquire() as query:
+            await query.finish_star_reconciliation()
+            state = await query.get_star_reconciliation()
+
+        assert state is not None
+        log.info(
+            "Reconciled stars for %d messages (%d added, %d removed)",
+            state["messages_checked"],
+            state["stars_added"],
+            state["stars_removed"],
+        )
+
+    async def _reconcile_batch(
+        self,
+        rows: list,
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        async with self.bot.query.acquire() as query:
+            star_emojis: dict[int, StarEmojiSet] = {}
+            for guild_id in {row["guild_id"] for row in rows}:
+                routes = await query.get_starboard_routes(guild_id)
+                star_emojis[guild_id] = routes.star_emojis
+
+        async def fetch(row) -> dict[int, list[str]] | None:
+            async with semaphore:
+                return await self._fetch_stars(
+                    row["message_id"],
+                    row["channel_id"],
+                    star_emojis[row["guild_id"]],
+                )
+
+        # Recorded until the batch commits, as events received before
+        # then may not have been stored when the diff is taken
+        live = LiveStarChanges()
+        self._live_changes.add(live)
+        changed: set[int] = set()
+        try:
+            results = await asyncio.gather(*map(fetch, rows))
+
+            async for attempt in self.bot.query.retrying():
+                async with attempt as query:
+                    changed = await self._apply_batch(query, rows, results, live)
+        finally:
+            self._live_changes.discard(live)
+
+        for row in rows:
+            if row["message_id"] in changed:
+                await self._update_starboards(row)
+
+    async def _apply_batch(
+        self,
+        query: DatabaseClient,
+        rows: list,
+        results: list[dict[int, list[str]] | None],
+        live: LiveStarChanges,
+    ) -> set[int]:
+        """Applies the differences between stored and fetched stars,
+        skipping stars changed by live events.
+
+        :returns: The IDs of messages whose stars were changed.
+
+        """
+        added: list[tuple[int, int, str]] = []
+        removed: list[tuple[int, int]] = []
+        updated: list[tuple[int, int, str]] = []
+
+        stored_stars = await query.get_message_stars(
+            [row["message_id"] for row in rows]
+        )
+
+        for row, actual in zip(rows, results):
+            if actual is None:
+                continue
+
+            message_id = row["message_id"]
+            a, r, u = diff_message_stars(stored_stars.get(message_id, {}), actual)
+            for user_id, emoji in a.items():
+                if not live.is_changed(message_id, user_id):
+                    added.append((message_id, user_id, emoji))
+            for user_id in r:
+                if not live.is_changed(message_id, user_id):
+                    removed.append((message_id, user_id))
+            for user_id, emoji in u.items():
+                if not live.is_changed(message_id, user_id):
+                    updated.append((message_id, user_id, emoji))
+
+        await query.apply_message_star_changes(
+            added=added,
+            removed=removed,
+            updated=updated,
+        )
+        await query.update_star_reconciliation(
+            rows[-1]["message_id"],
+            messages_checked=len(rows),
+            stars_added=len(added),
+            stars_removed=len(removed),
+        )
+
+        changed = {message_id for message_id, *_ in added}
+        changed.update(message_id for message_id, _ in removed)
+        changed.update(message_id for message_id, *_ in updated)
+        return changed
+
+    async def _update_starboards(self, row) -> None:
+        """Updates the starboard messages of a reconciled message.
+
+        Updates are skipped while the bot is shedding load, in which case
+        reconciled counts are shown the next time the message is starred.
+
+        """
+        events: StarboardEvents | None = self.bot.get_cog("StarboardEvents")  # type: ignore
+        if events is None:
+            return
+
+        try:
+            async with self.bot.admission.admit(Priority.EDIT, row["guild_id"]):
+                async with self.bot.query.acquire():
+                    await events._request_star_update(
+                        row["message_id"],
+                        guild_id=row["guild_id"],
+                        channel_id=row["channel_id"],
+                    )
+        except LoadShed:
+            pass
+        except Exception:
+            log.exception(
+                "Failed to update starboard of reconciled message %d",
+                row["message_id"],
+            )
+
+    async def _fetch_stars(
+        self,
+        message_id: int,
+        channel_id: int,
+        star_emojis: StarEmojiSet,
+    ) -> dict[int, list[str]] | None:
+        channel = self.bot.get_partial_messageable(channel_id)
+        try:
+            message = await channel.fetch_message(message_id)
+            return await fetch_message_stars(message, star_emojis)
+        except (discord.Forbidden, discord.NotFound):
+            # Deleted messages and channels are left for the Cleanup cog
+            return None
@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+
+
+class _StarCounter:
+    """Counts a message's stars in a ring buffer of fixed-length time buckets."""
+
+    __slots__ = ("counts", "last_bucket")
+
+    def __init__(self, n_buckets: int, bucket: int) -> None:
+        self.counts = [0] * n_buckets
+        self.last_bucket = bucket
+
+    def advance(self, bucket: int) -> None:
+        """Clears buckets that have fallen out of the window."""
+        n_buckets = len(self.counts)
+        elapsed = bucket - self.last_bucket
+        if elapsed >= n_buckets:
+            self.counts[:] = [0] * n_buckets
+        else:
+            for i in range(self.last_bucket + 1, bucket + 1):
+                self.counts[i % n_buckets] = 0
+        self.last_bucket = max(bucket, self.last_bucket)
+
+    def add(self, bucket: int, delta: int) -> int:
+        self.advance(bucket)
+        self.counts[bucket % len(self.counts)] += delta
+        return max(sum(self.counts), 0)
+
+
+class StarVelocityTracker:
+    """Tracks how many stars each message received within a sliding window.
+
+    The window is divided into equal buckets, and each message keeps
+    one counter per bucket in a ring buffer so that old stars expire
+    without storing a timestamp per star.
+
+    Counters are kept in least recently starred order. Messages whose
+    window has fully expired are evicted as new stars arrive, and the
+    least recently starred messages are evicted once `max_messages`
+    is exceeded, bounding memory regardless of traffic.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        window: float,
+        n_buckets: int,
+        max_messages: int,
+    ) -> None:
+        self.window = window
+        self.n_buckets = n_buckets
+        self.max_messages = max_messages
+        self._bucket_length = window / n_buckets
+        self._counters: OrderedDict[int, _StarCounter] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def add_star(self, message_id: int, *, now: float | None = None) -> int:
+        """Records a star being added to a message.
+
+        :returns: The number of stars received within the window.
+
+        """
+        bucket = self._get_bucket(now)
+        counter = self._counters.get(message_id)
+        if counter is None:
+            counter = _StarCounter(self.n_buckets, bucket)
+            self._counters[message_id] = counter
+        else:
+            self._counters.move_to_end(message_id)
+
+        rate = counter.add(bucket, 1)
+        self._evict(bucket)
+        return rate
+
+    def remove_star(self, message_id: int, *, now: float | None = None) -> int:
+        """Records a star being removed from a message.
+
+        Messages that are not being tracked are ignored.
+
+        :returns: The number of stars received within the window.
+
+        """
+        counter = self._counters.get(message_id)
+        if counter is None:
+            return 0
+
+        return counter.add(self._get_bucket(now), -1)
+
+    def get_rate(self, message_id: int, *, now: float | None = None) -> int:
+        """Gets the number of stars a message received within the window."""
+        counter = self._counters.get(message_id)
+        if counter is None:
+            return 0
+
+        return counter.add(self._get_bucket(now), 0)
+
+    def discard(self, message_id: int) -> None:
+        """Stops tracking a message."""
+        self._counters.pop(message_id, None)
+
+    def _get_bucket(self, now: float | None) -> int:
+        if now is None:
+            now = time.monotonic()
+        return int(now // self._bucket_length)
+
+    def _evict(self, bucket: int) -> None:
+        while len(self._counters) > self.max_messages:
+            self._counters.popitem(last=False)
+
+        expired = bucket - self.n_buckets
+        while self._counters:
+            counter = next(iter(self._counters.values()))
+            if counter.last_bucket > expired:
+                break
+            self._counters.popitem(last=False)
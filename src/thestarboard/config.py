@@ -13,6 +13,10 @@ if TYPE_CHECKING:
     import asyncpg
     import discord
 
+    from .admission import AdmissionController
+    from .database import StarEmojiSet
+    from .scheduler import ChannelScheduler
+
 _package_files = importlib.resources.files(__package__)
 CONFIG_DEFAULT_RESOURCE = _package_files.joinpath("config_default.toml")
 
@@ -25,6 +29,7 @@ class _BaseModel(BaseModel):
 # https://docs.pydantic.dev/usage/settings/
 class Settings(_BaseModel):
     bot: SettingsBot
+    cleanup: SettingsCleanup
     db: SettingsDB
     starboard: SettingsStarboard
 
@@ -32,10 +37,27 @@ class Settings(_BaseModel):
 class SettingsBot(_BaseModel):
     allow_jishaku: bool
     extensions: list[str]
+    http: SettingsBotHTTP
     intents: SettingsBotIntents
     token: str
 
 
+class SettingsBotHTTP(_BaseModel):
+    """Schedules starboard posts, edits, and deletions in each channel.
+
+    .. seealso:: :class:`thestarboard.scheduler.ChannelScheduler`
+
+    """
+
+    channel_concurrency: int
+    """The maximum number of requests sent to each channel at once."""
+
+    def create_scheduler(self) -> ChannelScheduler:
+        from .scheduler import ChannelScheduler
+
+        return ChannelScheduler(channel_concurrency=self.channel_concurrency)
+
+
 class SettingsBotIntents(_BaseModel):
     """The intents used when connecting to the Discord gateway.
 
@@ -56,6 +78,64 @@ class SettingsBotIntents(_BaseModel):
         return discord.Intents(**intents)
 
 
+class SettingsCleanup(_BaseModel):
+    delete_interval: float
+    """The number of seconds between each batch of deletions.
+
+    Deleted messages, channels, and guilds are buffered and removed
+    from the database together once per interval.
+
+    """
+    purge_chunk_size: int
+    """The maximum number of rows deleted at once when purging a guild."""
+    purge_pause: float
+    """The number of seconds to wait between each chunk of a guild purge."""
+    gc: SettingsCleanupGC
+    partitions: SettingsCleanupPartitions
+
+
+class SettingsCleanupGC(_BaseModel):
+    """Periodically removes rows that are no longer referenced.
+
+    This includes messages without any stars, channels without
+    any messages, and users without any messages or stars,
+    such as those left behind while the bot was offline.
+
+    """
+
+    enabled: bool
+    interval: float
+    """The number of seconds between each garbage collection run."""
+    batch_size: int
+    """The number of rows scanned per batch."""
+    time_budget: float
+    """The maximum number of seconds a single run may take.
+
+    Runs stop after the current batch once this is exceeded,
+    and the next run resumes from where the previous one stopped.
+
+    """
+
+
+class SettingsCleanupPartitions(_BaseModel):
+    """Maintains the monthly partitions of message tables.
+
+    Messages older than every guild's maximum starboard message age
+    can no longer be starboarded, so their partitions are dropped
+    entirely instead of deleting their rows one by one.
+    Starboarded messages are always retained.
+
+    """
+
+    enabled: bool
+    interval: float
+    """The number of seconds between each maintenance run."""
+    months_ahead: int
+    """The number of future months to create partitions for in advance."""
+    retention_margin_days: int
+    """The number of days to keep partitions beyond the maximum message age."""
+
+
 class SettingsDB(_BaseModel):
     dsn: str
     """The data source name used for connecting to the database.
@@ -67,6 +147,15 @@ class SettingsDB(_BaseModel):
     """
     password_file: str
     """An optional file to read the database password from."""
+    admission: SettingsDBAdmission
+    max_retries: int
+    """The number of times a transaction is retried after a deadlock
+    or serialization failure.
+    """
+    retry_delay: float
+    """The base delay in seconds between retries, doubled after each one."""
+    max_retry_delay: float
+    """The maximum delay in seconds between retries."""
 
     @contextlib.asynccontextmanager
     async def create_pool(self) -> AsyncGenerator[asyncpg.Pool, None]:
@@ -82,18 +171,256 @@ class SettingsDB(_BaseModel):
             yield pool
 
 
+class SettingsDBAdmission(_BaseModel):
+    """Limits the work using the database at once.
+
+    .. seealso:: :class:`thestarboard.admission.AdmissionController`
+
+    """
+
+    max_in_flight: int
+    """The maximum amount of work using the database at once.
+
+    This should be less than the connection pool's size so that
+    commands can still acquire connections.
+
+    """
+    degraded_depth: int
+    """The number of tasks waiting for capacity before low-priority work
+    is shed, excluding tasks held back by their guild's limits.
+    """
+    send: int
+    """The maximum number of star reactions handled at once."""
+    delete: int
+    """The maximum number of message deletions handled at once."""
+    edit: int
+    """The maximum number of starboard edits handled at once."""
+    cleanup: int
+    """The maximum number of cleanup tasks run at once."""
+    guild_concurrency: int
+    """The maximum number of events of each guild using the database at once.
+
+    Guilds also take turns being admitted, so a busy guild
+    cannot starve the others.
+
+    """
+    guild_rate: float
+    """The number of events admitted per second for each guild."""
+    guild_burst: int
+    """The number of events a guild can have admitted at once
+    before being limited by :attr:`guild_rate`.
+    """
+
+    def create_controller(self) -> AdmissionController:
+        from .admission import AdmissionController, Priority
+
+        return AdmissionController(
+            max_in_flight=self.max_in_flight,
+            limits={
+                Priority.SEND: self.send,
+                Priority.DELETE: self.delete,
+                Priority.EDIT: self.edit,
+                Priority.CLEANUP: self.cleanup,
+            },
+            degraded_depth=self.degraded_depth,
+            key_limit=self.guild_concurrency,
+            key_rate=self.guild_rate,
+            key_burst=self.guild_burst,
+        )
+
+
 class SettingsStarboard(_BaseModel):
     allowed_emojis: list[str]
-    """A list of emojis eligible for the starboard."""
+    """A list of emojis eligible for the starboard.
+
+    Guilds can override this with their own emojis.
+    Custom emojis should be written as ``<:name:id>``.
+
+    """
+    analyze: SettingsStarboardAnalyze
+    backfill: SettingsStarboardBackfill
+    breaker: SettingsStarboardBreaker
+    jobs: SettingsStarboardJobs
+    leaderboard: SettingsStarboardLeaderboard
+    mirror: SettingsStarboardMirror
+    reconcile: SettingsStarboardReconcile
+    rising: SettingsStarboardRising
+
+    def create_star_emojis(self) -> StarEmojiSet:
+        from .database import StarEmojiSet
+
+        return StarEmojiSet.from_strings(self.allowed_emojis)
+
+
+class SettingsStarboardAnalyze(_BaseModel):
+    """Suggests star thresholds for the /starboard analyze command."""
+
+    target_posts_per_day: float
+    """The maximum number of starboard posts per day a suggestion aims for."""
+
+
+class SettingsStarboardBackfill(_BaseModel):
+    """Loads starred messages from a channel's history on request."""
+
+    batch_size: int
+    """The number of messages scanned before each checkpoint."""
+    pause: float
+    """The number of seconds to wait between each batch."""
+
+
+class SettingsStarboardBreaker(_BaseModel):
+    """Stops requests to starboard posts and channels that recently failed.
+
+    Posts that were deleted by someone else, and channels that the bot
+    can no longer access, are skipped for a cooldown instead of failing
+    on every star. Deleted posts are also removed from the database,
+    and starboards are only removed once their channel keeps failing
+    after being skipped for :attr:`max_cooldown`.
+
+    """
+
+    cooldown: float
+    """The number of seconds a failed post or channel is skipped for."""
+    max_cooldown: float
+    """The maximum number of seconds a channel is skipped for.
+
+    Channels that keep failing have their cooldown doubled each time.
+
+    """
+    max_messages: int
+    """The maximum number of failed posts remembered at once."""
+
+
+class SettingsStarboardJobs(_BaseModel):
+    """Queues starboard updates as jobs in the database.
+
+    Instead of updating starboard messages while handling each event,
+    events add jobs that are merged per message until a worker claims
+    them. Pending jobs survive restarts, and every process sharing the
+    database can run jobs from the same queue.
+
+    Each process holds one pooled connection to listen for new jobs.
+
+    """
+
+    enabled: bool
+    concurrency: int
+    """The maximum number of jobs run at once by this process."""
+    lease: float
+    """The number of seconds before a claimed job that has not finished
+    can be claimed again, such as when its process stopped mid-job.
+
+    This should be longer than any job is expected to take.
+
+    """
+    poll_interval: float
+    """The number of seconds between checks for jobs, in case
+    a notification is missed.
+    """
+    retry_delay: float
+    """The base delay in seconds before a failed job is retried,
+    doubled after each attempt.
+    """
+    max_attempts: int
+    """The number of times a job is attempted before it is dropped."""
+
+
+class SettingsStarboardLeaderboard(_BaseModel):
+    """Ranks starred messages and authors for the /starboard top command.
+
+    Rankings are precomputed by materialized views which are refreshed
+    concurrently on an interval, so commands never aggregate stars
+    on demand and may lag behind by up to one interval.
+
+    """
+
+    refresh_interval: float
+    """The number of seconds between each leaderboard refresh."""
+    page_size: int
+    """The number of entries shown per page."""
+
+
+class SettingsStarboardMirror(_BaseModel):
+    """Re-uploads images with starboard posts instead of linking to them.
+
+    Attachment URLs expire and stop working once the original message
+    is deleted, so mirrored images keep starboard posts intact.
+    Images are streamed to a temporary file while downloading
+    rather than being held in memory.
+
+    """
+
+    enabled: bool
+    max_size: int
+    """The maximum size in bytes of images to mirror.
+
+    Larger images are linked to instead. This should not exceed
+    the upload limit of the guilds the bot is in.
+
+    """
+    concurrency: int
+    """The maximum number of images downloaded at once."""
+    chunk_size: int
+    """The number of bytes read from a download at a time."""
+    memory_size: int
+    """The number of bytes kept in memory per download before
+    the rest is written to disk.
+    """
+    timeout: float
+    """The maximum number of seconds a download can take."""
+
+
+class SettingsStarboardReconcile(_BaseModel):
+    """Synchronizes stars with reactions on Discord after connecting.
+
+    Reactions added or removed while the bot was offline are never
+    received as events, so recently starred messages are re-checked
+    through the API in batches.
+
+    """
+
+    enabled: bool
+    batch_size: int
+    """The number of messages checked before each checkpoint."""
+    concurrency: int
+    """The maximum number of messages fetched from the API at once."""
+
+
+class SettingsStarboardRising(_BaseModel):
+    """Tracks star velocity for guilds with a rising rate set.
+
+    Each message's recent stars are counted in memory, so velocity
+    is lost on restart and messages evicted from the tracker start
+    counting from zero again.
+
+    """
+
+    window: float
+    """The number of seconds that stars are counted within."""
+    buckets: int
+    """The number of buckets the window is divided into.
+
+    Stars expire one bucket at a time, so more buckets make the window
+    slide more smoothly at the cost of memory per message.
+
+    """
+    max_messages: int
+    """The maximum number of messages tracked at once.
+
+    Once exceeded, the least recently starred messages are evicted first.
+
+    """
 
 
 Settings.model_rebuild()
 SettingsBot.model_rebuild()
+SettingsCleanup.model_rebuild()
+SettingsDB.model_rebuild()
+SettingsStarboard.model_rebuild()
 
 
 class OpenableBinary(Protocol):
-    def open(self, __mode: Literal["rb"], /) -> io.BufferedIOBase:
-        ...
+    def open(self, __mode: Literal["rb"], /) -> io.BufferedIOBase: ...
 
 
 def _recursive_update(dest: dict, src: dict) -> None:
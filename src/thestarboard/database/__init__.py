@@ -1,2 +1,8 @@
-from .api import DatabaseClient
+from .api import (
+    DatabaseClient,
+    LeaderboardPeriod,
+    StarboardJobOperation,
+    TransactionAttempt,
+)
 from .cache import CacheSet, ExpiringMemoryCacheSet
+from .routing import StarEmojiSet, Starboard, StarboardRoutes
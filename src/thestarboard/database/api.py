@@ -1,16 +1,137 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
 import datetime
+import functools
+import json
+import random
+from collections import Counter
 from contextvars import ContextVar
-from typing import TYPE_CHECKING, AsyncGenerator, Self
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Collection,
+    Literal,
+    Self,
+)
 
 from .cache import CacheSet, ExpiringMemoryCacheSet
+from .routing import StarEmojiSet, Starboard, StarboardRoutes
 
 if TYPE_CHECKING:
     import asyncpg
 
 _current_conn: ContextVar[asyncpg.Connection] = ContextVar("_current_conn")
+# Cache keys added during the current transaction, discarded if it rolls back
+_added_cache_keys: ContextVar[list[str] | None] = ContextVar(
+    "_added_cache_keys",
+    default=None,
+)
+# Callbacks undoing in-memory changes if the current transaction rolls back
+_rollback_callbacks: ContextVar[list[Callable[[], object]] | None] = ContextVar(
+    "_rollback_callbacks",
+    default=None,
+)
+# Callbacks for in-memory changes that should only happen once the current
+# transaction commits
+_commit_callbacks: ContextVar[list[Callable[[], object]] | None] = ContextVar(
+    "_commit_callbacks",
+    default=None,
+)
+_current_attempt: ContextVar[TransactionAttempt | None] = ContextVar(
+    "_current_attempt",
+    default=None,
+)
+
+LeaderboardPeriod = Literal["week", "month", "all"]
+StarboardJobOperation = Literal["send", "edit", "delete"]
+
+# Each query takes ($1 = guild_id, $2 = limit), ordered from leaf tables upwards
+_GUILD_PURGE_QUERIES = (
+    "DELETE FROM message_star WHERE (message_id, user_id) IN ("
+    "    SELECT ms.message_id, ms.user_id FROM message_star ms"
+    "    JOIN message m ON m.id = ms.message_id"
+    "    JOIN channel c ON c.id = m.channel_id"
+    "    WHERE c.guild_id = $1 LIMIT $2"
+    ") RETURNING message_id",
+    # Totals are only removed after their stars, so that they stay correct
+    # through the message_star trigger if the purge is cancelled partway
+    "DELETE FROM message_star_total WHERE message_id IN ("
+    "    SELECT mst.message_id FROM message_star_total mst"
+    "    JOIN message m ON m.id = mst.message_id"
+    "    JOIN channel c ON c.id = m.channel_id"
+    "    WHERE c.guild_id = $1 LIMIT $2"
+    ") RETURNING message_id",
+    "DELETE FROM starboard_message WHERE message_id IN ("
+    "    SELECT sm.message_id FROM starboard_message sm"
+    "    JOIN message m ON m.id = sm.star_message_id"
+    "    JOIN channel c ON c.id = m.channel_id"
+    "    WHERE c.guild_id = $1 LIMIT $2"
+    ") RETURNING message_id",
+    "DELETE FROM message WHERE id IN ("
+    "    SELECT m.id FROM message m"
+    "    JOIN channel c ON c.id = m.channel_id"
+    "    WHERE c.guild_id = $1 LIMIT $2"
+    ") RETURNING id",
+    "DELETE FROM channel WHERE id IN ("
+    "    SELECT id FROM channel WHERE guild_id = $1 LIMIT $2"
+    ") RETURNING guild_id",
+)
+
+# Starboard jobs are claimed in this order, matching claim_starboard_jobs()
+_JOB_ORDER: dict[str, int] = {"send": 0, "delete": 1, "edit": 2}
+
+
+class TransactionAttempt:
+    """One attempt at running a transaction yielded by
+    :meth:`DatabaseClient.retrying()`.
+
+    Entering this acquires a connection and opens a transaction.
+    If the block fails with a deadlock or serialization failure and
+    retries remain, the error is suppressed so that the next attempt
+    can run the block again, unless the block made a request that
+    cannot be repeated (see :meth:`DatabaseClient.prevent_retry()`).
+
+    """
+
+    def __init__(self, client: DatabaseClient, *, retryable: bool) -> None:
+        self.client = client
+        self.retryable = retryable
+        self.repeatable = True
+        """Whether the block can be run again, i.e. it has not made
+        any request that cannot be repeated.
+        """
+        self.error: BaseException | None = None
+        """The error suppressed by this attempt, if any."""
+        self._manager: contextlib.AbstractAsyncContextManager | None = None
+        self._token = None
+
+    async def __aenter__(self) -> DatabaseClient:
+        self._manager = self.client.acquire()
+        client = await self._manager.__aenter__()
+        self._token = _current_attempt.set(self)
+        return client
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        assert self._manager is not None
+        if self._token is not None:
+            _current_attempt.reset(self._token)
+            self._token = None
+        # Rolls back the transaction before the error is handled
+        suppress = await self._manager.__aexit__(exc_type, exc, tb)
+
+        if isinstance(exc, _retryable_errors()):
+            name = type(exc).__name__
+            if self.retryable and self.repeatable:
+                self.client.retries[name] += 1
+                self.error = exc
+                return True
+            self.client.retries_exhausted[name] += 1
+        return bool(suppress)
 
 
 class DatabaseClient:
@@ -21,9 +142,46 @@ class DatabaseClient:
         pool: asyncpg.Pool,
         *,
         cache: CacheSet | None = None,
+        default_star_emojis: StarEmojiSet | None = None,
+        max_retries: int = 5,
+        retry_delay: float = 0.05,
+        max_retry_delay: float = 2,
     ) -> None:
         self.pool = pool
+        self.max_retries = max_retries
+        """The number of times :meth:`retrying()` re-runs a failed transaction."""
+        self.retry_delay = retry_delay
+        """The base delay in seconds between retries, doubled after each one."""
+        self.max_retry_delay = max_retry_delay
+        """The maximum delay in seconds between retries."""
+        self.retries: Counter[str] = Counter()
+        """The number of transactions retried since startup, by error name."""
+        self.retries_exhausted: Counter[str] = Counter()
+        """The number of transactions that failed after every retry, by error name."""
         self.cache: CacheSet = cache or ExpiringMemoryCacheSet(expires_after=1800)
+        self.default_star_emojis = default_star_emojis or StarEmojiSet()
+        """The star emojis of guilds that have not set their own.
+
+        If this is replaced, :attr:`starboard_routes` should be cleared.
+
+        """
+        self.message_ids: set[int] = set()
+        """The IDs of messages known to exist in the database.
+
+        This is populated by :meth:`load_message_ids()` and kept up-to-date
+        by methods that insert or remove messages. Since messages are only
+        stored when they are starred, this allows most events for unrelated
+        messages to be filtered out without a query.
+
+        """
+        self.starboard_routes: dict[int, StarboardRoutes] = {}
+        """Each guild's compiled starboard routes, loaded on demand.
+
+        This is populated by :meth:`get_starboard_routes()` and invalidated
+        by methods that change a guild's starboards, both right away and
+        once their transaction ends (see :meth:`invalidate_starboard_routes()`).
+
+        """
 
     # Connection methods
 
@@ -55,13 +213,120 @@ class DatabaseClient:
             else:
                 transaction_manager = contextlib.nullcontext()
 
+            commit_callbacks: list[Callable[[], object]] = []
             async with transaction_manager:
                 token = _current_conn.set(conn)
+                keys_token = _added_cache_keys.set([] if transaction else None)
+                callbacks_token = _rollback_callbacks.set([] if transaction else None)
+                commit_token = _commit_callbacks.set(
+                    commit_callbacks if transaction else None
+                )
                 try:
                     yield self
+                except BaseException:
+                    # Rows inserted by this transaction are about to be
+                    # rolled back, so they must be inserted again next time
+                    for key in _added_cache_keys.get() or ():
+                        await self.cache.discard(key)
+                    for callback in reversed(_rollback_callbacks.get() or ()):
+                        callback()
+                    raise
                 finally:
+                    _commit_callbacks.reset(commit_token)
+                    _rollback_callbacks.reset(callbacks_token)
+                    _added_cache_keys.reset(keys_token)
                     _current_conn.reset(token)
 
+            for callback in commit_callbacks:
+                callback()
+
+    async def retrying(self) -> AsyncIterator[TransactionAttempt]:
+        """Yields attempts at running a transaction until one succeeds.
+
+        Each attempt should be entered with ``async with`` in place of
+        :meth:`acquire()`::
+
+            async for attempt in query.retrying():
+                async with attempt as query:
+                    ...
+
+        If the block fails with a deadlock or serialization failure, the
+        transaction is rolled back and the block is run again after an
+        exponential backoff with full jitter, up to :attr:`max_retries` times.
+        The block should therefore avoid side effects that cannot be repeated,
+        undo in-memory changes with :meth:`on_rollback()`, and call
+        :meth:`prevent_retry()` before making any request that cannot be
+        undone.
+
+        """
+        for n in range(self.max_retries + 1):
+            attempt = TransactionAttempt(self, retryable=n < self.max_retries)
+            yield attempt
+            if attempt.error is None:
+                return
+
+            delay = min(self.max_retry_delay, self.retry_delay * 2**n)
+            await asyncio.sleep(random.uniform(0, delay))
+
+    def on_rollback(self, callback: Callable[[], object]) -> None:
+        """Calls the given function if the current transaction rolls back,
+        such as to undo an in-memory change before a retry.
+
+        Callbacks are called in reverse order of registration.
+        Outside of a transaction, this does nothing.
+
+        """
+        callbacks = _rollback_callbacks.get()
+        if callbacks is not None:
+            callbacks.append(callback)
+
+    def on_commit(self, callback: Callable[[], object]) -> None:
+        """Calls the given function once the current transaction commits,
+        such as to invalidate a cache that concurrent transactions could
+        otherwise refill with rows from before the commit.
+
+        Callbacks are called in order of registration.
+        Outside of a transaction, the function is called immediately.
+
+        """
+        callbacks = _commit_callbacks.get()
+        if callbacks is not None:
+            callbacks.append(callback)
+        else:
+            callback()
+
+    def invalidate_starboard_routes(self, guild_id: int | None = None) -> None:
+        """Removes a guild's cached starboard routes, or every guild's routes
+        if no guild is given.
+
+        Within a transaction, the routes are removed again once it commits
+        or rolls back, since other events may cache routes loaded before
+        the commit in the meantime.
+
+        """
+        if guild_id is None:
+            invalidate = self.starboard_routes.clear
+        else:
+            invalidate = functools.partial(self.starboard_routes.pop, guild_id, None)
+
+        invalidate()
+        self.on_commit(invalidate)
+        self.on_rollback(invalidate)
+
+    def prevent_retry(self) -> None:
+        """Prevents the current attempt of :meth:`retrying()` from being
+        retried if it fails.
+
+        This should be called before making a request that cannot be
+        repeated or rolled back, such as sending a Discord message,
+        so that a failed transaction does not make the request twice.
+        Outside of :meth:`retrying()`, this does nothing.
+
+        """
+        attempt = _current_attempt.get()
+        if attempt is not None:
+            attempt.repeatable = False
+
     # Guild methods
 
     async def add_guild(self, guild_id: int) -> None:
@@ -78,6 +343,68 @@ class DatabaseClient:
             guild_id,
         )
 
+    async def mark_guild_purges(self, guild_ids: Collection[int]) -> None:
+        """Marks the given guilds to have their rows deleted by :meth:`purge_guild()`.
+
+        Guilds that do not exist in the database are ignored.
+
+        """
+        await self.conn.execute(
+            "INSERT INTO guild_purge (guild_id) "
+            "SELECT id FROM guild WHERE id = any($1::bigint[]) "
+            "ON CONFLICT DO NOTHING",
+            guild_ids,
+        )
+
+    async def unmark_guild_purge(self, guild_id: int) -> None:
+        """Cancels the pending purge of a guild, if any.
+
+        Rows that were already purged are not restored.
+
+        """
+        await self.conn.execute("DELETE FROM guild_purge WHERE guild_id = $1", guild_id)
+
+    async def get_guild_purges(self) -> list[asyncpg.Record]:
+        """Gets every pending guild purge, oldest first."""
+        return await self.conn.fetch(
+            "SELECT guild_id, requested_at, rows_deleted FROM guild_purge "
+            "ORDER BY requested_at, guild_id"
+        )
+
+    async def purge_guild(self, guild_id: int, *, limit: int) -> int:
+        """Deletes up to `limit` rows belonging to a guild marked for purging.
+
+        Dependent rows are deleted before the rows they reference so that
+        each call only locks a bounded number of rows, rather than cascading
+        through every table at once. After everything else is gone,
+        the guild itself is deleted which also removes its purge mark.
+
+        :returns:
+            The number of rows deleted, or 0 once the guild itself
+            has been deleted.
+
+        """
+        for query in _GUILD_PURGE_QUERIES:
+            rows = await self.conn.fetch(query, guild_id, limit)
+            if rows:
+                break
+        else:
+            await self.conn.execute("DELETE FROM guild WHERE id = $1", guild_id)
+            await self.cache.discard(self._cache_key("guild", guild_id))
+            self.invalidate_starboard_routes(guild_id)
+            return 0
+
+        if "id" in rows[0]:
+            self.message_ids.difference_update(row["id"] for row in rows)
+
+        await self.conn.execute(
+            "UPDATE guild_purge SET rows_deleted = rows_deleted + $2 "
+            "WHERE guild_id = $1",
+            guild_id,
+            len(rows),
+        )
+        return len(rows)
+
     # Channel methods
 
     async def add_channel(
@@ -106,6 +433,15 @@ class DatabaseClient:
             guild_id,
         )
 
+    async def remove_channels(self, channel_ids: Collection[int]) -> None:
+        """Removes the given channel IDs and all of their messages from the database."""
+        await self.conn.execute(
+            "DELETE FROM channel WHERE id = any($1::bigint[])",
+            channel_ids,
+        )
+        # Deleted channels may have been starboards of any guild
+        self.invalidate_starboard_routes()
+
     # User methods
 
     async def add_user(self, user_id: int) -> None:
@@ -157,6 +493,31 @@ class DatabaseClient:
             channel_id,
             user_id,
         )
+        self.message_ids.add(message_id)
+
+    async def load_message_ids(self) -> None:
+        """Loads every message ID from the database into :attr:`message_ids`."""
+        message_ids: set[int] = set()
+        async for row in self.conn.cursor("SELECT id FROM message", prefetch=10000):
+            message_ids.add(row["id"])
+        self.message_ids = message_ids
+
+    async def remove_messages(self, message_ids: Collection[int]) -> None:
+        """Removes the given message IDs from the database.
+
+        Any starboard entries for these messages are removed as well.
+
+        """
+        # starboard_message.star_message_id does not cascade on delete
+        await self.conn.execute(
+            "DELETE FROM starboard_message WHERE star_message_id = any($1::bigint[])",
+            message_ids,
+        )
+        await self.conn.execute(
+            "DELETE FROM message WHERE id = any($1::bigint[])",
+            message_ids,
+        )
+        self.message_ids.difference_update(message_ids)
 
     # Message star methods
 
@@ -168,7 +529,7 @@ class DatabaseClient:
         *,
         channel_id: int,
         guild_id: int | None = None,
-    ):
+    ) -> bool:
         """Inserts the given message ID into the database.
 
         If the message exists, this is a no-op.
@@ -176,36 +537,44 @@ class DatabaseClient:
         Missing guilds are automatically inserted.
         Missing users are automatically inserted.
 
+        :returns: True if the star was added, or False if the user already starred it.
+
         """
         # This method does not frequently collide, so no cache check needed
         await self.add_message(message_id, channel_id, user_id, guild_id=guild_id)
-        await self.conn.execute(
+        result = await self.conn.execute(
             "INSERT INTO message_star (message_id, user_id, emoji) "
             "VALUES ($1, $2, $3) ON CONFLICT DO NOTHING",
             message_id,
             user_id,
             emoji,
         )
+        # INSERT 0 <rows>
+        return result != "INSERT 0 0"
 
     async def remove_message_star(
         self,
         message_id: int,
         user_id: int,
         emoji: str,
-    ) -> None:
+    ) -> bool:
         """Removes the given message star from the database.
 
         If the message star does not exist, this is a no-op.
 
+        :returns: True if the star was removed.
+
         """
         # This method does not frequently collide, so no cache check needed
-        await self.conn.execute(
+        result = await self.conn.execute(
             "DELETE FROM message_star "
             "WHERE message_id = $1 AND user_id = $2 AND emoji = $3",
             message_id,
             user_id,
             emoji,
         )
+        # DELETE <rows>
+        return result != "DELETE 0"
 
     async def get_message_star_total(self, message_id: int) -> int:
         """Gets a message's star total."""
@@ -215,23 +584,138 @@ class DatabaseClient:
         )
         return total or 0
 
+    async def get_message_stars(
+        self,
+        message_ids: Collection[int],
+    ) -> dict[int, dict[int, str]]:
+        """Gets the stars of each given message as a mapping of user IDs to emojis.
+
+        Messages without any stars are omitted.
+
+        """
+        rows = await self.conn.fetch(
+            "SELECT message_id, user_id, emoji FROM message_star "
+            "WHERE message_id = any($1::bigint[])",
+            message_ids,
+        )
+        stars: dict[int, dict[int, str]] = {}
+        for row in rows:
+            stars.setdefault(row["message_id"], {})[row["user_id"]] = row["emoji"]
+        return stars
+
+    async def apply_message_star_changes(
+        self,
+        *,
+        added: Collection[tuple[int, int, str]] = (),
+        removed: Collection[tuple[int, int]] = (),
+        updated: Collection[tuple[int, int, str]] = (),
+    ) -> None:
+        """Applies a batch of star changes to existing messages.
+
+        :param added: The (message_id, user_id, emoji) stars to insert.
+        :param removed: The (message_id, user_id) stars to delete.
+        :param updated: The (message_id, user_id, emoji) stars to change emojis of.
+
+        Missing users are automatically inserted.
+
+        """
+        if added:
+            message_ids, user_ids, emojis = zip(*added)
+            await self.conn.execute(
+                'INSERT INTO "user" (id) SELECT unnest($1::bigint[]) '
+                "ON CONFLICT DO NOTHING",
+                set(user_ids),
+            )
+            await self.conn.execute(
+                "INSERT INTO message_star (message_id, user_id, emoji) "
+                "SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::text[]) "
+                "ON CONFLICT DO NOTHING",
+                message_ids,
+                user_ids,
+                emojis,
+            )
+        if removed:
+            message_ids, user_ids = zip(*removed)
+            await self.conn.execute(
+                "DELETE FROM message_star WHERE (message_id, user_id) IN ("
+                "    SELECT * FROM unnest($1::bigint[], $2::bigint[])"
+                ")",
+                message_ids,
+                user_ids,
+            )
+        if updated:
+            message_ids, user_ids, emojis = zip(*updated)
+            await self.conn.execute(
+                "UPDATE message_star ms SET emoji = u.emoji "
+                "FROM unnest($1::bigint[], $2::bigint[], $3::text[]) "
+                "    AS u (message_id, user_id, emoji) "
+                "WHERE ms.message_id = u.message_id AND ms.user_id = u.user_id",
+                message_ids,
+                user_ids,
+                emojis,
+            )
+
     # Starboard message methods
 
     async def add_starboard_message(
         self,
         message_id: int,
         star_message_id: int,
+        *,
+        rising: bool = False,
+        content_fingerprint: bytes | None = None,
+        embed_fingerprint: bytes | None = None,
+        image_filename: str | None = None,
     ):
         """Inserts the given starboard message into the database.
 
         Both message IDs must exist in the database beforehand.
 
+        :param rising:
+            Whether the message was sent for rising quickly rather than
+            reaching the star threshold.
+        :param content_fingerprint:
+            The fingerprint of the content the message was sent with.
+        :param embed_fingerprint:
+            The fingerprint of the embed the message was sent with.
+        :param image_filename:
+            The filename of the image uploaded with the message, if any.
+
         """
         await self.conn.execute(
-            "INSERT INTO starboard_message (message_id, star_message_id) "
-            "VALUES ($1, $2)",
+            "INSERT INTO starboard_message "
+            "(message_id, star_message_id, rising, "
+            "content_fingerprint, embed_fingerprint, image_filename) "
+            "VALUES ($1, $2, $3, $4, $5, $6)",
             message_id,
             star_message_id,
+            rising,
+            content_fingerprint,
+            embed_fingerprint,
+            image_filename,
+        )
+
+    async def set_starboard_message_fingerprints(
+        self,
+        message_id: int,
+        *,
+        content: bytes | None = None,
+        embed: bytes | None = None,
+    ) -> None:
+        """Updates the fingerprints of what a starboard message was last
+        edited with.
+
+        Fingerprints that are None are left unchanged.
+
+        """
+        await self.conn.execute(
+            "UPDATE starboard_message SET "
+            "content_fingerprint = COALESCE($2, content_fingerprint), "
+            "embed_fingerprint = COALESCE($3, embed_fingerprint) "
+            "WHERE message_id = $1",
+            message_id,
+            content,
+            embed,
         )
 
     async def get_starboard_message(self, message_id: int) -> int | None:
@@ -241,6 +725,97 @@ class DatabaseClient:
             message_id,
         )
 
+    async def lock_starboard_messages(self, message_id: int) -> None:
+        """Locks the starboard messages of the given message ID until the
+        current transaction ends.
+
+        This is a transaction-level advisory lock, so it serializes
+        starboard updates for the same message across every process
+        sharing the database, and it cannot be held without a transaction.
+
+        """
+        await self.conn.execute("SELECT pg_advisory_xact_lock($1)", message_id)
+
+    async def get_starboard_messages(self, message_id: int) -> list[asyncpg.Record]:
+        """Gets every starboard message associated with the given message ID.
+
+        Each row contains the starboard message's ID, its channel ID,
+        whether it was sent for rising, the fingerprints of its
+        last rendered content and embed, and the filename of its
+        uploaded image.
+
+        """
+        return await self.conn.fetch(
+            "SELECT sm.message_id, m.channel_id, sm.rising, "
+            "sm.content_fingerprint, sm.embed_fingerprint, sm.image_filename "
+            "FROM starboard_message sm "
+            "JOIN message m ON m.id = sm.message_id "
+            "WHERE sm.star_message_id = $1",
+            message_id,
+        )
+
+    async def get_starboard_entries(
+        self,
+        guild_id: int,
+        *,
+        author_id: int | None = None,
+        channel_id: int | None = None,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+        min_stars: int | None = None,
+        before: int | None = None,
+        limit: int,
+    ) -> list[asyncpg.Record]:
+        """Gets a page of a guild's starboard entries, newest first.
+
+        Entries are ordered by the ID of the starred message, and only the
+        given filters are included in the query so that each page can be
+        read from an index starting at the cursor. Messages posted to
+        several starboards are only listed once, with their oldest post.
+
+        :param since: Excludes messages created before this time.
+        :param until: Excludes messages created at or after this time.
+        :param before:
+            The starred message ID of the last entry on the previous page,
+            or None to get the first page.
+        :returns:
+            A list of records containing the message_id of the starboard
+            message, and the star_message_id, channel_id, user_id,
+            and total stars of the starred message.
+
+        """
+        conditions = ["sm.guild_id = $1"]
+        args: list[object] = [guild_id, limit]
+
+        def add_condition(condition: str, value: object) -> None:
+            args.append(value)
+            conditions.append(condition.format(f"${len(args)}"))
+
+        if author_id is not None:
+            add_condition("m.user_id = {}", author_id)
+        if channel_id is not None:
+            add_condition("m.channel_id = {}", channel_id)
+        if since is not None:
+            add_condition("sm.star_message_id >= snowflake_at({})", since)
+        if until is not None:
+            add_condition("sm.star_message_id < snowflake_at({})", until)
+        if min_stars is not None:
+            add_condition("mst.total >= {}", min_stars)
+        if before is not None:
+            add_condition("sm.star_message_id < {}", before)
+
+        return await self.conn.fetch(
+            "SELECT DISTINCT ON (sm.star_message_id) "
+            "sm.message_id, sm.star_message_id, m.channel_id, m.user_id, "
+            "coalesce(mst.total, 0) AS total "
+            "FROM starboard_message sm "
+            "JOIN message m ON m.id = sm.star_message_id "
+            "LEFT JOIN message_star_total mst ON mst.message_id = sm.star_message_id "
+            f"WHERE {' AND '.join(conditions)} "
+            "ORDER BY sm.star_message_id DESC, sm.message_id LIMIT $2",
+            *args,
+        )
+
     # Starboard configuration methods
 
     async def get_starboard_channel(self, guild_id: int) -> int | None:
@@ -277,6 +852,7 @@ class DatabaseClient:
             channel_id,
             guild_id,
         )
+        self.invalidate_starboard_routes(guild_id)
 
     async def get_starboard_threshold(self, guild_id: int) -> int:
         """Gets a guild's starboard threshold.
@@ -312,6 +888,41 @@ class DatabaseClient:
             threshold,
             guild_id,
         )
+        self.invalidate_starboard_routes(guild_id)
+
+    async def get_starboard_rising_rate(self, guild_id: int) -> int:
+        """Gets a guild's starboard rising rate, or 0 if disabled.
+
+        Missing guilds are automatically inserted.
+
+        """
+        await self.add_guild(guild_id)
+        rising_rate = await self.conn.fetchval(
+            "SELECT rising_rate FROM starboard_guild_config WHERE guild_id = $1",
+            guild_id,
+        )
+        # starboard_guild_config_trigger should guarantee this
+        assert rising_rate is not None
+        return rising_rate
+
+    async def set_starboard_rising_rate(
+        self,
+        rising_rate: int,
+        *,
+        guild_id: int,
+    ) -> None:
+        """Sets a guild's starboard rising rate, or 0 to disable it.
+
+        Missing guilds are automatically inserted.
+
+        """
+        await self.add_guild(guild_id)
+        await self.conn.execute(
+            "UPDATE starboard_guild_config SET rising_rate = $1 WHERE guild_id = $2",
+            rising_rate,
+            guild_id,
+        )
+        self.invalidate_starboard_routes(guild_id)
 
     async def get_max_starboard_age(self, guild_id: int) -> datetime.timedelta:
         """Gets a guild's maximum starboard message age.
@@ -349,9 +960,743 @@ class DatabaseClient:
             int(max_message_age.total_seconds()),
             guild_id,
         )
+        self.invalidate_starboard_routes(guild_id)
+
+    async def get_star_emojis(self, guild_id: int) -> list[str] | None:
+        """Gets a guild's star emojis, or None if it uses the default emojis.
+
+        Missing guilds are automatically inserted.
+
+        """
+        await self.add_guild(guild_id)
+        return await self.conn.fetchval(
+            "SELECT star_emojis FROM starboard_guild_config WHERE guild_id = $1",
+            guild_id,
+        )
+
+    async def set_star_emojis(
+        self,
+        emojis: Collection[str] | None,
+        *,
+        guild_id: int,
+    ) -> None:
+        """Sets a guild's star emojis, or None to use the default emojis.
+
+        Custom emojis should be written as ``<:name:id>``.
+
+        Missing guilds are automatically inserted.
+
+        """
+        await self.add_guild(guild_id)
+        await self.conn.execute(
+            "UPDATE starboard_guild_config SET star_emojis = $1 WHERE guild_id = $2",
+            list(emojis) if emojis is not None else None,
+            guild_id,
+        )
+        self.invalidate_starboard_routes(guild_id)
+
+    async def get_max_starboard_age_of_all_guilds(self) -> datetime.timedelta:
+        """Gets the largest maximum starboard message age across all guilds."""
+        max_message_age = await self.conn.fetchval(
+            "SELECT coalesce(max(max_message_age), 0) FROM ("
+            "    SELECT max_message_age FROM starboard_guild_config"
+            "    UNION ALL SELECT max_message_age FROM starboard"
+            ") t"
+        )
+        return datetime.timedelta(seconds=max_message_age)
+
+    # Starboard methods
+
+    async def get_starboard_routes(self, guild_id: int) -> StarboardRoutes:
+        """Gets a guild's starboards compiled into routes.
+
+        Routes are cached in :attr:`starboard_routes` until the guild's
+        starboards are changed through this client.
+
+        Missing guilds are not inserted, and have no starboards.
+
+        """
+        routes = self.starboard_routes.get(guild_id)
+        if routes is not None:
+            return routes
+
+        config = await self.conn.fetchrow(
+            "SELECT starboard_channel_id, star_threshold, max_message_age, "
+            "rising_rate, star_emojis FROM starboard_guild_config "
+            "WHERE guild_id = $1",
+            guild_id,
+        )
+        if config is None:
+            # starboard_guild_config_trigger adds configs with their guilds,
+            # and additional starboards also require the guild
+            routes = StarboardRoutes(
+                (),
+                star_emojis=self.default_star_emojis,
+                max_message_age=datetime.timedelta(0),
+            )
+            self.starboard_routes[guild_id] = routes
+            return routes
+
+        starboards: list[Starboard] = []
+        if config["starboard_channel_id"] is not None:
+            starboards.append(
+                Starboard(
+                    channel_id=config["starboard_channel_id"],
+                    threshold=config["star_threshold"],
+                    max_message_age=datetime.timedelta(
+                        seconds=config["max_message_age"]
+                    ),
+                    rising_rate=config["rising_rate"],
+                    is_default=True,
+                )
+            )
+
+        rows = await self.conn.fetch(
+            "SELECT channel_id, star_threshold, max_message_age, "
+            "source_channel_ids, emojis FROM starboard WHERE guild_id = $1 "
+            "ORDER BY channel_id",
+            guild_id,
+        )
+        for row in rows:
+            source_channel_ids = row["source_channel_ids"]
+            emojis = row["emojis"]
+            starboards.append(
+                Starboard(
+                    channel_id=row["channel_id"],
+                    threshold=row["star_threshold"],
+                    max_message_age=datetime.timedelta(seconds=row["max_message_age"]),
+                    source_channel_ids=(
+                        frozenset(source_channel_ids)
+                        if source_channel_ids is not None
+                        else None
+                    ),
+                    emojis=frozenset(emojis) if emojis is not None else None,
+                )
+            )
+
+        star_emojis = self.default_star_emojis
+        if config["star_emojis"] is not None:
+            star_emojis = StarEmojiSet.from_strings(config["star_emojis"])
+
+        routes = StarboardRoutes(
+            starboards,
+            star_emojis=star_emojis,
+            max_message_age=datetime.timedelta(seconds=config["max_message_age"]),
+        )
+        self.starboard_routes[guild_id] = routes
+        return routes
+
+    async def add_starboard(
+        self,
+        channel_id: int,
+        *,
+        guild_id: int,
+        threshold: int,
+        max_message_age: datetime.timedelta,
+        source_channel_id: int | None = None,
+        emojis: Collection[str] | None = None,
+    ) -> None:
+        """Adds or updates one of a guild's additional starboards.
+
+        If the starboard already exists, its threshold, maximum age and
+        emojis are replaced, and `source_channel_id` is added to its
+        existing source channels. A starboard accepts every channel
+        until it is given a source channel.
+
+        `max_message_age` will be rounded down to the second.
+
+        Missing channels are automatically inserted.
+        Missing guilds are automatically inserted.
+
+        """
+        await self.add_channel(channel_id, guild_id=guild_id)
+        await self.conn.execute(
+            "INSERT INTO starboard "
+            "(channel_id, guild_id, star_threshold, max_message_age, "
+            "source_channel_ids, emojis) "
+            "VALUES ($1, $2, $3, $4, "
+            "    CASE WHEN $5::bigint IS NOT NULL THEN ARRAY[$5::bigint] END, $6) "
+            "ON CONFLICT (channel_id) DO UPDATE SET\n"
+            "    star_threshold = excluded.star_threshold,\n"
+            "    max_message_age = excluded.max_message_age,\n"
+            "    source_channel_ids = CASE\n"
+            "        WHEN $5::bigint IS NULL\n"
+            "            OR $5::bigint = any(starboard.source_channel_ids)\n"
+            "            THEN starboard.source_channel_ids\n"
+            "        ELSE array_append(starboard.source_channel_ids, $5::bigint)\n"
+            "    END,\n"
+            "    emojis = excluded.emojis",
+            channel_id,
+            guild_id,
+            threshold,
+            int(max_message_age.total_seconds()),
+            source_channel_id,
+            list(emojis) if emojis is not None else None,
+        )
+        self.invalidate_starboard_routes(guild_id)
+
+    async def remove_starboard(self, channel_id: int, *, guild_id: int) -> bool:
+        """Removes one of a guild's additional starboards.
+
+        :returns: True if the starboard was removed.
+
+        """
+        result = await self.conn.execute(
+            "DELETE FROM starboard WHERE channel_id = $1 AND guild_id = $2",
+            channel_id,
+            guild_id,
+        )
+        self.invalidate_starboard_routes(guild_id)
+        # DELETE <rows>
+        return result != "DELETE 0"
+
+    # Starboard job methods
+
+    async def add_starboard_job(
+        self,
+        message_id: int,
+        operation: StarboardJobOperation,
+        data: dict[str, Any],
+        *,
+        guild_id: int,
+    ) -> bool:
+        """Adds a starboard job for the given message, or merges it into
+        the message's pending job of the same operation.
+
+        A deletion overwrites every other pending job of the message,
+        and any job other than a deletion is discarded while a deletion
+        is pending. Jobs that were already claimed are never merged with.
+
+        Workers listening to the ``starboard_job`` channel are notified
+        once the current transaction commits.
+
+        :returns: False if the job was discarded.
+
+        """
+        return await self.conn.fetchval(
+            "SELECT add_starboard_job($1, $2, $3, $4::jsonb)",
+            message_id,
+            guild_id,
+            operation,
+            json.dumps(data, ensure_ascii=False),
+        )
+
+    async def claim_starboard_jobs(
+        self,
+        *,
+        limit: int,
+        lease: float,
+    ) -> list[asyncpg.Record]:
+        """Claims up to `limit` starboard jobs that are ready to run.
+
+        Sends are claimed before deletions, and deletions before edits.
+        Jobs locked by other workers are skipped rather than waited on,
+        and each claimed job is hidden from other workers for `lease`
+        seconds, after which it can be claimed again if it was neither
+        finished nor retried.
+
+        Each row contains the job's ID, message ID, guild ID, operation,
+        data, and the number of times it has been claimed.
+
+        """
+        rows = await self.conn.fetch(
+            "UPDATE starboard_job SET\n"
+            "    claimed_at = now(),\n"
+            "    run_at = now() + make_interval(secs => $2),\n"
+            "    attempts = attempts + 1\n"
+            "WHERE id IN (\n"
+            "    SELECT id FROM starboard_job WHERE run_at <= now()\n"
+            "    ORDER BY array_position(ARRAY['send', 'delete', 'edit'], operation), id\n"
+            "    LIMIT $1\n"
+            "    FOR UPDATE SKIP LOCKED\n"
+            ") RETURNING id, message_id, guild_id, operation, data, attempts",
+            limit,
+            lease,
+        )
+        # Rows are returned in no particular order
+        return sorted(rows, key=lambda row: (_JOB_ORDER[row["operation"]], row["id"]))
+
+    async def finish_starboard_job(self, job_id: int) -> None:
+        """Removes a claimed starboard job after it has run."""
+        await self.conn.execute("DELETE FROM starboard_job WHERE id = $1", job_id)
+
+    async def retry_starboard_job(self, job_id: int, *, delay: float) -> None:
+        """Allows a claimed starboard job to be claimed again after
+        `delay` seconds.
+        """
+        await self.conn.execute(
+            "UPDATE starboard_job SET run_at = now() + make_interval(secs => $2) "
+            "WHERE id = $1",
+            job_id,
+            delay,
+        )
+
+    async def get_starboard_job_count(self) -> int:
+        """Counts the starboard jobs that have not finished."""
+        return await self.conn.fetchval("SELECT count(*) FROM starboard_job")
+
+    # Partition methods
+
+    async def create_message_partitions(self, until: datetime.datetime) -> int:
+        """Creates any missing monthly message partitions up to the given time.
+
+        :returns: The number of partitions created.
+
+        """
+        return await self.conn.fetchval(
+            "SELECT create_message_partitions(now(), $1)",
+            until,
+        )
+
+    async def drop_message_partitions(self, before: datetime.datetime) -> int:
+        """Drops monthly message partitions that ended before the given time.
+
+        Starboarded messages, along with their stars and starboard messages,
+        are moved into the default partitions rather than dropped.
+
+        :attr:`message_ids` is reloaded afterwards, but unlike other removal
+        methods the cache is not updated, so dropped messages may still be
+        considered to exist. Events for messages this old should be ignored
+        before reaching the database.
+
+        :returns: The number of months dropped.
+
+        """
+        n_dropped = await self.conn.fetchval(
+            "SELECT drop_message_partitions($1)",
+            before,
+        )
+        if n_dropped > 0:
+            await self.load_message_ids()
+        return n_dropped
+
+    # Leaderboard methods
+
+    async def refresh_leaderboards(self) -> None:
+        """Refreshes every leaderboard without blocking concurrent reads."""
+        await self.conn.execute("SELECT refresh_leaderboards()")
+
+    async def get_top_messages(
+        self,
+        guild_id: int,
+        period: LeaderboardPeriod,
+        *,
+        after: tuple[int, int] | None = None,
+        limit: int,
+    ) -> list[asyncpg.Record]:
+        """Gets a page of a guild's most starred messages.
+
+        Messages are ordered by their star total and then by newest first.
+        Results reflect the last time :meth:`refresh_leaderboards()` was run.
+
+        :param period: The period to rank messages in.
+        :param after:
+            The (total, message_id) of the last message on the previous page,
+            or None to get the first page.
+        :returns:
+            A list of records containing the message_id, channel_id,
+            user_id, and total of each message.
+
+        """
+        return await self.conn.fetch(
+            "SELECT message_id, channel_id, user_id, total FROM leaderboard_message "
+            "WHERE guild_id = $1 AND period = $2 "
+            + ("AND (total, message_id) < ($4, $5) " if after is not None else "")
+            + "ORDER BY total DESC, message_id DESC LIMIT $3",
+            guild_id,
+            period,
+            limit,
+            *(after or ()),
+        )
+
+    async def get_top_authors(
+        self,
+        guild_id: int,
+        period: LeaderboardPeriod,
+        *,
+        after: tuple[int, int] | None = None,
+        limit: int,
+    ) -> list[asyncpg.Record]:
+        """Gets a page of a guild's authors with the most stars received.
+
+        Pagination works the same as :meth:`get_top_messages()`,
+        except that `after` is the last author's (stars, user_id).
+
+        :returns:
+            A list of records containing the user_id, stars, and number
+            of starred messages of each author.
+
+        """
+        return await self.conn.fetch(
+            "SELECT user_id, stars, messages FROM leaderboard_author "
+            "WHERE guild_id = $1 AND period = $2 "
+            + ("AND (stars, user_id) < ($4, $5) " if after is not None else "")
+            + "ORDER BY stars DESC, user_id DESC LIMIT $3",
+            guild_id,
+            period,
+            limit,
+            *(after or ()),
+        )
+
+    async def get_star_total_histogram(
+        self,
+        guild_id: int,
+        period: LeaderboardPeriod,
+    ) -> tuple[list[int], list[int]]:
+        """Counts a guild's starred messages by their star total.
+
+        Totals are read from the same materialized view as
+        :meth:`get_top_messages()`, and reflect the last time
+        :meth:`refresh_leaderboards()` was run.
+
+        :returns:
+            The distinct star totals in ascending order and the number
+            of messages with each total.
+
+        """
+        row = await self.conn.fetchrow(
+            "SELECT "
+            "coalesce(array_agg(total ORDER BY total), '{}') AS totals, "
+            "coalesce(array_agg(n ORDER BY total), '{}') AS counts "
+            "FROM ("
+            "    SELECT total, count(*) AS n FROM leaderboard_message"
+            "    WHERE guild_id = $1 AND period = $2"
+            "    GROUP BY total"
+            ") histogram",
+            guild_id,
+            period,
+        )
+        assert row is not None
+        return row["totals"], row["counts"]
+
+    # Star reconciliation methods
+
+    async def get_star_reconciliation(self) -> asyncpg.Record | None:
+        """Gets the progress of the current or last star reconciliation."""
+        return await self.conn.fetchrow("SELECT * FROM star_reconciliation")
+
+    async def start_star_reconciliation(self) -> None:
+        """Starts a new star reconciliation, discarding any previous progress."""
+        await self.conn.execute(
+            "INSERT INTO star_reconciliation DEFAULT VALUES "
+            "ON CONFLICT (id) DO UPDATE SET\n"
+            "    last_message_id = DEFAULT,\n"
+            "    started_at = DEFAULT,\n"
+            "    finished_at = DEFAULT,\n"
+            "    messages_checked = DEFAULT,\n"
+            "    stars_added = DEFAULT,\n"
+            "    stars_removed = DEFAULT"
+        )
+
+    async def update_star_reconciliation(
+        self,
+        last_message_id: int,
+        *,
+        messages_checked: int,
+        stars_added: int,
+        stars_removed: int,
+    ) -> None:
+        """Checkpoints the progress of the current star reconciliation."""
+        await self.conn.execute(
+            "UPDATE star_reconciliation SET\n"
+            "    last_message_id = $1,\n"
+            "    messages_checked = messages_checked + $2,\n"
+            "    stars_added = stars_added + $3,\n"
+            "    stars_removed = stars_removed + $4",
+            last_message_id,
+            messages_checked,
+            stars_added,
+            stars_removed,
+        )
+
+    async def finish_star_reconciliation(self) -> None:
+        """Marks the current star reconciliation as finished."""
+        await self.conn.execute("UPDATE star_reconciliation SET finished_at = now()")
+
+    async def get_reconcilable_messages(
+        self,
+        guild_ids: Collection[int],
+        *,
+        after: int,
+        limit: int,
+    ) -> list[asyncpg.Record]:
+        """Gets starred messages that are still eligible for the starboard.
+
+        Messages are returned in ID order, starting after the given ID,
+        and only include those within the largest maximum message age
+        of their guild's starboards.
+
+        :returns:
+            A list of records containing the message_id, channel_id,
+            and guild_id of each message.
+
+        """
+        return await self.conn.fetch(
+            "SELECT mst.message_id, m.channel_id, c.guild_id "
+            "FROM message_star_total mst "
+            "JOIN message m ON m.id = mst.message_id "
+            "JOIN channel c ON c.id = m.channel_id "
+            "JOIN starboard_guild_config sgc ON sgc.guild_id = c.guild_id "
+            "WHERE c.guild_id = any($1::bigint[]) "
+            # Lets partitions older than every guild's max age be pruned
+            "AND mst.message_id > greatest($2, ("
+            "    SELECT snowflake_at(now() - make_interval(secs => max(max_message_age)))"
+            "    FROM ("
+            "        SELECT max_message_age FROM starboard_guild_config"
+            "        UNION ALL SELECT max_message_age FROM starboard"
+            "    ) t"
+            ")) "
+            "AND mst.message_id >= snowflake_at(now() - make_interval(secs => greatest("
+            "    sgc.max_message_age,"
+            "    (SELECT max(s.max_message_age) FROM starboard s"
+            "     WHERE s.guild_id = c.guild_id)"
+            "))) "
+            "ORDER BY mst.message_id LIMIT $3",
+            guild_ids,
+            after,
+            limit,
+        )
+
+    # Channel backfill methods
+
+    async def get_channel_backfill(self, channel_id: int) -> asyncpg.Record | None:
+        """Gets the progress of a channel's current or last backfill."""
+        return await self.conn.fetchrow(
+            "SELECT * FROM channel_backfill WHERE channel_id = $1",
+            channel_id,
+        )
+
+    async def start_channel_backfill(
+        self,
+        channel_id: int,
+        *,
+        guild_id: int,
+    ) -> asyncpg.Record:
+        """Starts or resumes a channel's backfill.
+
+        If the last backfill was finished, its progress is discarded
+        so the channel is scanned again from the newest message.
+
+        Missing channels are automatically inserted.
+        Missing guilds are automatically inserted.
+
+        :returns: The progress of the backfill.
+
+        """
+        await self.add_channel(channel_id, guild_id=guild_id)
+        await self.conn.execute(
+            "INSERT INTO channel_backfill (channel_id) VALUES ($1) "
+            "ON CONFLICT (channel_id) DO UPDATE SET\n"
+            "    before_message_id = DEFAULT,\n"
+            "    started_at = DEFAULT,\n"
+            "    finished_at = DEFAULT,\n"
+            "    messages_scanned = DEFAULT,\n"
+            "    messages_loaded = DEFAULT\n"
+            "WHERE channel_backfill.finished_at IS NOT NULL",
+            channel_id,
+        )
+        row = await self.get_channel_backfill(channel_id)
+        assert row is not None
+        return row
+
+    async def load_channel_backfill(
+        self,
+        channel_id: int,
+        *,
+        before_message_id: int,
+        messages_scanned: int,
+        messages: Collection[tuple[int, int]],
+        stars: Collection[tuple[int, int, str]],
+    ) -> None:
+        """Bulk loads a batch of messages and stars found by a channel's backfill.
+
+        Rows are copied into temporary tables before being inserted, so
+        existing messages and stars are left untouched. The backfill's
+        checkpoint is updated in the same transaction.
+
+        :param before_message_id: The oldest message scanned in this batch.
+        :param messages_scanned: The number of messages scanned in this batch.
+        :param messages: The (message_id, user_id) messages to insert.
+        :param stars: The (message_id, user_id, emoji) stars to insert.
+
+        """
+        if messages:
+            await self.conn.execute(
+                "CREATE TEMPORARY TABLE backfill_message "
+                "(id bigint, user_id bigint) ON COMMIT DROP"
+            )
+            await self.conn.execute(
+                "CREATE TEMPORARY TABLE backfill_message_star "
+                "(message_id bigint, user_id bigint, emoji text) ON COMMIT DROP"
+            )
+            await self.conn.copy_records_to_table(
+                "backfill_message",
+                records=messages,
+            )
+            await self.conn.copy_records_to_table(
+                "backfill_message_star",
+                records=stars,
+            )
+
+            await self.conn.execute(
+                'INSERT INTO "user" (id) '
+                "SELECT user_id FROM backfill_message "
+                "UNION SELECT user_id FROM backfill_message_star "
+                "ON CONFLICT DO NOTHING"
+            )
+            await self.conn.execute(
+                "INSERT INTO message (id, channel_id, user_id) "
+                "SELECT id, $1, user_id FROM backfill_message "
+                "ON CONFLICT DO NOTHING",
+                channel_id,
+            )
+            await self.conn.execute(
+                "INSERT INTO message_star (message_id, user_id, emoji) "
+                "SELECT message_id, user_id, emoji FROM backfill_message_star "
+                "ON CONFLICT DO NOTHING"
+            )
+            await self.conn.execute(
+                "DROP TABLE backfill_message, backfill_message_star"
+            )
+
+        await self.conn.execute(
+            "UPDATE channel_backfill SET\n"
+            "    before_message_id = $2,\n"
+            "    messages_scanned = messages_scanned + $3,\n"
+            "    messages_loaded = messages_loaded + $4\n"
+            "WHERE channel_id = $1",
+            channel_id,
+            before_message_id,
+            messages_scanned,
+            len(messages),
+        )
+        self.message_ids.update(message_id for message_id, _ in messages)
+
+    async def finish_channel_backfill(self, channel_id: int) -> None:
+        """Marks a channel's backfill as finished."""
+        await self.conn.execute(
+            "UPDATE channel_backfill SET finished_at = now() WHERE channel_id = $1",
+            channel_id,
+        )
+
+    # Garbage collection methods
+
+    async def collect_orphaned_messages(
+        self,
+        *,
+        after: int,
+        limit: int,
+    ) -> tuple[int | None, int]:
+        """Deletes messages that have no stars and no starboard message.
+
+        Up to `limit` messages are scanned in ID order, starting after
+        the given message ID. Messages locked by other transactions,
+        such as ones currently being starred, are skipped.
+
+        :returns:
+            The last message ID that was scanned, or None if there are
+            no more messages, and the number of messages deleted.
+
+        """
+        ids = await self._scan_ids("message", after=after, limit=limit)
+        if not ids:
+            return None, 0
+
+        rows = await self.conn.fetch(
+            "DELETE FROM message WHERE id IN ("
+            "    SELECT m.id FROM message m WHERE m.id = any($1::bigint[])"
+            "    AND NOT EXISTS (SELECT 1 FROM message_star ms WHERE ms.message_id = m.id)"
+            "    AND NOT EXISTS (SELECT 1 FROM starboard_message sm WHERE sm.message_id = m.id)"
+            "    AND NOT EXISTS (SELECT 1 FROM starboard_message sm WHERE sm.star_message_id = m.id)"
+            "    FOR UPDATE SKIP LOCKED"
+            ") RETURNING id, channel_id, user_id",
+            ids,
+        )
+        for row in rows:
+            self.message_ids.discard(row["id"])
+            key = f"{row['id']}-{row['channel_id']}-{row['user_id']}"
+            await self.cache.discard(self._cache_key("message", key))
+
+        return ids[-1], len(rows)
+
+    async def collect_orphaned_channels(
+        self,
+        *,
+        after: int,
+        limit: int,
+    ) -> tuple[int | None, int]:
+        """Deletes channels that have no messages and are not the default
+        or an additional starboard of their guild.
+
+        Channels with backfill progress are also kept.
+
+        Scanning works the same as :meth:`collect_orphaned_messages()`.
+
+        """
+        ids = await self._scan_ids("channel", after=after, limit=limit)
+        if not ids:
+            return None, 0
+
+        rows = await self.conn.fetch(
+            "DELETE FROM channel WHERE id IN ("
+            "    SELECT c.id FROM channel c WHERE c.id = any($1::bigint[])"
+            "    AND NOT EXISTS (SELECT 1 FROM message m WHERE m.channel_id = c.id)"
+            "    AND NOT EXISTS ("
+            "        SELECT 1 FROM starboard_guild_config"
+            "        WHERE starboard_channel_id = c.id"
+            "    )"
+            "    AND NOT EXISTS (SELECT 1 FROM starboard s WHERE s.channel_id = c.id)"
+            "    AND NOT EXISTS (SELECT 1 FROM channel_backfill WHERE channel_id = c.id)"
+            "    FOR UPDATE SKIP LOCKED"
+            ") RETURNING id, guild_id",
+            ids,
+        )
+        for row in rows:
+            for guild_id in (row["guild_id"], None):
+                key = f"{row['id']}-{guild_id}"
+                await self.cache.discard(self._cache_key("channel", key))
+
+        return ids[-1], len(rows)
+
+    async def collect_orphaned_users(
+        self,
+        *,
+        after: int,
+        limit: int,
+    ) -> tuple[int | None, int]:
+        """Deletes users that have no messages and no stars.
+
+        Scanning works the same as :meth:`collect_orphaned_messages()`.
+
+        """
+        ids = await self._scan_ids('"user"', after=after, limit=limit)
+        if not ids:
+            return None, 0
+
+        rows = await self.conn.fetch(
+            'DELETE FROM "user" WHERE id IN ('
+            '    SELECT u.id FROM "user" u WHERE u.id = any($1::bigint[])'
+            "    AND NOT EXISTS (SELECT 1 FROM message m WHERE m.user_id = u.id)"
+            "    AND NOT EXISTS (SELECT 1 FROM message_star ms WHERE ms.user_id = u.id)"
+            "    FOR UPDATE SKIP LOCKED"
+            ") RETURNING id",
+            ids,
+        )
+        for row in rows:
+            await self.cache.discard(self._cache_key("user", row["id"]))
+
+        return ids[-1], len(rows)
 
     # Internal methods
 
+    async def _scan_ids(self, table: str, *, after: int, limit: int) -> list[int]:
+        rows = await self.conn.fetch(
+            f"SELECT id FROM {table} WHERE id > $1 ORDER BY id LIMIT $2",
+            after,
+            limit,
+        )
+        return [row["id"] for row in rows]
+
     def _cache_key(self, bucket: str, id_: str | int) -> str:
         return f"{bucket}-{id_}"
 
@@ -361,4 +1706,13 @@ class DatabaseClient:
             return False
 
         await self.cache.add(key)
+        added = _added_cache_keys.get()
+        if added is not None:
+            added.append(key)
         return True
+
+
+def _retryable_errors() -> tuple[type[Exception], ...]:
+    import asyncpg
+
+    return (asyncpg.DeadlockDetectedError, asyncpg.SerializationError)
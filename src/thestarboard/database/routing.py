@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import datetime
+import re
+from dataclasses import dataclass
+from typing import Collection, Iterable, Mapping
+
+_CUSTOM_EMOJI_PATTERN = re.compile(r"<a?:\w+:(\d+)>")
+
+
+class StarEmojiSet:
+    """A set of star emojis compiled for matching reactions.
+
+    Unicode emojis are matched by name and custom emojis by ID,
+    so checking a reaction is a single set lookup that never
+    needs to format the emoji as a string. The original strings are
+    kept in :attr:`emojis` for display.
+
+    """
+
+    __slots__ = ("names", "ids", "emojis")
+
+    def __init__(
+        self,
+        names: Iterable[str] = (),
+        ids: Iterable[int] = (),
+        *,
+        emojis: Iterable[str] = (),
+    ) -> None:
+        self.names = frozenset(names)
+        self.ids = frozenset(ids)
+        self.emojis = tuple(emojis)
+
+    @classmethod
+    def from_strings(cls, emojis: Iterable[str]) -> StarEmojiSet:
+        """Compiles unicode emojis and custom emojis written as ``<:name:id>``."""
+        emojis = tuple(emojis)
+        names: list[str] = []
+        ids: list[int] = []
+        for emoji in emojis:
+            m = _CUSTOM_EMOJI_PATTERN.fullmatch(emoji)
+            if m is not None:
+                ids.append(int(m[1]))
+            else:
+                names.append(emoji)
+        return cls(names, ids, emojis=emojis)
+
+    def __len__(self) -> int:
+        return len(self.names) + len(self.ids)
+
+    def first(self, default: str) -> str:
+        """Returns the first configured emoji for display, or the default."""
+        return self.emojis[0] if self.emojis else default
+
+    def matches(self, emoji_id: int | None, name: str | None) -> bool:
+        """Checks if an emoji, given as its custom ID or unicode name, is a star."""
+        if emoji_id is not None:
+            return emoji_id in self.ids
+        return name in self.names
+
+
+@dataclass(frozen=True)
+class Starboard:
+    """A starboard channel and the rules for sending messages to it."""
+
+    channel_id: int
+    threshold: int
+    max_message_age: datetime.timedelta
+    source_channel_ids: frozenset[int] | None = None
+    """The channels whose messages can be sent, or None for all channels."""
+    emojis: frozenset[str] | None = None
+    """The emojis counted towards the threshold, or None for all emojis."""
+    rising_rate: int = 0
+    """The rising rate of the starboard, or 0 if disabled."""
+    is_default: bool = False
+    """Whether this is the starboard stored in the guild's configuration."""
+
+    def accepts_channel(self, channel_id: int | None) -> bool:
+        """Checks if a channel's messages can be sent to this starboard.
+
+        A channel ID of None stands for any channel not mentioned by
+        a source channel filter.
+
+        """
+        if self.source_channel_ids is None:
+            return True
+        return channel_id in self.source_channel_ids
+
+    def accepts_emoji(self, emoji: str | None) -> bool:
+        """Checks if an emoji counts towards this starboard's threshold.
+
+        An emoji of None stands for any emoji not mentioned by an emoji filter.
+
+        """
+        if self.emojis is None:
+            return True
+        return emoji in self.emojis
+
+    def count_stars(self, star_counts: Mapping[str, int]) -> dict[str, int]:
+        """Filters a message's star counts to the emojis accepted by this starboard."""
+        if self.emojis is None:
+            return dict(star_counts)
+        return {e: n for e, n in star_counts.items() if e in self.emojis}
+
+
+class StarboardRoutes:
+    """A guild's starboards compiled into a lookup table.
+
+    Every combination of the source channels and emojis mentioned by
+    the guild's filters is resolved ahead of time, including a None entry
+    for channels and emojis that no filter mentions. Routing a reaction
+    then takes one membership check per key and a single dict lookup,
+    no matter how many starboards the guild has.
+
+    """
+
+    __slots__ = (
+        "starboards",
+        "star_emojis",
+        "max_message_age",
+        "_channels",
+        "_emojis",
+        "_by_channel",
+        "_by_channel_emoji",
+    )
+
+    def __init__(
+        self,
+        starboards: Collection[Starboard],
+        *,
+        star_emojis: StarEmojiSet,
+        max_message_age: datetime.timedelta,
+    ) -> None:
+        self.starboards = tuple(starboards)
+        self.star_emojis = star_emojis
+        """The emojis that count as stars in the guild."""
+        self.max_message_age = max(
+            (max_message_age, *(s.max_message_age for s in self.starboards))
+        )
+        """The largest maximum message age of the guild's starboards."""
+
+        channels: set[int] = set()
+        emojis: set[str] = set()
+        for starboard in self.starboards:
+            channels.update(starboard.source_channel_ids or ())
+            emojis.update(starboard.emojis or ())
+        self._channels = frozenset(channels)
+        self._emojis = frozenset(emojis)
+
+        self._by_channel: dict[int | None, tuple[Starboard, ...]] = {}
+        self._by_channel_emoji: dict[
+            tuple[int | None, str | None],
+            tuple[Starboard, ...],
+        ] = {}
+        for channel_id in (*channels, None):
+            routed = tuple(s for s in self.starboards if s.accepts_channel(channel_id))
+            self._by_channel[channel_id] = routed
+            for emoji in (*emojis, None):
+                self._by_channel_emoji[channel_id, emoji] = tuple(
+                    s for s in routed if s.accepts_emoji(emoji)
+                )
+
+    def __len__(self) -> int:
+        return len(self.starboards)
+
+    def route(self, channel_id: int, emoji: str | None = None) -> tuple[Starboard, ...]:
+        """Gets the starboards that a star in the given channel affects.
+
+        :param emoji: The star's emoji, or None to return starboards for any emoji.
+
+        """
+        channel_key = channel_id if channel_id in self._channels else None
+        if emoji is None:
+            return self._by_channel[channel_key]
+
+        emoji_key = emoji if emoji in self._emojis else None
+        return self._by_channel_emoji[channel_key, emoji_key]
+
+    def get(self, channel_id: int) -> Starboard | None:
+        """Gets a starboard by its channel ID."""
+        for starboard in self.starboards:
+            if starboard.channel_id == channel_id:
+                return starboard
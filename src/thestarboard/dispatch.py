@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Coroutine, Iterable
+
+import discord
+
+from .admission import LoadShed, Priority
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+StageFunc = Callable[[Any], Awaitable[None]]
+CheckFunc = Callable[[Any], Awaitable[bool]]
+
+
+@dataclass(frozen=True)
+class RawMessageDeletion:
+    """One or more messages deleted from a channel.
+
+    Single and bulk deletions are both dispatched as this event.
+
+    """
+
+    guild_id: int | None
+    channel_id: int
+    message_ids: frozenset[int]
+    """The deleted messages that are stored in the database."""
+
+
+@dataclass(frozen=True, order=True)
+class _Stage:
+    order: int
+    func: StageFunc = field(compare=False)
+    check: CheckFunc | None = field(compare=False)
+    transaction: bool = field(compare=False)
+
+
+class RawEventDispatcher:
+    """Dispatches raw message and reaction events to each cog's stages.
+
+    Every event is resolved once and run through the stages registered
+    for it in order. Stages whose checks pass share one connection from
+    :attr:`Bot.query`, acquired once per event, so their changes are
+    committed together and cannot interleave with another cog's handling
+    of the same event. If any stage raises, the whole event is rolled back,
+    and events that fail from a deadlock are run through their stages again
+    unless a stage already made a request that cannot be repeated
+    (see :meth:`DatabaseClient.prevent_retry()`).
+
+    Events using the database are admitted by :attr:`Bot.admission`
+    according to :attr:`PRIORITIES` and their guild, and edit events
+    are dropped while it is shedding load.
+
+    Events are named after their listeners without the ``on_raw_`` prefix,
+    except ``message_delete`` which receives a :class:`RawMessageDeletion`
+    for both single and bulk deletions, and is only dispatched if any
+    deleted message is stored in the database.
+
+    """
+
+    EVENTS = (
+        "message_delete",
+        "message_edit",
+        "reaction_add",
+        "reaction_remove",
+        "reaction_clear",
+        "reaction_clear_emoji",
+    )
+
+    PRIORITIES = {
+        "message_delete": Priority.DELETE,
+        "message_edit": Priority.EDIT,
+        "reaction_add": Priority.SEND,
+        "reaction_remove": Priority.SEND,
+        "reaction_clear": Priority.SEND,
+        "reaction_clear_emoji": Priority.SEND,
+    }
+    """The priority each event is admitted with by :attr:`Bot.admission`."""
+
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+        self._stages: dict[str, list[_Stage]] = {event: [] for event in self.EVENTS}
+
+        bot.add_listener(self._on_message_delete, "on_raw_message_delete")
+        bot.add_listener(self._on_bulk_message_delete, "on_raw_bulk_message_delete")
+        for event in self.EVENTS[1:]:
+            bot.add_listener(self._create_listener(event), f"on_raw_{event}")
+
+    def add_stage(
+        self,
+        event: str,
+        func: StageFunc,
+        *,
+        check: CheckFunc | None = None,
+        order: int = 0,
+        transaction: bool = True,
+    ) -> None:
+        """Registers a stage to be run for an event.
+
+        :param event: The event name, e.g. ``reaction_add``.
+        :param func: The stage, which receives the event's payload.
+        :param check:
+            A coroutine function called before any connection is acquired.
+            The stage is skipped if it returns False.
+        :param order: Stages with lower orders run first.
+        :param transaction:
+            Whether the stage uses the database. If no stage of an event
+            uses it, no connection is acquired.
+
+        """
+        stage = _Stage(order, func, check, transaction)
+        bisect.insort_right(self._stages[event], stage)
+
+    def remove_stage(self, event: str, func: StageFunc) -> None:
+        """Removes a stage added by :meth:`add_stage()`."""
+        stages = self._stages[event]
+        stages[:] = [stage for stage in stages if stage.func != func]
+
+    async def dispatch(self, event: str, payload: Any) -> None:
+        """Runs an event's payload through its stages."""
+        stages: list[_Stage] = []
+        for stage in self._stages[event]:
+            if stage.check is None or await stage.check(payload):
+                stages.append(stage)
+
+        if not stages:
+            return
+        if not any(stage.transaction for stage in stages):
+            return await self._run_stages(stages, payload)
+
+        try:
+            async with self.bot.admission.admit(
+                self.PRIORITIES[event],
+                self._get_admission_key(payload),
+            ):
+                async for attempt in self.bot.query.retrying():
+                    async with attempt:
+                        await self._run_stages(stages, payload)
+        except LoadShed:
+            pass
+
+    def _get_admission_key(self, payload: Any) -> int | None:
+        # Every payload has a guild ID, so guilds take turns being admitted
+        return payload.guild_id
+
+    async def _run_stages(self, stages: Iterable[_Stage], payload: Any) -> None:
+        for stage in stages:
+            await stage.func(payload)
+
+    def _create_listener(
+        self,
+        event: str,
+    ) -> Callable[[Any], Coroutine[Any, Any, None]]:
+        async def listener(payload: Any) -> None:
+            await self.dispatch(event, payload)
+
+        listener.__name__ = f"on_raw_{event}"
+        return listener
+
+    async def _on_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        await self._dispatch_deletion(
+            payload.guild_id,
+            payload.channel_id,
+            (payload.message_id,),
+        )
+
+    async def _on_bulk_message_delete(
+        self,
+        payload: discord.RawBulkMessageDeleteEvent,
+    ):
+        await self._dispatch_deletion(
+            payload.guild_id,
+            payload.channel_id,
+            payload.message_ids,
+        )
+
+    async def _dispatch_deletion(
+        self,
+        guild_id: int | None,
+        channel_id: int,
+        message_ids: Iterable[int],
+    ) -> None:
+        # Messages that were never stored cannot affect any stage
+        stored = self.bot.query.message_ids.intersection(message_ids)
+        if not stored:
+            return
+
+        deletion = RawMessageDeletion(guild_id, channel_id, frozenset(stored))
+        await self.dispatch("message_delete", deletion)
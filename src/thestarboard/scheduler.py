@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import enum
+import re
+import time
+from collections import Counter, deque
+from typing import TYPE_CHECKING, AsyncIterator
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class MessageRoute(enum.IntEnum):
+    """The message routes scheduled by :class:`ChannelScheduler`,
+    from highest to lowest priority.
+    """
+
+    SEND = 0
+    """``POST /channels/{channel_id}/messages``"""
+    DELETE = 1
+    """``DELETE /channels/{channel_id}/messages/{message_id}``"""
+    EDIT = 2
+    """``PATCH /channels/{channel_id}/messages/{message_id}``"""
+
+    @classmethod
+    def from_request(cls, method: str, path: str) -> tuple[MessageRoute, int] | None:
+        """Matches a request to a route and returns it with its channel ID."""
+        m = _MESSAGE_PATH.search(path)
+        if m is None:
+            return None
+
+        channel_id, message_id = m.groups()
+        if message_id is None:
+            route = cls.SEND if method == "POST" else None
+        else:
+            route = _METHOD_ROUTES.get(method)
+        if route is None:
+            return None
+        return route, int(channel_id)
+
+
+_MESSAGE_PATH = re.compile(r"/channels/(\d+)/messages(?:/(\d+))?$")
+_METHOD_ROUTES = {"DELETE": MessageRoute.DELETE, "PATCH": MessageRoute.EDIT}
+
+
+class _Bucket:
+    __slots__ = ("limit", "remaining", "reset_at")
+
+    def __init__(self, limit: int, remaining: int, reset_at: float) -> None:
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+
+    def refill(self, now: float) -> None:
+        if now >= self.reset_at:
+            self.remaining = self.limit
+
+
+class _ChannelState:
+    __slots__ = ("queues", "in_flight", "buckets", "wake_handle")
+
+    def __init__(self) -> None:
+        self.queues: dict[MessageRoute, deque[asyncio.Future[None]]] = {
+            route: deque() for route in MessageRoute
+        }
+        self.in_flight: Counter[MessageRoute] = Counter()
+        self.buckets: dict[MessageRoute, _Bucket] = {}
+        self.wake_handle: asyncio.TimerHandle | None = None
+
+    def is_idle(self, now: float) -> bool:
+        return (
+            not any(self.queues.values())
+            and not self.in_flight.total()
+            and all(now >= bucket.reset_at for bucket in self.buckets.values())
+        )
+
+
+class ChannelScheduler:
+    """Paces message requests in each channel ahead of Discord's rate limits.
+
+    discord.py only waits once a bucket is exhausted, and requests already
+    in flight can still run into a 429. Instead, the scheduler counts down
+    each channel's send, edit, and delete buckets as requests start, learns
+    their limits from the ``X-RateLimit-*`` headers of every response, and
+    holds requests back until their bucket resets.
+
+    At most `channel_concurrency` requests run in each channel at once.
+    When a slot is freed, it goes to the highest priority route whose
+    bucket has requests left, so new starboard posts go ahead of edits
+    to existing ones. Each channel is scheduled separately, so a rate
+    limited channel never delays requests to other channels.
+
+    Responses are only seen if :meth:`create_trace_config()` is passed
+    to the client making the requests.
+
+    """
+
+    def __init__(self, *, channel_concurrency: int) -> None:
+        self.channel_concurrency = channel_concurrency
+
+        self.rate_limited: Counter[MessageRoute] = Counter()
+        """The number of 429 responses received for each route since startup."""
+
+        self._channels: dict[int, _ChannelState] = {}
+        self._next_prune = 0.0
+
+    @property
+    def waiting(self) -> int:
+        """The number of requests waiting to be sent."""
+        return sum(
+            len(queue)
+            for state in self._channels.values()
+            for queue in state.queues.values()
+        )
+
+    @contextlib.asynccontextmanager
+    async def schedule(
+        self,
+        channel_id: int,
+        route: MessageRoute,
+    ) -> AsyncIterator[None]:
+        """Waits until a request to the given channel and route can be sent.
+
+        The request should be made exactly once inside this context.
+
+        """
+        now = time.monotonic()
+        self._prune_channels(now)
+        state = self._channels.get(channel_id)
+        if state is None:
+            state = self._channels[channel_id] = _ChannelState()
+
+        if not any(state.queues.values()) and self._can_start(state, route, now):
+            self._start(state, route)
+        else:
+            await self._wait(channel_id, state, route)
+
+        try:
+            yield
+        finally:
+            state.in_flight[route] -= 1
+            self._wake_waiters(channel_id, state)
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        """Creates a trace config that updates buckets from responses."""
+        import aiohttp
+
+        async def on_request_end(
+            session: aiohttp.ClientSession,
+            context: object,
+            params: aiohttp.TraceRequestEndParams,
+        ) -> None:
+            self.update_bucket(params.method, params.url.path, params.response)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    def update_bucket(
+        self,
+        method: str,
+        path: str,
+        response: aiohttp.ClientResponse,
+    ) -> None:
+        """Updates a channel's bucket from the headers of a response.
+
+        Responses for channels without any scheduled requests are ignored.
+
+        """
+        matched = MessageRoute.from_request(method, path)
+        if matched is None:
+            return
+
+        route, channel_id = matched
+        state = self._channels.get(channel_id)
+        if state is None:
+            return
+
+        headers = response.headers
+        if response.status == 429:
+            self.rate_limited[route] += 1
+            if "X-RateLimit-Global" in headers:
+                return  # Not specific to this channel, discord.py handles these
+
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_after = float(headers["X-RateLimit-Reset-After"])
+        except (KeyError, ValueError):
+            return
+
+        now = time.monotonic()
+        if response.status == 429:
+            remaining = 0
+            retry_after = headers.get("Retry-After")
+            if retry_after is not None:
+                reset_after = max(reset_after, float(retry_after))
+        reset_at = now + reset_after
+
+        bucket = state.buckets.get(route)
+        if bucket is None or now >= bucket.reset_at:
+            state.buckets[route] = _Bucket(limit, remaining, reset_at)
+        else:
+            # Responses can arrive out of order, and requests started
+            # since this one have already been counted
+            bucket.limit = limit
+            bucket.remaining = min(bucket.remaining, remaining)
+            bucket.reset_at = max(bucket.reset_at, reset_at)
+
+    def _can_start(self, state: _ChannelState, route: MessageRoute, now: float) -> bool:
+        if state.in_flight.total() >= self.channel_concurrency:
+            return False
+
+        bucket = state.buckets.get(route)
+        if bucket is None:
+            # Until the first response, one request discovers the bucket
+            return state.in_flight[route] == 0
+
+        bucket.refill(now)
+        return bucket.remaining > 0
+
+    def _start(self, state: _ChannelState, route: MessageRoute) -> None:
+        state.in_flight[route] += 1
+        bucket = state.buckets.get(route)
+        if bucket is not None:
+            bucket.remaining -= 1
+
+    async def _wait(
+        self,
+        channel_id: int,
+        state: _ChannelState,
+        route: MessageRoute,
+    ) -> None:
+        future = asyncio.get_running_loop().create_future()
+        state.queues[route].append(future)
+        self._wake_waiters(channel_id, state)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted right before being cancelled, so pass the slot on
+                state.in_flight[route] -= 1
+                bucket = state.buckets.get(route)
+                if bucket is not None:
+                    bucket.remaining += 1
+                self._wake_waiters(channel_id, state)
+            elif future in state.queues[route]:
+                state.queues[route].remove(future)
+            raise
+
+    def _wake_waiters(self, channel_id: int, state: _ChannelState) -> None:
+        now = time.monotonic()
+        next_reset: float | None = None
+
+        for route, queue in state.queues.items():
+            while queue and self._can_start(state, route, now):
+                future = queue.popleft()
+                if future.cancelled():
+                    continue
+                self._start(state, route)
+                future.set_result(None)
+
+            bucket = state.buckets.get(route)
+            if queue and bucket is not None and bucket.remaining <= 0:
+                if next_reset is None or bucket.reset_at < next_reset:
+                    next_reset = bucket.reset_at
+
+        if state.wake_handle is not None:
+            state.wake_handle.cancel()
+            state.wake_handle = None
+        if next_reset is not None:
+            # Requests in flight also wake waiters when they finish,
+            # but a bucket can reset while none are running
+            loop = asyncio.get_running_loop()
+            state.wake_handle = loop.call_later(
+                max(next_reset - now, 0),
+                self._wake_waiters,
+                channel_id,
+                state,
+            )
+
+    def _prune_channels(self, now: float) -> None:
+        if now < self._next_prune:
+            return
+
+        # Idle channels with reset buckets behave the same as missing ones
+        self._next_prune = now + 60
+        for channel_id, state in list(self._channels.items()):
+            if state.is_idle(now):
+                del self._channels[channel_id]
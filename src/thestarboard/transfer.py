@@ -0,0 +1,361 @@
+"""Exports and imports a guild's starboard data between databases.
+
+Exports are gzip-compressed JSON Lines files. The first line is a header
+describing the export, and every line after it is a chunk of rows from
+one table, written in the order they must be imported::
+
+    {"format": "thestarboard-guild", "version": 1, "guild_id": 123}
+    {"table": "channel", "columns": ["id", "guild_id"], "rows": [[456, 123]]}
+    ...
+
+Usage::
+
+    python -m thestarboard.transfer export 123 guild.jsonl.gz
+    python -m thestarboard.transfer import guild.jsonl.gz
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+if TYPE_CHECKING:
+    import asyncpg
+    from asyncpg.pool import PoolConnectionProxy
+
+FORMAT_NAME = "thestarboard-guild"
+FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class _Table:
+    name: str
+    columns: tuple[str, ...]
+    query: str
+    """Selects the table's rows for the guild ID given as $1."""
+    conflict_update: bool = False
+    """If True, conflicting rows are overwritten instead of skipped."""
+    user_column: str | None = None
+    """A column referencing the user table, whose rows are inserted first."""
+    hex_columns: tuple[str, ...] = ()
+    """Binary columns, which `query` must select as hexadecimal strings."""
+
+
+# Parents are listed before children so that foreign keys are satisfied
+_TABLES = (
+    _Table(
+        "channel",
+        ("id", "guild_id"),
+        "SELECT id, guild_id FROM channel WHERE guild_id = $1",
+    ),
+    _Table(
+        "starboard_guild_config",
+        (
+            "guild_id",
+            "starboard_channel_id",
+            "star_threshold",
+            "max_message_age",
+            "rising_rate",
+            "star_emojis",
+        ),
+        "SELECT guild_id, starboard_channel_id, star_threshold, max_message_age, "
+        "rising_rate, star_emojis FROM starboard_guild_config WHERE guild_id = $1",
+        conflict_update=True,
+    ),
+    _Table(
+        "starboard",
+        (
+            "channel_id",
+            "guild_id",
+            "star_threshold",
+            "max_message_age",
+            "source_channel_ids",
+            "emojis",
+        ),
+        "SELECT channel_id, guild_id, star_threshold, max_message_age, "
+        "source_channel_ids, emojis FROM starboard WHERE guild_id = $1",
+        conflict_update=True,
+    ),
+    _Table(
+        "message",
+        ("id", "channel_id", "user_id"),
+        "SELECT m.id, m.channel_id, m.user_id FROM message m "
+        "JOIN channel c ON c.id = m.channel_id WHERE c.guild_id = $1",
+        user_column="user_id",
+    ),
+    _Table(
+        "message_star",
+        ("message_id", "user_id", "emoji"),
+        "SELECT ms.message_id, ms.user_id, ms.emoji FROM message_star ms "
+        "JOIN message m ON m.id = ms.message_id "
+        "JOIN channel c ON c.id = m.channel_id WHERE c.guild_id = $1",
+        user_column="user_id",
+    ),
+    _Table(
+        "starboard_message",
+        (
+            "message_id",
+            "star_message_id",
+            "rising",
+            "image_filename",
+            "content_fingerprint",
+            "embed_fingerprint",
+        ),
+        "SELECT sm.message_id, sm.star_message_id, sm.rising, sm.image_filename, "
+        "encode(sm.content_fingerprint, 'hex'), encode(sm.embed_fingerprint, 'hex') "
+        "FROM starboard_message sm "
+        "JOIN message m ON m.id = sm.star_message_id "
+        "JOIN channel c ON c.id = m.channel_id WHERE c.guild_id = $1",
+        hex_columns=("content_fingerprint", "embed_fingerprint"),
+    ),
+)
+_TABLES_BY_NAME = {table.name: table for table in _TABLES}
+
+
+class TransferError(Exception):
+    """Raised when an export file cannot be imported."""
+
+
+async def export_guild(
+    pool: asyncpg.Pool,
+    guild_id: int,
+    path: Path,
+    *,
+    chunk_size: int = 1000,
+) -> Counter[str]:
+    """Exports a guild's rows to the given file.
+
+    Rows are read through server-side cursors inside a single repeatable
+    read transaction, so the export is consistent and only one chunk of
+    rows is held in memory at a time.
+
+    :returns: The number of rows exported from each table.
+
+    """
+    counts: Counter[str] = Counter()
+    f = await asyncio.to_thread(gzip.open, path, "wt", encoding="utf-8")
+    try:
+        header = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "guild_id": guild_id,
+        }
+        await asyncio.to_thread(f.write, json.dumps(header) + "\n")
+
+        async with (
+            pool.acquire() as conn,
+            conn.transaction(
+                isolation="repeatable_read",
+                readonly=True,
+            ),
+        ):
+            for table in _TABLES:
+                cursor = await conn.cursor(table.query, guild_id)
+                while rows := await cursor.fetch(chunk_size):
+                    chunk = {
+                        "table": table.name,
+                        "columns": table.columns,
+                        "rows": [list(row.values()) for row in rows],
+                    }
+                    await asyncio.to_thread(f.write, json.dumps(chunk) + "\n")
+                    counts[table.name] += len(rows)
+    finally:
+        await asyncio.to_thread(f.close)
+
+    return counts
+
+
+async def import_guild(
+    pool: asyncpg.Pool,
+    path: Path,
+    *,
+    on_chunk: Callable[[str, int], Any] | None = None,
+) -> tuple[int, Counter[str]]:
+    """Imports a guild's rows from the given file.
+
+    Each chunk is copied into a temporary table and inserted in its own
+    transaction, skipping rows that already exist. Importing the same
+    file again is therefore safe, and resumes an interrupted import.
+
+    :param on_chunk:
+        A callback invoked with the table name and number of rows
+        after each chunk is imported.
+    :returns:
+        The guild ID and the number of rows inserted into each table.
+    :raises TransferError: The file is not a supported export.
+
+    """
+    counts: Counter[str] = Counter()
+    f = await asyncio.to_thread(gzip.open, path, "rt", encoding="utf-8")
+    try:
+        lines = _iter_lines(f)
+        header = await asyncio.to_thread(next, lines, None)
+        guild_id = _parse_header(header)
+
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "INSERT INTO guild (id) VALUES ($1) ON CONFLICT DO NOTHING",
+                guild_id,
+            )
+
+            while (line := await asyncio.to_thread(next, lines, None)) is not None:
+                chunk = json.loads(line)
+                table = _TABLES_BY_NAME.get(chunk["table"])
+                columns = tuple(chunk["columns"])
+                # Exports from older schemas may omit columns added since
+                if (
+                    table is None
+                    or columns[0] != table.columns[0]
+                    or not set(columns) <= set(table.columns)
+                ):
+                    raise TransferError(f"Unexpected chunk for {chunk['table']!r}")
+
+                async with conn.transaction():
+                    n_inserted = await _import_chunk(
+                        conn,
+                        table,
+                        columns,
+                        chunk["rows"],
+                    )
+                counts[table.name] += n_inserted
+                if on_chunk is not None:
+                    on_chunk(table.name, len(chunk["rows"]))
+    finally:
+        await asyncio.to_thread(f.close)
+
+    return guild_id, counts
+
+
+def _iter_lines(f) -> Iterator[str]:
+    for line in f:
+        if line.strip():
+            yield line
+
+
+def _parse_header(line: str | None) -> int:
+    try:
+        header = json.loads(line or "")
+    except json.JSONDecodeError:
+        header = None
+
+    if not isinstance(header, dict) or header.get("format") != FORMAT_NAME:
+        raise TransferError("File is not a guild export")
+    if header.get("version") != FORMAT_VERSION:
+        raise TransferError(f"Unsupported export version: {header.get('version')}")
+    return header["guild_id"]
+
+
+async def _import_chunk(
+    conn: PoolConnectionProxy,
+    table: _Table,
+    column_names: tuple[str, ...],
+    rows: list[list[Any]],
+) -> int:
+    columns = ", ".join(column_names)
+    records = [tuple(row) for row in rows]
+    for i, name in enumerate(column_names):
+        if name in table.hex_columns:
+            records = [_decode_hex_column(record, i) for record in records]
+
+    await conn.execute(
+        f"CREATE TEMPORARY TABLE import_chunk ON COMMIT DROP AS "
+        f"SELECT {columns} FROM {table.name} WITH NO DATA"
+    )
+    await conn.copy_records_to_table(
+        "import_chunk",
+        records=records,
+        columns=column_names,
+    )
+
+    if table.user_column is not None:
+        await conn.execute(
+            f'INSERT INTO "user" (id) SELECT DISTINCT {table.user_column} '
+            f"FROM import_chunk ON CONFLICT DO NOTHING"
+        )
+
+    if table.conflict_update:
+        key, *others = column_names
+        updates = ", ".join(f"{c} = excluded.{c}" for c in others)
+        conflict = f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+    else:
+        conflict = "ON CONFLICT DO NOTHING"
+
+    result = await conn.execute(
+        f"INSERT INTO {table.name} ({columns}) "
+        f"SELECT {columns} FROM import_chunk {conflict}"
+    )
+    await conn.execute("DROP TABLE import_chunk")
+    # INSERT 0 <rows>
+    return int(result.split()[-1])
+
+
+def _decode_hex_column(record: tuple[Any, ...], i: int) -> tuple[Any, ...]:
+    value = record[i]
+    if value is None:
+        return record
+    return (*record[:i], bytes.fromhex(value), *record[i + 1 :])
+
+
+def main() -> None:
+    from .config import load_config
+
+    parser = argparse.ArgumentParser(
+        prog=f"{__package__}.transfer",
+        description="Exports and imports a guild's starboard data.",
+    )
+    parser.add_argument(
+        "--config-file",
+        default="config.toml",
+        help="The config file to load database settings from",
+        type=Path,
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export a guild to a file")
+    export_parser.add_argument("guild_id", type=int)
+    export_parser.add_argument("path", type=Path)
+    export_parser.add_argument(
+        "--chunk-size",
+        default=1000,
+        help="The number of rows written per chunk",
+        type=int,
+    )
+
+    import_parser = subparsers.add_parser("import", help="Import a guild from a file")
+    import_parser.add_argument("path", type=Path)
+
+    args = parser.parse_args()
+    config = load_config(args.config_file)
+
+    async def run() -> None:
+        async with config.db.create_pool() as pool:
+            if args.action == "export":
+                counts = await export_guild(
+                    pool,
+                    args.guild_id,
+                    args.path,
+                    chunk_size=args.chunk_size,
+                )
+                print(f"Exported guild {args.guild_id} to {args.path}")
+            else:
+                guild_id, counts = await import_guild(pool, args.path)
+                print(f"Imported guild {guild_id} from {args.path}")
+
+        for table in _TABLES:
+            print(f"    {table.name}: {counts[table.name]} rows")
+
+    try:
+        asyncio.run(run())
+    except TransferError as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
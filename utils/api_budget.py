@@ -0,0 +1,954 @@
+"""Runs starboard scenarios against a Discord stub and enforces API call budgets.
+
+Each scenario feeds raw gateway payloads through the bot's event parsers,
+waits for every listener to finish, and compares the number of REST calls
+received by the stub against an upper bound. Exceeding a budget, or any
+exception raised inside a listener, makes this script exit with status 1.
+
+A PostgreSQL database with all migrations applied is required::
+
+    python utils/api_budget.py --dsn postgres://postgres@localhost/starboard
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import logging
+import sys
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from discord_stub import DiscordStub, RouteLimit, patch_discord_routes
+
+from thestarboard.bot import Bot
+from thestarboard.cogs.stars.backfill import ChannelBackfill
+from thestarboard.cogs.stars.jobs import StarboardJobQueue
+from thestarboard.cogs.stars.mirror import AttachmentMirror
+from thestarboard.config import Settings, load_default_config
+
+STAR = "⭐"
+
+ScenarioFunc = Callable[["Harness"], Awaitable[None]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    budget: dict[str, int]
+    """Maximum calls per stub route. Unlisted routes must not be called."""
+    func: ScenarioFunc
+    limits: dict[str, RouteLimit] | None = None
+
+
+SCENARIOS: list[Scenario] = []
+
+
+def scenario(
+    name: str,
+    *,
+    limits: dict[str, RouteLimit] | None = None,
+    **budget: int,
+) -> Callable[[ScenarioFunc], ScenarioFunc]:
+    def decorator(func: ScenarioFunc) -> ScenarioFunc:
+        SCENARIOS.append(Scenario(name, budget, func, limits))
+        return func
+
+    return decorator
+
+
+class Harness:
+    """Drives the bot with raw gateway payloads for a single scenario."""
+
+    def __init__(self, bot: Bot, stub: DiscordStub) -> None:
+        self.bot = bot
+        self.stub = stub
+        self.errors: list[str] = []
+        self._pending: set[asyncio.Task] = set()
+        self._source_channels: dict[int, int] = {}
+
+    def install(self) -> None:
+        original = self.bot._schedule_event
+
+        def schedule_event(*args: Any, **kwargs: Any) -> asyncio.Task:
+            task = original(*args, **kwargs)
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            return task
+
+        async def on_error(event_method: str, /, *args: Any, **kwargs: Any) -> None:
+            self.errors.append(f"{event_method}: {traceback.format_exc()}")
+
+        self.bot._schedule_event = schedule_event  # type: ignore
+        self.bot.on_error = on_error  # type: ignore
+        logging.getLogger().addHandler(_ErrorCollector(self.errors))
+
+    async def settle(self, *, idle: float = 0.2) -> None:
+        """Waits until listeners have finished and the stub stops receiving calls."""
+        while True:
+            while self._pending:
+                await asyncio.wait(tuple(self._pending))
+
+            before = sum(self.stub.calls.values())
+            await asyncio.sleep(idle)
+            if not self._pending and sum(self.stub.calls.values()) == before:
+                return
+
+    def parse(self, event: str, data: dict[str, Any]) -> None:
+        self.bot._connection.parsers[event](data)
+
+    # Fixtures
+
+    async def create_guild(self, *, threshold: int = 3) -> tuple[int, int]:
+        """Creates a guild with a starboard channel and returns both IDs.
+
+        The guild is also added to the bot's cache, as if it was received
+        through the gateway.
+
+        """
+        guild_id = self.stub.next_id()
+        source_channel_id = self.stub.next_id()
+        starboard_channel_id = self.stub.next_id()
+
+        self.bot._connection._add_guild_from_data(
+            {
+                "id": str(guild_id),
+                "name": f"guild{guild_id}",
+                "channels": [
+                    _text_channel(source_channel_id, "general"),
+                    _text_channel(starboard_channel_id, "starboard"),
+                ],
+                "roles": [],
+                "members": [],
+                "member_count": 1,
+            }  # type: ignore
+        )
+        self._source_channels[guild_id] = source_channel_id
+        self.stub.add_channel(source_channel_id, guild_id)
+        self.stub.add_channel(starboard_channel_id, guild_id)
+
+        async with self.bot.query.acquire() as query:
+            await query.set_starboard_channel(starboard_channel_id, guild_id=guild_id)
+            await query.set_starboard_threshold(threshold, guild_id=guild_id)
+        return guild_id, starboard_channel_id
+
+    async def create_board(
+        self,
+        guild_id: int,
+        *,
+        threshold: int,
+        emojis: list[str] | None = None,
+    ) -> int:
+        """Adds an additional starboard to a guild and returns its channel ID."""
+        channel_id = self.stub.next_id()
+        self.stub.add_channel(channel_id, guild_id)
+
+        async with self.bot.query.acquire() as query:
+            await query.add_starboard(
+                channel_id,
+                guild_id=guild_id,
+                threshold=threshold,
+                max_message_age=datetime.timedelta(days=7),
+                emojis=emojis,
+            )
+        return channel_id
+
+    def create_message(
+        self,
+        guild_id: int,
+        content: str = "Hello world!",
+        *,
+        attachments: list[dict[str, Any]] | None = None,
+    ) -> dict:
+        channel_id = self._source_channels[guild_id]
+        author_id = self.stub.next_id()
+        return self.stub.add_message(
+            channel_id,
+            author_id,
+            content,
+            guild_id=guild_id,
+            attachments=attachments,
+        )
+
+    # Gateway events
+
+    def star(self, message: dict, user_id: int, emoji: str = STAR) -> None:
+        self.stub.add_reaction(int(message["id"]), emoji, user_id)
+        self.parse("MESSAGE_REACTION_ADD", self._reaction(message, user_id, emoji))
+
+    def unstar(self, message: dict, user_id: int, emoji: str = STAR) -> None:
+        users = self.stub.reactions.get(int(message["id"]), {}).get(emoji, [])
+        if user_id in users:
+            users.remove(user_id)
+        self.parse("MESSAGE_REACTION_REMOVE", self._reaction(message, user_id, emoji))
+
+    def delete(self, message: dict) -> None:
+        self.stub.messages.pop(int(message["id"]), None)
+        self.parse(
+            "MESSAGE_DELETE",
+            {
+                "id": message["id"],
+                "channel_id": message["channel_id"],
+                "guild_id": message["guild_id"],
+            },
+        )
+
+    def edit(self, message: dict, content: str) -> None:
+        message["content"] = content
+        self.parse("MESSAGE_UPDATE", dict(message))
+
+    def _reaction(self, message: dict, user_id: int, emoji: str) -> dict:
+        return {
+            "user_id": str(user_id),
+            "channel_id": message["channel_id"],
+            "message_id": message["id"],
+            "guild_id": message["guild_id"],
+            "emoji": {"id": None, "name": emoji},
+            "burst": False,
+            "type": 0,
+        }
+
+
+class _ErrorCollector(logging.Handler):
+    """Records errors logged outside of event listeners, e.g. in background tasks."""
+
+    def __init__(self, errors: list[str]) -> None:
+        super().__init__(logging.ERROR)
+        self.errors = errors
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if record.exc_info:
+            message += "\n" + "".join(traceback.format_exception(*record.exc_info))
+        self.errors.append(f"{record.name}: {message}")
+
+
+def _text_channel(channel_id: int, name: str) -> dict[str, Any]:
+    return {
+        "id": str(channel_id),
+        "type": 0,
+        "name": name,
+        "position": 0,
+        "permission_overwrites": [],
+    }
+
+
+# Scenarios
+
+
+@scenario("20 stars on one message", send=1, edit=17, fetch_message=1, fetch_user=20)
+async def twenty_stars(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    for _ in range(20):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+
+@scenario(
+    "10 simultaneous stars on one message",
+    send=1,
+    edit=7,
+    fetch_message=1,
+)
+async def simultaneous_stars(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+    users = [int(h.stub.add_user(h.stub.next_id())["id"]) for _ in range(10)]
+    # Skips fetch_user() so that every star reaches the starboard at once
+    events_cog: Any = h.bot.get_cog("StarboardEvents")
+    events_cog._user_id_bots.update(dict.fromkeys(users, False))
+
+    for user_id in users:
+        h.star(message, user_id)
+    await h.settle()
+
+
+@scenario(
+    "star then unstar below threshold",
+    send=1,
+    delete=1,
+    fetch_message=1,
+    fetch_user=3,
+)
+async def star_unstar(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+    users = [h.stub.next_id() for _ in range(3)]
+
+    for user_id in users:
+        h.star(message, user_id)
+        await h.settle(idle=0)
+    h.unstar(message, users[0])
+    await h.settle()
+
+
+@scenario("original message deleted", send=1, delete=1, fetch_message=1, fetch_user=3)
+async def original_deleted(h: Harness) -> None:
+    guild_id, starboard_channel_id = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    for _ in range(3):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+    h.delete(message)
+    await h.settle()
+
+    # The starboard message's own deletion event should be a no-op
+    (starboard_message,) = h.stub.deleted[starboard_channel_id]
+    h.delete(starboard_message)
+    await h.settle()
+
+
+@scenario("original message edited", send=1, edit=1, fetch_message=2, fetch_user=3)
+async def original_edited(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    for _ in range(3):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+    h.edit(message, "Goodbye world!")
+    await h.settle()
+
+
+@scenario("cached message edited before starring", send=1, fetch_user=3)
+async def cached_edited(h: Harness) -> None:
+    guild_id, starboard_channel_id = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+    # Received through the gateway, so the starboard uses the cached message
+    h.parse("MESSAGE_CREATE", dict(message))
+    h.edit(message, "Goodbye world!")
+    await h.settle()
+
+    for _ in range(3):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+    posts = h.stub.channel_messages(starboard_channel_id)
+    descriptions = [post["embeds"][0].get("description") for post in posts]
+    if descriptions != ["Goodbye world!"]:
+        h.errors.append(f"expected the edited content, got {descriptions}")
+
+
+@scenario("unchanged starboard renders", send=1, fetch_message=2, fetch_user=4)
+async def unchanged_renders(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+    users = [h.stub.next_id() for _ in range(4)]
+
+    for user_id in users[:3]:
+        h.star(message, user_id)
+        await h.settle(idle=0)
+    await h.settle()
+
+    # Neither of these change the star counts
+    h.star(message, users[0])
+    await h.settle(idle=0)
+    h.unstar(message, users[3])
+    await h.settle()
+
+    # Like a link preview being added, the starboard embed is unchanged
+    h.edit(message, message["content"])
+    await h.settle()
+
+
+@scenario(
+    "starboard post deleted while offline",
+    send=2,
+    edit=2,
+    fetch_message=2,
+    fetch_user=6,
+)
+async def post_deleted_offline(h: Harness) -> None:
+    guild_id, starboard_channel_id = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    for _ in range(3):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+    # No gateway event is received for the deletion
+    (post,) = h.stub.channel_messages(starboard_channel_id)
+    h.stub.messages.pop(int(post["id"]))
+
+    # The first edit fails and removes the post, letting the next star resend it
+    for _ in range(3):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+
+@scenario(
+    "starboard channel forbidden",
+    send=2,
+    edit=1,
+    fetch_message=2,
+    fetch_user=5,
+)
+async def channel_forbidden(h: Harness) -> None:
+    guild_id, starboard_channel_id = await h.create_guild(threshold=1)
+    messages = [h.create_message(guild_id) for _ in range(2)]
+    for message in messages:
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+    # Only the first request fails, and the rest are skipped during the cooldown
+    h.stub.forbidden.add(starboard_channel_id)
+    for message in messages:
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    h.edit(messages[1], "Goodbye world!")
+    h.star(h.create_message(guild_id), h.stub.next_id())
+    await h.settle()
+
+
+@scenario(
+    "starboard channel forbidden then restored",
+    send=1,
+    edit=2,
+    fetch_message=1,
+    fetch_user=3,
+)
+async def channel_restored(h: Harness) -> None:
+    breaker = h.bot.get_cog("StarboardEvents").breaker  # type: ignore
+    cooldown, max_cooldown = breaker.cooldown, breaker.max_cooldown
+    breaker.cooldown, breaker.max_cooldown = 0.1, 0.2
+    try:
+        guild_id, starboard_channel_id = await h.create_guild(threshold=1)
+        message = h.create_message(guild_id)
+        h.star(message, h.stub.next_id())
+        await h.settle()
+
+        h.stub.forbidden.add(starboard_channel_id)
+        h.star(message, h.stub.next_id())
+        await h.settle()
+
+        # The post should be edited again instead of being sent twice
+        h.stub.forbidden.discard(starboard_channel_id)
+        await asyncio.sleep(0.1)
+        h.star(message, h.stub.next_id())
+        await h.settle()
+    finally:
+        breaker.cooldown, breaker.max_cooldown = cooldown, max_cooldown
+
+    posts = h.stub.channel_messages(starboard_channel_id)
+    if len(posts) != 1:
+        h.errors.append(f"expected 1 starboard post, got {len(posts)}")
+
+
+@scenario(
+    "starboard channel forbidden repeatedly",
+    send=3,
+    fetch_message=3,
+    fetch_user=1,
+)
+async def channel_exhausted(h: Harness) -> None:
+    breaker = h.bot.get_cog("StarboardEvents").breaker  # type: ignore
+    cooldown, max_cooldown = breaker.cooldown, breaker.max_cooldown
+    breaker.cooldown, breaker.max_cooldown = 0.3, 0.6
+    try:
+        guild_id, starboard_channel_id = await h.create_guild(threshold=1)
+        h.stub.forbidden.add(starboard_channel_id)
+        # Reusing one user keeps rate limited user fetches
+        # from outlasting the cooldowns
+        user_id = h.stub.next_id()
+
+        # Only the send after cooling down for max_cooldown removes the starboard
+        removed_after = None
+        for n_sends in range(4):
+            while breaker.is_open(starboard_channel_id):
+                await asyncio.sleep(0.05)
+            async with h.bot.query.acquire() as query:
+                if await query.get_starboard_channel(guild_id) is None:
+                    removed_after = n_sends
+                    break
+            h.star(h.create_message(guild_id), user_id)
+            await h.settle()
+    finally:
+        breaker.cooldown, breaker.max_cooldown = cooldown, max_cooldown
+
+    if removed_after != 3:
+        h.errors.append(
+            f"expected the starboard channel to be removed after 3 sends, "
+            f"got {removed_after}"
+        )
+
+
+@scenario(
+    "mirrored starboard images",
+    send=3,
+    edit=1,
+    fetch_message=4,
+    fetch_user=3,
+    download=2,
+)
+async def mirrored_images(h: Harness) -> None:
+    events_cog: Any = h.bot.get_cog("StarboardEvents")
+    events_cog.mirror = mirror = AttachmentMirror(
+        max_size=1 << 20,
+        concurrency=2,
+        chunk_size=4096,
+        memory_size=16384,
+        timeout=10,
+    )
+    await mirror.start()
+
+    # Downloads should not hold up other updates of the same message
+    download = mirror.download
+    locked_downloads = 0
+
+    async def check_download(attachment: Any) -> Any:
+        nonlocal locked_downloads
+        if len(events_cog._message_locks):
+            locked_downloads += 1
+        return await download(attachment)
+
+    mirror.download = check_download  # type: ignore
+    try:
+        guild_id, starboard_channel_id = await h.create_guild(threshold=1)
+        small = h.stub.add_attachment(100_000)
+        large = h.stub.add_attachment(2 << 20)
+        # Reports a small size but streams more than the limit
+        lying = h.stub.add_attachment(1000)
+        h.stub.files[int(lying["id"])] = 2 << 20
+
+        messages = [
+            h.create_message(guild_id, attachments=[attachment])
+            for attachment in (small, large, lying)
+        ]
+        for message in messages:
+            h.star(message, h.stub.next_id())
+            await h.settle(idle=0)
+        await h.settle()
+
+        # Edited embeds should keep referencing the uploaded image
+        h.edit(messages[0], "Goodbye world!")
+        await h.settle()
+
+        posts = h.stub.channel_messages(starboard_channel_id)
+        images = [post["embeds"][0].get("image", {}).get("url") for post in posts]
+        expected = ["attachment://image.png", large["url"], lying["url"]]
+        if images != expected:
+            h.errors.append(f"expected starboard images {expected}, got {images}")
+        if locked_downloads:
+            h.errors.append(f"{locked_downloads} downloads held a message lock")
+    finally:
+        events_cog.mirror = None
+        await mirror.close()
+
+
+@scenario(
+    "queued starboard jobs across two workers",
+    send=1,
+    edit=2,
+    delete=1,
+    fetch_message=3,
+)
+async def queued_jobs(h: Harness) -> None:
+    events_cog: Any = h.bot.get_cog("StarboardEvents")
+
+    def create_queue() -> StarboardJobQueue:
+        return StarboardJobQueue(
+            h.bot,
+            events_cog._run_job,
+            concurrency=4,
+            lease=30,
+            poll_interval=1,
+            retry_delay=1,
+            max_attempts=3,
+        )
+
+    async def count_jobs() -> int:
+        async with h.bot.query.acquire(transaction=False) as query:
+            return await query.get_starboard_job_count()
+
+    async def drain() -> None:
+        await h.settle(idle=0)
+        while await count_jobs() or any(q.running for q in queues):
+            await asyncio.sleep(0.05)
+        await h.settle()
+
+    # Jobs are queued while no worker is running, as if the bot was restarting
+    events_cog.jobs = create_queue()
+    queues = [events_cog.jobs, create_queue()]
+    try:
+        guild_id, starboard_channel_id = await h.create_guild(threshold=3)
+        message = h.create_message(guild_id)
+        users = [int(h.stub.add_user(h.stub.next_id())["id"]) for _ in range(10)]
+        events_cog._user_id_bots.update(dict.fromkeys(users, False))
+
+        for user_id in users:
+            h.star(message, user_id)
+        await h.settle()
+        if (n_jobs := await count_jobs()) != 1:
+            h.errors.append(f"expected 10 stars to merge into 1 job, got {n_jobs}")
+
+        for queue in queues:
+            await queue.start()
+        await drain()
+
+        h.edit(message, "Goodbye world!")
+        await drain()
+        h.edit(message, "Hello again!")
+        await drain()
+
+        h.delete(message)
+        await drain()
+
+        if n_posts := len(h.stub.channel_messages(starboard_channel_id)):
+            h.errors.append(f"expected no starboard posts left, got {n_posts}")
+    finally:
+        events_cog.jobs = None
+        for queue in queues:
+            await queue.close()
+
+
+@scenario("stars below threshold", fetch_user=2)
+async def below_threshold(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    for _ in range(2):
+        h.star(message, h.stub.next_id())
+    await h.settle()
+
+
+@scenario("stars without a starboard")
+async def no_starboard(h: Harness) -> None:
+    guild_id, _ = await h.create_guild()
+    async with h.bot.query.acquire() as query:
+        await query.set_starboard_channel(None, guild_id=guild_id)
+    # The first star should be dropped even if the routes are not loaded yet
+    h.bot.query.invalidate_starboard_routes(guild_id)
+
+    message = h.create_message(guild_id)
+    for _ in range(2):
+        h.star(message, h.stub.next_id())
+    await h.settle()
+
+    if int(message["id"]) in h.bot.query.message_ids:
+        h.errors.append("expected stars without a starboard to not be stored")
+
+
+@scenario(
+    "rising message below threshold",
+    send=1,
+    edit=2,
+    fetch_message=1,
+    fetch_user=4,
+)
+async def rising(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=10)
+    async with h.bot.query.acquire() as query:
+        await query.set_starboard_rising_rate(3, guild_id=guild_id)
+    message = h.create_message(guild_id)
+    users = [h.stub.next_id() for _ in range(4)]
+
+    for user_id in users:
+        h.star(message, user_id)
+        await h.settle(idle=0)
+    await h.settle()
+
+    # Rising messages stay on the starboard while they have stars
+    h.unstar(message, users[0])
+    await h.settle()
+
+
+@scenario(
+    "emoji-filtered second starboard",
+    send=2,
+    fetch_message=2,
+    fetch_user=3,
+)
+async def second_board(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    await h.create_board(guild_id, threshold=2, emojis=["🌟"])
+    message = h.create_message(guild_id)
+
+    # Both 🌟 stars count towards the second board, but only the
+    # default board is routed the ⭐ star
+    h.star(message, h.stub.next_id(), "🌟")
+    h.star(message, h.stub.next_id(), "🌟")
+    await h.settle()
+    h.star(message, h.stub.next_id())
+    await h.settle()
+
+
+@scenario("unrelated messages deleted")
+async def unrelated_deletes(h: Harness) -> None:
+    guild_id, _ = await h.create_guild()
+    for _ in range(10):
+        h.delete(h.create_message(guild_id))
+    await h.settle()
+
+
+@scenario(
+    "rapid stars under edit rate limits",
+    limits={"edit": RouteLimit(limit=2, per=0.5)},
+    send=1,
+    edit=7,
+    fetch_message=1,
+    fetch_user=10,
+    rate_limited=0,
+)
+async def rate_limited_edits(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    for _ in range(10):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+    await h.settle()
+
+
+@scenario(
+    "concurrent posts and edits under rate limits",
+    limits={
+        "send": RouteLimit(limit=1, per=0.5),
+        "edit": RouteLimit(limit=1, per=0.5),
+    },
+    send=4,
+    edit=8,
+    fetch_message=4,
+    rate_limited=0,
+)
+async def rate_limited_posts(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=1)
+    messages = [h.create_message(guild_id) for _ in range(4)]
+    users = [int(h.stub.add_user(h.stub.next_id())["id"]) for _ in range(3)]
+    events_cog: Any = h.bot.get_cog("StarboardEvents")
+    events_cog._user_id_bots.update(dict.fromkeys(users, False))
+
+    # Every message is posted and edited at once in the same starboard channel
+    for user_id in users:
+        for message in messages:
+            h.star(message, user_id)
+    await h.settle()
+
+
+@scenario(
+    "star count edits deferred under load",
+    send=1,
+    edit=1,
+    fetch_message=1,
+    fetch_user=8,
+)
+async def deferred_edits(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    for _ in range(3):
+        h.star(message, h.stub.next_id())
+        await h.settle(idle=0)
+
+    # Pretend the database is saturated, so count edits are deferred
+    admission: Any = h.bot.admission
+    admission.degraded_since = time.monotonic()
+    admission._update_degraded = lambda: None
+    try:
+        for _ in range(5):
+            h.star(message, h.stub.next_id())
+            await h.settle(idle=0)
+        h.edit(message, "Edited while degraded")
+        await h.settle()
+    finally:
+        del admission._update_degraded
+        admission.degraded_since = None
+
+    events_cog: Any = h.bot.get_cog("StarboardEvents")
+    await events_cog.flush_deferred_updates()
+    await h.settle()
+
+
+@scenario(
+    "stars missed while offline",
+    send=1,
+    edit=1,
+    fetch_message=2,
+    fetch_user=2,
+    reaction_users=1,
+)
+async def missed_stars(h: Harness) -> None:
+    guild_id, starboard_channel_id = await h.create_guild(threshold=3)
+    message = h.create_message(guild_id)
+
+    h.star(message, h.stub.next_id())
+    await h.settle()
+
+    # Reactions added while offline are only visible through the API
+    for _ in range(2):
+        h.stub.add_reaction(int(message["id"]), STAR, h.stub.next_id())
+
+    reconciler = h.bot.get_cog("StarboardReconciler")
+    await reconciler.reconcile([guild_id])  # type: ignore
+    await h.settle()
+
+    # Reconciled stars should reach the threshold without another event
+    if not h.stub.channel_messages(starboard_channel_id):
+        h.errors.append("expected reconciled stars to send a starboard post")
+
+    # The next star should count the reconciled stars
+    h.star(message, h.stub.next_id())
+    await h.settle()
+
+
+@scenario(
+    "live stars during reconciliation",
+    fetch_message=1,
+    fetch_user=3,
+    reaction_users=1,
+)
+async def live_stars_during_reconciliation(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=10)
+    message = h.create_message(guild_id)
+    users = [h.stub.next_id() for _ in range(3)]
+
+    for user_id in users[:2]:
+        h.star(message, user_id)
+        await h.settle(idle=0)
+    await h.settle()
+
+    # Events received after the snapshot was fetched should not be reverted
+    reconciler: Any = h.bot.get_cog("StarboardReconciler")
+    fetch_stars = reconciler._fetch_stars
+
+    async def fetch_then_react(*args: Any) -> Any:
+        stars = await fetch_stars(*args)
+        h.unstar(message, users[0])
+        h.star(message, users[2])
+        await h.settle(idle=0)
+        return stars
+
+    reconciler._fetch_stars = fetch_then_react
+    try:
+        await reconciler.reconcile([guild_id])
+    finally:
+        del reconciler._fetch_stars
+    await h.settle()
+
+    async with h.bot.query.acquire() as query:
+        stars = await query.get_message_stars([int(message["id"])])
+    starred = set(stars.get(int(message["id"]), {}))
+    if starred != set(users[1:]):
+        h.errors.append(f"expected stars from {set(users[1:])}, got {starred}")
+
+
+@scenario("backfill 250 messages", history=3, reaction_users=10)
+async def backfill(h: Harness) -> None:
+    guild_id, _ = await h.create_guild(threshold=3)
+    # Messages reaching only the second starboard's threshold are also loaded
+    await h.create_board(guild_id, threshold=2)
+    messages = [h.create_message(guild_id) for _ in range(250)]
+    for message in messages[::50]:
+        for _ in range(3):
+            h.stub.add_reaction(int(message["id"]), STAR, h.stub.next_id())
+    for message in messages[25::50]:
+        for _ in range(2):
+            h.stub.add_reaction(int(message["id"]), STAR, h.stub.next_id())
+
+    channel = h.bot.get_channel(int(messages[0]["channel_id"]))
+    state = await ChannelBackfill(h.bot, channel).run()  # type: ignore
+    await h.settle()
+
+    if state["messages_loaded"] != 10:
+        h.errors.append(f"expected 10 messages loaded, got {state['messages_loaded']}")
+
+
+# Runner
+
+
+def check_budget(s: Scenario, stub: DiscordStub) -> list[str]:
+    counts = dict(stub.calls)
+    counts["rate_limited"] = sum(stub.rate_limited.values())
+
+    failures = []
+    for route, count in sorted(counts.items()):
+        allowed = s.budget.get(route, 0)
+        if count > allowed:
+            failures.append(f"{route}: {count} calls exceeds budget of {allowed}")
+    return failures
+
+
+async def run_scenarios(config: Settings, selected: list[Scenario]) -> bool:
+    ok = True
+
+    async with DiscordStub() as stub:
+        bot = Bot(lambda: config)
+        harness = Harness(bot, stub)
+        harness.install()
+
+        async def connect(*args: Any, **kwargs: Any) -> None:
+            nonlocal ok
+            for s in selected:
+                stub.calls.clear()
+                stub.rate_limited.clear()
+                stub.forbidden.clear()
+                stub.limits = s.limits or {}
+                harness.errors.clear()
+
+                await s.func(harness)
+
+                failures = check_budget(s, stub) + harness.errors
+                calls = ", ".join(f"{k}={v}" for k, v in sorted(stub.calls.items()))
+                status = "FAIL" if failures else "ok"
+                print(f"[{status}] {s.name} ({calls or 'no calls'})")
+                for failure in failures:
+                    print(f"    {failure}")
+                ok = ok and not failures
+
+        # Replaces the gateway connection so only REST calls are made
+        bot.connect = connect  # type: ignore
+
+        with patch_discord_routes(stub.url):
+            async with bot:
+                await bot.start("stub-token")
+
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dsn",
+        default="postgres://postgres@localhost/starboard",
+        help="The database to run scenarios against",
+    )
+    parser.add_argument(
+        "-k",
+        dest="pattern",
+        default="",
+        help="Only run scenarios whose name contains this string",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    config = load_default_config()
+    config.bot.allow_jishaku = False
+    config.db.dsn = args.dsn
+    config.db.password_file = ""
+    # Flush deletions quickly so errors surface within each scenario
+    config.cleanup.delete_interval = 0.1
+
+    selected = [s for s in SCENARIOS if args.pattern in s.name]
+    if not asyncio.run(run_scenarios(config, selected)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Measures the CPU time saved by the bot's gateway filters.
+
+Batches of raw gateway payloads that the filters are meant to discard
+are fed through the bot's event parsers, once with the filters installed
+and once without, and the process CPU time spent until every listener
+has finished is reported per batch.
+
+A PostgreSQL database with all migrations applied is required::
+
+    python utils/bench_gateway_filter.py --dsn postgres://postgres@localhost/starboard
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+from api_budget import STAR, Harness
+from discord_stub import DiscordStub, patch_discord_routes
+
+from thestarboard.bot import Bot
+from thestarboard.config import Settings, load_default_config
+
+EventFactory = Callable[[int], tuple[str, dict[str, Any]]]
+
+
+async def measure(h: Harness, factory: EventFactory, n_events: int) -> float:
+    """Parses `n_events` payloads and returns the CPU seconds taken."""
+    events = [factory(i) for i in range(n_events)]
+    start = time.process_time()
+    for event, data in events:
+        h.parse(event, data)
+    await h.settle(idle=0)
+    return time.process_time() - start
+
+
+async def run_benchmark(config: Settings, n_events: int) -> None:
+    async with DiscordStub() as stub:
+        bot = Bot(lambda: config)
+        h = Harness(bot, stub)
+        h.install()
+
+        async def connect(*args: Any, **kwargs: Any) -> None:
+            guild_id, _ = await h.create_guild()
+            unset_guild_id, _ = await h.create_guild()
+            async with bot.query.acquire() as query:
+                await query.set_starboard_channel(None, guild_id=unset_guild_id)
+
+            message = h.create_message(guild_id)
+            unset_message = h.create_message(unset_guild_id)
+            untracked = [h.create_message(guild_id) for _ in range(100)]
+            users = [int(stub.add_user(stub.next_id())["id"]) for _ in range(100)]
+            # Skips fetch_user() so that listeners are not rate limited
+            events_cog: Any = bot.get_cog("StarboardEvents")
+            events_cog._user_id_bots.update(dict.fromkeys(users, False))
+
+            # Load both guilds' routes, as after the first reaction in each
+            h.parse("MESSAGE_REACTION_ADD", h._reaction(message, users[0], "👍"))
+            h.parse("MESSAGE_REACTION_ADD", h._reaction(unset_message, users[0], "👍"))
+            await h.settle()
+
+            factories: dict[str, EventFactory] = {
+                "non-star reactions": lambda i: (
+                    "MESSAGE_REACTION_ADD",
+                    h._reaction(message, users[i % len(users)], "👍"),
+                ),
+                "stars without a starboard": lambda i: (
+                    "MESSAGE_REACTION_ADD" if i % 2 == 0 else "MESSAGE_REACTION_REMOVE",
+                    h._reaction(unset_message, users[i // 2 % len(users)], STAR),
+                ),
+                "edits to untracked messages": lambda i: (
+                    "MESSAGE_UPDATE",
+                    dict(untracked[i % len(untracked)], content=f"edit {i}"),
+                ),
+            }
+
+            print(f"CPU time per {n_events} events:")
+            for name, factory in factories.items():
+                filtered = await measure(h, factory, n_events)
+
+                saved = {k: list(v) for k, v in bot._gateway_filters.items()}
+                for checks in bot._gateway_filters.values():
+                    checks.clear()
+                try:
+                    unfiltered = await measure(h, factory, n_events)
+                finally:
+                    for event, checks in saved.items():
+                        bot._gateway_filters[event][:] = checks
+
+                print(
+                    f"  {name}: {unfiltered * 1000:.0f} ms unfiltered, "
+                    f"{filtered * 1000:.0f} ms filtered, "
+                    f"{(unfiltered - filtered) * 1000:.0f} ms saved"
+                )
+
+            if h.errors:
+                print(f"{len(h.errors)} listener errors, the first being:")
+                print(h.errors[0])
+
+        # Replaces the gateway connection so only REST calls are made
+        bot.connect = connect  # type: ignore
+
+        with patch_discord_routes(stub.url):
+            async with bot:
+                await bot.start("stub-token")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dsn",
+        default="postgres://postgres@localhost/starboard",
+        help="The database to run the benchmark against",
+    )
+    parser.add_argument(
+        "-n",
+        dest="n_events",
+        type=int,
+        default=10000,
+        help="The number of events to parse per batch",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    config = load_default_config()
+    config.bot.allow_jishaku = False
+    config.db.dsn = args.dsn
+    config.db.password_file = ""
+
+    asyncio.run(run_benchmark(config, args.n_events))
+
+
+if __name__ == "__main__":
+    main()
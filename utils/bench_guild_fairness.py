@@ -0,0 +1,238 @@
+"""Measures how long small guilds wait while one hot guild floods the bot.
+
+A burst of star reactions is delivered for a hot guild whose messages are
+already on its starboard, so every event edits a starboard post. Stars for
+several small guilds are delivered throughout the burst, and the time from
+each small guild event being parsed until its listeners finish is reported.
+Small guilds also edit messages already on their starboards, and the number
+of those edits shed under load is reported alongside their latency.
+
+The burst is run twice, once with guilds taking turns in the bot's
+admission controller and once with every event in a single FIFO queue.
+
+A PostgreSQL database with all migrations applied is required::
+
+    python utils/bench_guild_fairness.py --dsn postgres://postgres@localhost/starboard
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Any
+
+from api_budget import Harness
+from discord_stub import DiscordStub, RouteLimit, patch_discord_routes
+
+from thestarboard.admission import Priority
+from thestarboard.bot import Bot
+from thestarboard.config import Settings, load_default_config
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def measure_parse(h: Harness, event: str, data: dict[str, Any]) -> float:
+    """Parses an event and returns the seconds until its listeners finish."""
+    start = time.perf_counter()
+    before = set(h._pending)
+    h.parse(event, data)
+    tasks = h._pending - before
+    if tasks:
+        await asyncio.wait(tasks)
+    return time.perf_counter() - start
+
+
+async def run_burst(
+    h: Harness,
+    args: argparse.Namespace,
+    users: list[int],
+) -> tuple[list[float], list[float], int, float]:
+    """Runs one burst and returns the small guild star and edit latencies,
+    the number of small guild edits shed, and the seconds taken to drain
+    the hot guild's events.
+    """
+    hot_guild_id, _ = await h.create_guild(threshold=1)
+    hot_messages = [h.create_message(hot_guild_id) for _ in range(args.hot_messages)]
+    for message in hot_messages:
+        h.star(message, users[0])
+    await h.settle()
+
+    small_messages = []
+    for _ in range(args.small_guilds):
+        guild_id, _ = await h.create_guild(threshold=args.n_events)
+        small_messages.append(h.create_message(guild_id))
+
+    # Edits are only handled for messages on a starboard
+    posted_messages = []
+    for _ in range(args.small_guilds):
+        guild_id, _ = await h.create_guild(threshold=1)
+        message = h.create_message(guild_id)
+        h.star(message, users[0])
+        posted_messages.append(message)
+    await h.settle()
+
+    admission = h.bot.admission
+    shed_before = admission.shed[Priority.EDIT]
+
+    start = time.perf_counter()
+    for i in range(args.n_events):
+        message = hot_messages[i % len(hot_messages)]
+        h.star(message, users[1 + i % (len(users) - 1)])
+
+    # Small guilds star and edit their messages
+    # while the hot guild's events are queued
+    star_measurements = []
+    edit_measurements = []
+    for i in range(args.small_events):
+        message = small_messages[i % len(small_messages)]
+        data = h._reaction(message, users[1 + i], "⭐")
+        star_measurements.append(
+            asyncio.create_task(measure_parse(h, "MESSAGE_REACTION_ADD", data))
+        )
+
+        message = posted_messages[i % len(posted_messages)]
+        message["content"] = f"Edit {i}"
+        edit_measurements.append(
+            asyncio.create_task(measure_parse(h, "MESSAGE_UPDATE", dict(message)))
+        )
+        await asyncio.sleep(args.small_interval)
+
+    star_latencies = await asyncio.gather(*star_measurements)
+    edit_latencies = await asyncio.gather(*edit_measurements)
+    edits_shed = admission.shed[Priority.EDIT] - shed_before
+    await h.settle(idle=0)
+    drained = time.perf_counter() - start
+    await h.settle()
+    return list(star_latencies), list(edit_latencies), edits_shed, drained
+
+
+def format_latencies(latencies: list[float]) -> str:
+    return (
+        f"p50={statistics.median(latencies) * 1000:.0f}ms "
+        f"p95={percentile(latencies, 0.95) * 1000:.0f}ms "
+        f"max={max(latencies) * 1000:.0f}ms"
+    )
+
+
+async def run_benchmark(config: Settings, args: argparse.Namespace) -> None:
+    async with DiscordStub() as stub:
+        bot = Bot(lambda: config)
+        h = Harness(bot, stub)
+        h.install()
+
+        async def connect(*_args: Any, **_kwargs: Any) -> None:
+            stub.limits = {
+                "edit": RouteLimit(limit=args.edit_rate, per=1),
+                # Each small guild edit fetches its message again,
+                # which would otherwise be rate limited in every channel
+                "fetch_message": RouteLimit(limit=args.small_events, per=1),
+            }
+            n_users = 1 + max(args.n_events, args.small_events)
+            users = [int(stub.add_user(stub.next_id())["id"]) for _ in range(n_users)]
+            # Skips fetch_user() so that listeners are not rate limited
+            events_cog: Any = bot.get_cog("StarboardEvents")
+            events_cog._user_id_bots.update(dict.fromkeys(users, False))
+
+            dispatcher: Any = bot.raw_events
+            modes = {
+                "fair": dispatcher._get_admission_key,
+                "fifo": lambda payload: None,
+            }
+            print(
+                f"{args.n_events} hot guild events, "
+                f"{args.small_events} small guild events:"
+            )
+            for mode, get_key in modes.items():
+                dispatcher._get_admission_key = get_key
+                stars, edits, edits_shed, drained = await run_burst(h, args, users)
+                print(
+                    f"  {mode}: small guild stars {format_latencies(stars)}, "
+                    f"edits {format_latencies(edits)} "
+                    f"({edits_shed}/{len(edits)} shed), "
+                    f"hot guild drained in {drained:.1f}s"
+                )
+
+            if h.errors:
+                print(f"{len(h.errors)} listener errors, the first being:")
+                print(h.errors[0])
+
+        # Replaces the gateway connection so only REST calls are made
+        bot.connect = connect  # type: ignore
+
+        with patch_discord_routes(stub.url):
+            async with bot:
+                await bot.start("stub-token")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dsn",
+        default="postgres://postgres@localhost/starboard",
+        help="The database to run the benchmark against",
+    )
+    parser.add_argument(
+        "-n",
+        dest="n_events",
+        type=int,
+        default=1000,
+        help="The number of hot guild events per burst",
+    )
+    parser.add_argument(
+        "--hot-messages",
+        type=int,
+        default=50,
+        help="The number of hot guild messages starred",
+    )
+    parser.add_argument(
+        "--small-guilds",
+        type=int,
+        default=5,
+        help="The number of small guilds",
+    )
+    parser.add_argument(
+        "--small-events",
+        type=int,
+        default=50,
+        help="The number of small guild events per burst",
+    )
+    parser.add_argument(
+        "--small-interval",
+        type=float,
+        default=0.02,
+        help="The seconds between each small guild event",
+    )
+    parser.add_argument(
+        "--edit-rate",
+        type=int,
+        default=200,
+        help="The stub's limit on edits per second in each channel",
+    )
+    parser.add_argument(
+        "--guild-rate",
+        type=float,
+        default=500,
+        help="The events admitted per second for each guild",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    config = load_default_config()
+    config.bot.allow_jishaku = False
+    config.db.dsn = args.dsn
+    config.db.password_file = ""
+    config.db.admission.guild_rate = args.guild_rate
+
+    asyncio.run(run_benchmark(config, args))
+
+
+if __name__ == "__main__":
+    main()
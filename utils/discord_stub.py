@@ -0,0 +1,516 @@
+"""A local stand-in for the subset of Discord's REST API used by the bot.
+
+The stub keeps users and messages in memory, counts every call made to it,
+and emulates per-route rate limits including ``X-RateLimit-*`` headers
+and 429 responses. Point discord.py at it with :func:`patch_discord_routes`.
+
+Usage::
+
+    async with DiscordStub() as stub, patch_discord_routes(stub.url):
+        stub.add_user(1234)
+        ...
+        assert stub.calls["edit"] <= 10
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import datetime
+import itertools
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterator, Self
+
+from aiohttp import web
+
+DISCORD_EPOCH = 1420070400000
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+def snowflake_from_time(dt: datetime.datetime) -> int:
+    """Creates a snowflake corresponding to the given time."""
+    return int(dt.timestamp() * 1000 - DISCORD_EPOCH) << 22
+
+
+@dataclass
+class RouteLimit:
+    """The rate limit applied to each bucket of a route.
+
+    Buckets are keyed by route and major parameter (the channel ID),
+    matching how Discord scopes rate limits for message routes.
+
+    """
+
+    limit: int = 5
+    per: float = 5.0
+
+
+@dataclass
+class _Bucket:
+    limit: int
+    per: float
+    remaining: int = 0
+    reset_at: float = 0.0
+
+    def take(self, now: float) -> float:
+        """Consumes one request and returns the retry delay if exhausted."""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.per
+
+        if self.remaining <= 0:
+            return self.reset_at - now
+
+        self.remaining -= 1
+        return 0.0
+
+
+@dataclass
+class DiscordStub:
+    """Emulates Discord REST routes on a local aiohttp server.
+
+    Parameters
+    ----------
+    limits: dict[str, RouteLimit]
+        Rate limits keyed by route name. Routes without an entry
+        use the default :class:`RouteLimit`.
+
+    """
+
+    limits: dict[str, RouteLimit] = field(default_factory=dict)
+    bot_user_id: int = 1000
+
+    calls: Counter[str] = field(default_factory=Counter, init=False)
+    """The number of requests received by each route, including 429s."""
+    rate_limited: Counter[str] = field(default_factory=Counter, init=False)
+    """The number of 429 responses sent by each route."""
+
+    channels: dict[int, int] = field(default_factory=dict, init=False)
+    """Maps channel IDs to their guild IDs."""
+    users: dict[int, dict[str, Any]] = field(default_factory=dict, init=False)
+    messages: dict[int, dict[str, Any]] = field(default_factory=dict, init=False)
+    reactions: dict[int, dict[str, list[int]]] = field(default_factory=dict, init=False)
+    """Maps message IDs to the user IDs that reacted with each emoji."""
+    deleted: dict[int, list[dict[str, Any]]] = field(default_factory=dict, init=False)
+    """Maps channel IDs to the messages deleted through the API."""
+    forbidden: set[int] = field(default_factory=set, init=False)
+    """Channel IDs whose routes respond with 403 Missing Access."""
+    files: dict[int, int] = field(default_factory=dict, init=False)
+    """Maps attachment IDs to the number of bytes served when downloading them."""
+
+    _buckets: dict[str, _Bucket] = field(default_factory=dict, init=False)
+    _ids: Iterator[int] = field(init=False)
+    _runner: web.AppRunner | None = field(default=None, init=False)
+    url: str = field(default="", init=False)
+
+    def __post_init__(self) -> None:
+        start = snowflake_from_time(datetime.datetime.now(datetime.timezone.utc))
+        self._ids = itertools.count(start)
+        self.add_user(self.bot_user_id, bot=True)
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    # Server lifecycle
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Starts the server, binding to a random port by default."""
+        app = web.Application()
+        routes = {
+            ("GET", "/users/@me"): ("get_current_user", self._get_current_user),
+            ("GET", "/oauth2/applications/@me"): (
+                "application_info",
+                self._get_application,
+            ),
+            ("GET", "/users/{user_id}"): ("fetch_user", self._get_user),
+            ("GET", "/channels/{channel_id}/messages"): ("history", self._get_history),
+            ("POST", "/channels/{channel_id}/messages"): ("send", self._send),
+            ("GET", "/channels/{channel_id}/messages/{message_id}"): (
+                "fetch_message",
+                self._get_message,
+            ),
+            ("PATCH", "/channels/{channel_id}/messages/{message_id}"): (
+                "edit",
+                self._edit,
+            ),
+            ("DELETE", "/channels/{channel_id}/messages/{message_id}"): (
+                "delete",
+                self._delete,
+            ),
+            ("GET", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}"): (
+                "reaction_users",
+                self._get_reaction_users,
+            ),
+            ("GET", "/attachments/{attachment_id}/{filename}"): (
+                "download",
+                self._download,
+            ),
+        }
+        for (method, path), (name, handler) in routes.items():
+            app.router.add_route(method, "/api/v10" + path, self._wrap(name, handler))
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        server = site._server
+        assert server is not None
+        sock_host, sock_port = server.sockets[0].getsockname()[:2]  # type: ignore
+        self.url = f"http://{sock_host}:{sock_port}/api/v10"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # Fixtures
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add_channel(self, channel_id: int, guild_id: int) -> None:
+        self.channels[channel_id] = guild_id
+
+    def add_user(self, user_id: int, *, bot: bool = False) -> dict[str, Any]:
+        user = {
+            "id": str(user_id),
+            "username": f"user{user_id}",
+            "global_name": None,
+            "discriminator": "0",
+            "avatar": None,
+            "bot": bot,
+        }
+        self.users[user_id] = user
+        return user
+
+    def add_attachment(
+        self,
+        size: int,
+        *,
+        filename: str = "image.png",
+        content_type: str = "image/png",
+    ) -> dict[str, Any]:
+        """Creates an attachment object that can be downloaded from the stub."""
+        attachment_id = self.next_id()
+        self.files[attachment_id] = size
+        return {
+            "id": str(attachment_id),
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "url": f"{self.url}/attachments/{attachment_id}/{filename}",
+            "proxy_url": f"{self.url}/attachments/{attachment_id}/{filename}",
+        }
+
+    def add_message(
+        self,
+        channel_id: int,
+        author_id: int,
+        content: str = "",
+        *,
+        message_id: int | None = None,
+        guild_id: int | None = None,
+        attachments: list[dict[str, Any]] | None = None,
+    ) -> dict[str, Any]:
+        if message_id is None:
+            message_id = self.next_id()
+        author = self.users.get(author_id) or self.add_user(author_id)
+
+        message = {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "author": author,
+            "content": content,
+            "timestamp": _snowflake_timestamp(message_id),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": attachments or [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+        guild_id = guild_id or self.channels.get(channel_id)
+        if guild_id is not None:
+            message["guild_id"] = str(guild_id)
+        self.messages[message_id] = message
+        return message
+
+    def add_reaction(self, message_id: int, emoji: str, user_id: int) -> None:
+        users = self.reactions.setdefault(message_id, {}).setdefault(emoji, [])
+        if user_id not in users:
+            users.append(user_id)
+
+    def channel_messages(self, channel_id: int) -> list[dict[str, Any]]:
+        """Returns the messages currently in a channel, oldest first."""
+        return sorted(
+            (m for m in self.messages.values() if m["channel_id"] == str(channel_id)),
+            key=lambda m: int(m["id"]),
+        )
+
+    # Rate limiting
+
+    def _wrap(self, name: str, handler: Handler) -> Handler:
+        async def wrapped(request: web.Request) -> web.StreamResponse:
+            self.calls[name] += 1
+
+            limit = self.limits.get(name, RouteLimit())
+            major = request.match_info.get("channel_id", "")
+            bucket_key = f"{name}:{major}"
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = _Bucket(limit.limit, limit.per)
+
+            now = time.time()
+            retry_after = bucket.take(now)
+            headers = {
+                "X-RateLimit-Bucket": name,
+                "X-RateLimit-Limit": str(bucket.limit),
+                "X-RateLimit-Remaining": str(max(bucket.remaining, 0)),
+                "X-RateLimit-Reset": f"{bucket.reset_at:.3f}",
+                "X-RateLimit-Reset-After": f"{max(bucket.reset_at - now, 0):.3f}",
+            }
+
+            if retry_after > 0:
+                self.rate_limited[name] += 1
+                headers["X-RateLimit-Scope"] = "user"
+                headers["Retry-After"] = f"{retry_after:.3f}"
+                body = {
+                    "message": "You are being rate limited.",
+                    "retry_after": retry_after,
+                    "global": False,
+                }
+                return _json_response(body, status=429, headers=headers)
+
+            if major and int(major) in self.forbidden:
+                response = _json_response(
+                    {"message": "Missing Access", "code": 50001},
+                    status=403,
+                )
+            else:
+                response = await handler(request)
+            response.headers.update(headers)
+            return response
+
+        return wrapped
+
+    # Route handlers
+
+    async def _get_current_user(self, request: web.Request) -> web.StreamResponse:
+        return _json_response(self.users[self.bot_user_id])
+
+    async def _get_application(self, request: web.Request) -> web.StreamResponse:
+        return _json_response(
+            {
+                "id": str(self.bot_user_id),
+                "name": "thestarboard",
+                "description": "",
+                "icon": None,
+                "bot_public": False,
+                "bot_require_code_grant": False,
+                "owner": self.users[self.bot_user_id],
+                "verify_key": "",
+                "flags": 0,
+            }
+        )
+
+    async def _get_user(self, request: web.Request) -> web.StreamResponse:
+        user_id = int(request.match_info["user_id"])
+        user = self.users.get(user_id) or self.add_user(user_id)
+        return _json_response(user)
+
+    async def _get_history(self, request: web.Request) -> web.StreamResponse:
+        channel_id = int(request.match_info["channel_id"])
+        limit = int(request.query.get("limit", 50))
+        before = request.query.get("before")
+        after = request.query.get("after")
+
+        messages = self.channel_messages(channel_id)
+        if before is not None:
+            messages = [m for m in messages if int(m["id"]) < int(before)]
+        if after is not None:
+            messages = [m for m in messages if int(m["id"]) > int(after)]
+            messages = messages[:limit]
+        else:
+            messages = messages[-limit:]
+
+        # Discord returns history newest first
+        return _json_response([self._render(m) for m in reversed(messages)])
+
+    async def _get_message(self, request: web.Request) -> web.StreamResponse:
+        message = self._find_message(request)
+        if message is None:
+            return _not_found("Unknown Message", 10008)
+        return _json_response(self._render(message))
+
+    async def _download(self, request: web.Request) -> web.StreamResponse:
+        size = self.files.get(int(request.match_info["attachment_id"]))
+        if size is None:
+            return web.Response(status=404)
+
+        # Streamed without a Content-Length, like a chunked CDN response
+        response = web.StreamResponse(headers={"Content-Type": "image/png"})
+        await response.prepare(request)
+        chunk = b"\0" * 65536
+        while size > 0:
+            await response.write(chunk[:size])
+            size -= len(chunk)
+        await response.write_eof()
+        return response
+
+    async def _send(self, request: web.Request) -> web.StreamResponse:
+        channel_id = int(request.match_info["channel_id"])
+        payload = await _read_payload(request)
+
+        message = self.add_message(
+            channel_id,
+            self.bot_user_id,
+            payload.get("content") or "",
+        )
+        message["embeds"] = payload.get("embeds") or []
+        return _json_response(self._render(message))
+
+    async def _edit(self, request: web.Request) -> web.StreamResponse:
+        message = self._find_message(request)
+        if message is None:
+            return _not_found("Unknown Message", 10008)
+
+        payload = await _read_payload(request)
+        for key in ("content", "embeds", "attachments"):
+            if key in payload:
+                message[key] = payload[key]
+        message["edited_timestamp"] = _snowflake_timestamp(self.next_id())
+        return _json_response(self._render(message))
+
+    async def _delete(self, request: web.Request) -> web.StreamResponse:
+        message = self._find_message(request)
+        if message is None:
+            return _not_found("Unknown Message", 10008)
+
+        message_id = int(message["id"])
+        del self.messages[message_id]
+        self.deleted.setdefault(int(message["channel_id"]), []).append(message)
+        self.reactions.pop(message_id, None)
+        return web.Response(status=204)
+
+    async def _get_reaction_users(self, request: web.Request) -> web.StreamResponse:
+        message = self._find_message(request)
+        if message is None:
+            return _not_found("Unknown Message", 10008)
+
+        emoji = request.match_info["emoji"]
+        limit = int(request.query.get("limit", 25))
+        after = int(request.query.get("after", 0))
+
+        user_ids = sorted(self.reactions.get(int(message["id"]), {}).get(emoji, []))
+        user_ids = [user_id for user_id in user_ids if user_id > after][:limit]
+        users = [self.users.get(u) or self.add_user(u) for u in user_ids]
+        return _json_response(users)
+
+    # Helpers
+
+    def _find_message(self, request: web.Request) -> dict[str, Any] | None:
+        message_id = int(request.match_info["message_id"])
+        message = self.messages.get(message_id)
+        if message is None or message["channel_id"] != request.match_info["channel_id"]:
+            return None
+        return message
+
+    def _render(self, message: dict[str, Any]) -> dict[str, Any]:
+        reactions = self.reactions.get(int(message["id"]), {})
+        rendered = dict(message)
+        rendered["reactions"] = [
+            {
+                "emoji": _emoji_object(emoji),
+                "count": len(users),
+                "me": self.bot_user_id in users,
+            }
+            for emoji, users in reactions.items()
+            if users
+        ]
+        return rendered
+
+
+@contextlib.contextmanager
+def patch_discord_routes(url: str) -> Iterator[None]:
+    """Temporarily points discord.py's HTTP routes at the given base URL."""
+    from discord.http import Route
+
+    original = Route.BASE
+    Route.BASE = url
+    try:
+        yield
+    finally:
+        Route.BASE = original
+
+
+async def _read_payload(request: web.Request) -> dict[str, Any]:
+    if request.content_type.startswith("multipart/"):
+        payload: dict[str, Any] = {}
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == "payload_json":  # type: ignore
+                payload = json.loads(await part.text())  # type: ignore
+            else:
+                # Drain file parts without keeping them
+                while await part.read_chunk():  # type: ignore
+                    pass
+        return payload
+    elif request.can_read_body:
+        return await request.json()
+    return {}
+
+
+def _json_response(
+    data: Any,
+    *,
+    status: int = 200,
+    headers: dict[str, str] | None = None,
+) -> web.Response:
+    # discord.py only decodes bodies whose content type is exactly application/json,
+    # so the charset parameter added by web.json_response() cannot be used
+    return web.Response(
+        body=json.dumps(data).encode(),
+        status=status,
+        headers=headers,
+        content_type="application/json",
+    )
+
+
+def _not_found(message: str, code: int) -> web.Response:
+    return _json_response({"message": message, "code": code}, status=404)
+
+
+def _emoji_object(emoji: str) -> dict[str, Any]:
+    # Custom emojis are addressed as name:id in reaction routes
+    name, _, id_ = emoji.partition(":")
+    return {"id": id_ or None, "name": name}
+
+
+def _snowflake_timestamp(snowflake: int) -> str:
+    ms = (snowflake >> 22) + DISCORD_EPOCH
+    dt = datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc)
+    return dt.isoformat()
+
+
+async def _main() -> None:
+    """Runs the stub standalone until interrupted."""
+    async with DiscordStub() as stub:
+        print(f"Discord stub listening on {stub.url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
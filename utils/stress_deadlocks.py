@@ -0,0 +1,203 @@
+"""Reproduces deadlocks between concurrent star transactions.
+
+Each worker repeatedly adds stars to a random sample of shared messages
+in one transaction, in random order. Every message is in its own channel,
+so the channel and message_star_total rows locked by the add_* chain and
+the message_star trigger are acquired in conflicting orders. Every run is made once with plain transactions,
+where deadlocks are lost, and once with retrying transactions, which
+should commit every transaction.
+
+A PostgreSQL database with all migrations applied is required::
+
+    python utils/stress_deadlocks.py --dsn postgres://postgres@localhost/starboard
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+
+import asyncpg
+import discord
+
+from thestarboard.database import DatabaseClient
+
+STAR = "⭐"
+
+
+async def create_messages(
+    query: DatabaseClient,
+    n_messages: int,
+) -> tuple[int, list[tuple[int, int]]]:
+    """Creates a guild with one message per channel.
+
+    :returns: The guild ID and the (message_id, channel_id) of each message.
+
+    """
+    base_id = discord.utils.time_snowflake(discord.utils.utcnow())
+    guild_id = base_id
+    messages = [(base_id + 1 + i * 2, base_id + 2 + i * 2) for i in range(n_messages)]
+
+    async with query.acquire():
+        for message_id, channel_id in messages:
+            await query.add_message(
+                message_id,
+                channel_id,
+                message_id,
+                guild_id=guild_id,
+            )
+    return guild_id, messages
+
+
+async def purge_guild(query: DatabaseClient, guild_id: int) -> None:
+    async with query.acquire():
+        await query.mark_guild_purges([guild_id])
+    while True:
+        async with query.acquire():
+            if await query.purge_guild(guild_id, limit=1000) == 0:
+                break
+
+
+async def run_workers(
+    query: DatabaseClient,
+    *,
+    retry: bool,
+    n_workers: int,
+    n_transactions: int,
+    stars_per_transaction: int,
+    n_messages: int,
+) -> tuple[int, int, float]:
+    """Runs every worker to completion.
+
+    :returns:
+        The number of transactions committed, the number lost to
+        deadlocks or serialization failures, and the seconds taken.
+
+    """
+    guild_id, messages = await create_messages(query, n_messages)
+    user_ids = itertools.count(messages[-1][1] + 1)
+    committed = failed = 0
+
+    async def add_stars() -> None:
+        # Every star comes from a new user so that none of them are no-ops
+        for message_id, channel_id in random.sample(messages, stars_per_transaction):
+            await query.add_message_star(
+                message_id,
+                next(user_ids),
+                STAR,
+                channel_id=channel_id,
+                guild_id=guild_id,
+            )
+
+    async def worker() -> None:
+        nonlocal committed, failed
+        for _ in range(n_transactions):
+            try:
+                if retry:
+                    async for attempt in query.retrying():
+                        async with attempt:
+                            await add_stars()
+                else:
+                    async with query.acquire():
+                        await add_stars()
+            except (asyncpg.DeadlockDetectedError, asyncpg.SerializationError):
+                failed += 1
+            else:
+                committed += 1
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(n_workers)))
+    finally:
+        elapsed = time.perf_counter() - start
+        await purge_guild(query, guild_id)
+
+    return committed, failed, elapsed
+
+
+async def run_stress_test(args: argparse.Namespace) -> bool:
+    async with asyncpg.create_pool(
+        args.dsn,
+        min_size=1,
+        max_size=args.n_workers + 1,
+    ) as pool:
+        query = DatabaseClient(pool, max_retries=args.max_retries)
+
+        ok = True
+        for retry in (False, True):
+            committed, failed, elapsed = await run_workers(
+                query,
+                retry=retry,
+                n_workers=args.n_workers,
+                n_transactions=args.n_transactions,
+                stars_per_transaction=args.stars_per_transaction,
+                n_messages=args.n_messages,
+            )
+            mode = "retrying" if retry else "plain"
+            print(f"{mode}: {committed} committed, {failed} lost " f"in {elapsed:.1f}s")
+            if retry and failed > 0:
+                ok = False
+
+        retries = ", ".join(f"{k}={v}" for k, v in sorted(query.retries.items()))
+        print(f"retries: {retries or 'none'}")
+        exhausted = query.retries_exhausted
+        if exhausted:
+            print(f"gave up: {', '.join(f'{k}={v}' for k, v in exhausted.items())}")
+
+        return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dsn",
+        default="postgres://postgres@localhost/starboard",
+        help="The database to run the stress test against",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="n_workers",
+        type=int,
+        default=4,
+        help="The number of concurrent transactions",
+    )
+    parser.add_argument(
+        "--transactions",
+        dest="n_transactions",
+        type=int,
+        default=10,
+        help="The number of transactions run by each worker",
+    )
+    parser.add_argument(
+        "--stars",
+        dest="stars_per_transaction",
+        type=int,
+        default=3,
+        help="The number of stars added in each transaction",
+    )
+    parser.add_argument(
+        "--messages",
+        dest="n_messages",
+        type=int,
+        default=6,
+        help="The number of messages shared between workers",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=10,
+        help="The number of retries per transaction when retrying",
+    )
+    args = parser.parse_args()
+
+    ok = asyncio.run(run_stress_test(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()